@@ -3,6 +3,11 @@ from contextlib import asynccontextmanager
 from app.rag_agent.routers.files import router as upload_router
 from app.rag_agent.routers.query import router as query_router
 from app.rag_agent.routers.chat import router as chat_router
+from app.rag_agent.routers.retrieve import router as retrieve_router
+from app.rag_agent.routers.jobs import router as jobs_router
+from app.rag_agent.routers.bulk_import import router as bulk_import_router
+from app.rag_agent.routers.sync import router as sync_router
+from app.rag_agent.ingestion import ingest_queue
 
 import os
 from dotenv import load_dotenv
@@ -26,8 +31,13 @@ async def lifespan(app: FastAPI):
     else:
         print(" Skipping Vertex AI init (missing config)")
 
+    # Background ingestion workers; resumes jobs left by a previous run
+    await ingest_queue.start()
+
     yield
 
+    await ingest_queue.stop()
+
 #  This must match the location in Dockerfile: `main:app`
 app = FastAPI(lifespan=lifespan)
 
@@ -40,3 +50,7 @@ def health_check():
 app.include_router(upload_router)
 app.include_router(query_router)
 app.include_router(chat_router)
+app.include_router(retrieve_router)
+app.include_router(jobs_router)
+app.include_router(bulk_import_router)
+app.include_router(sync_router)
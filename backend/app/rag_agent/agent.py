@@ -1,5 +1,7 @@
 from google.adk.agents import Agent
 
+from .concurrency import async_tool
+
 from .tools.add_data import add_data
 from .tools.create_corpus import create_corpus
 from .tools.delete_corpus import delete_corpus
@@ -13,14 +15,15 @@ root_agent = Agent(
     # Using Gemini 2.5 Flash for best performance with RAG operations
     model="gemini-2.5-flash-preview-04-17",
     description="Vertex AI RAG Agent",
+    # The tools make blocking RPCs, so they run in the shared I/O pool
     tools=[
-        rag_query,
-        list_corpora,
-        create_corpus,
-        add_data,
-        get_corpus_info,
-        delete_corpus,
-        delete_document,
+        async_tool(rag_query),
+        async_tool(list_corpora),
+        async_tool(create_corpus),
+        async_tool(add_data),
+        async_tool(get_corpus_info),
+        async_tool(delete_corpus),
+        async_tool(delete_document),
     ],
     instruction="""
     # 🧠 Vertex AI RAG Agent
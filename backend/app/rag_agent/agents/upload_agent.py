@@ -2,6 +2,8 @@
 
 from google.adk.agents import Agent
 
+from app.rag_agent.concurrency import async_tool
+
 # Import tools used during file ingestion
 from app.rag_agent.tools.add_data import add_data
 from app.rag_agent.tools.create_corpus import create_corpus
@@ -14,10 +16,10 @@ upload_agent = Agent(
     model="gemini-1.5-flash",  # Ideal for fast tool routing
     description="Handles file uploads, corpus creation, and document tracking.",
     tools=[
-        list_corpora,
-        create_corpus,
-        add_data,
-        get_corpus_info,
+        async_tool(list_corpora),
+        async_tool(create_corpus),
+        async_tool(add_data),
+        async_tool(get_corpus_info),
     ],
     instruction="""
 You are the upload_agent. Your role is to manage PDF document uploads and connect them to the correct RAG corpus.
@@ -0,0 +1,61 @@
+"""
+Helpers for keeping blocking work off the asyncio event loop.
+
+The Vertex AI and Cloud Storage clients are synchronous. Request handlers and
+agent tools hand that work to one bounded thread pool so a slow RPC occupies
+a worker thread instead of stalling every request on the uvicorn worker.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from google.adk.tools.function_tool import FunctionTool
+from google.genai import types
+
+from .config import BLOCKING_IO_WORKERS
+
+T = TypeVar("T")
+
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_IO_WORKERS,
+    thread_name_prefix="blocking-io",
+)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable in the shared pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        blocking_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+class BlockingFunctionTool(FunctionTool):
+    """
+    ADK function tool for a synchronous function that runs it in the shared
+    pool.
+
+    FunctionTool calls synchronous functions directly on the event loop, so
+    a tool making a Vertex AI RPC would otherwise stall every request. The
+    declaration sent to the model is still built from the original function.
+    """
+
+    def __init__(self, func: Callable[..., Any]):
+        super().__init__(func)
+        self._declaration_tool = FunctionTool(func)
+
+        @functools.wraps(func)
+        async def offloaded(*args: Any, **kwargs: Any) -> Any:
+            return await run_blocking(func, *args, **kwargs)
+
+        self.func = offloaded
+
+    def _get_declaration(self) -> Optional[types.FunctionDeclaration]:
+        return self._declaration_tool._get_declaration()
+
+
+def async_tool(func: Callable[..., Any]) -> BlockingFunctionTool:
+    """Wrap a synchronous tool function for use in an agent's tool list."""
+    return BlockingFunctionTool(func)
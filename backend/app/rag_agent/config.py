@@ -41,3 +41,182 @@ DEFAULT_TOP_K = 3
 DEFAULT_DISTANCE_THRESHOLD = 0.5
 DEFAULT_EMBEDDING_MODEL = "publishers/google/models/text-embedding-005"
 DEFAULT_EMBEDDING_REQUESTS_PER_MIN = 1000
+
+# Corpus registry settings
+CORPUS_REGISTRY_TTL_SECONDS = int(os.getenv("CORPUS_REGISTRY_TTL_SECONDS", "300"))
+CORPUS_REGISTRY_MISS_REFRESH_SECONDS = int(
+    os.getenv("CORPUS_REGISTRY_MISS_REFRESH_SECONDS", "10")
+)
+
+# Direct retrieval (/retrieve) settings
+RETRIEVE_MAX_BATCH_SIZE = int(os.getenv("RETRIEVE_MAX_BATCH_SIZE", "32"))
+RETRIEVE_BATCH_WORKERS = int(os.getenv("RETRIEVE_BATCH_WORKERS", "8"))
+
+# Retrieval backend settings
+# "vertex" queries Vertex AI RAG; "local" serves corpora from an in-process index
+RETRIEVAL_BACKEND = os.getenv("RAG_RETRIEVAL_BACKEND", "vertex")
+# Embedder used by the local backend: "vertex" or the offline "hashing" embedder
+LOCAL_EMBEDDER = os.getenv("RAG_LOCAL_EMBEDDER", "vertex")
+HASHING_EMBEDDER_DIM = int(os.getenv("RAG_HASHING_EMBEDDER_DIM", "768"))
+
+# Local index settings
+# "exact" scans every chunk, "hnsw" uses an approximate graph index and
+# "auto" switches to HNSW once a corpus reaches HNSW_MIN_CHUNKS chunks
+LOCAL_INDEX_TYPE = os.getenv("RAG_LOCAL_INDEX_TYPE", "auto")
+HNSW_MIN_CHUNKS = int(os.getenv("RAG_HNSW_MIN_CHUNKS", "50000"))
+HNSW_M = int(os.getenv("RAG_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+# Rows inserted between saves of a corpus's graph while it catches up
+HNSW_SAVE_EVERY = int(os.getenv("RAG_HNSW_SAVE_EVERY", "2048"))
+# Rebuild an index once this fraction of its rows has been deleted
+LOCAL_INDEX_COMPACT_RATIO = float(os.getenv("RAG_LOCAL_INDEX_COMPACT_RATIO", "0.3"))
+
+# Local chunk store settings
+LOCAL_STORE_DIR = os.getenv("RAG_LOCAL_STORE_DIR", "./api_data/local_index")
+# "float32" keeps full precision; "int8" stores quantised rows at a quarter of the size
+LOCAL_STORE_DTYPE = os.getenv("RAG_LOCAL_STORE_DTYPE", "float32")
+# Seconds a compacted-away generation is kept for readers still opening it
+LOCAL_STORE_RETIRE_SECONDS = int(os.getenv("RAG_LOCAL_STORE_RETIRE_SECONDS", "300"))
+
+# Hybrid (dense + BM25) retrieval settings
+# When enabled, documents are mirrored into the local store and rag_query fuses
+# dense results with BM25 results from the local inverted index
+HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID_RETRIEVAL", "false").lower() == "true"
+BM25_K1 = float(os.getenv("RAG_BM25_K1", "1.2"))
+BM25_B = float(os.getenv("RAG_BM25_B", "0.75"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Candidates fetched from each retriever per requested result before fusion
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("RAG_HYBRID_CANDIDATE_FACTOR", "4"))
+
+# Retrieval result cache settings (set RETRIEVAL_CACHE_MAX_ENTRIES=0 to disable)
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2048"))
+RETRIEVAL_CACHE_MAX_BYTES = int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RETRIEVAL_CACHE_TTL_SECONDS = int(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "600"))
+
+# Semantic (near-duplicate query) cache settings
+# Queries embedded with the LOCAL_EMBEDDER are served from the cache when
+# their cosine similarity to a cached query reaches SEMANTIC_CACHE_SIMILARITY
+# and they name the same identifiers. Off by default: with the Vertex
+# embedder every lookup costs an embedding RPC
+SEMANTIC_CACHE_ENABLED = os.getenv("RAG_SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_SIMILARITY = float(os.getenv("RAG_SEMANTIC_CACHE_SIMILARITY", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("RAG_SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("RAG_SEMANTIC_CACHE_TTL_SECONDS", "600"))
+# Query embeddings kept so repeated queries are embedded once
+SEMANTIC_CACHE_EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_SEMANTIC_CACHE_EMBEDDING_CACHE_SIZE", "4096"))
+
+# Threads shared by request handlers and agent tools for blocking I/O
+# (Vertex AI RPCs, Cloud Storage uploads, local file writes)
+BLOCKING_IO_WORKERS = int(os.getenv("RAG_BLOCKING_IO_WORKERS", "16"))
+
+# Ingestion job queue settings
+# Job state is kept in SQLite so queued and interrupted jobs resume after a restart
+INGEST_JOB_DB = os.getenv("RAG_INGEST_JOB_DB", "./api_data/ingest_jobs.sqlite3")
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("RAG_INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_BACKOFF_SECONDS = float(os.getenv("RAG_INGEST_RETRY_BACKOFF_SECONDS", "5"))
+# A running job is leased to the process running it and the lease is renewed
+# every INGEST_JOB_HEARTBEAT_SECONDS; other processes take over a job only
+# once its lease has expired, so several workers can share one job table
+INGEST_JOB_LEASE_SECONDS = float(os.getenv("RAG_INGEST_JOB_LEASE_SECONDS", "120"))
+INGEST_JOB_HEARTBEAT_SECONDS = float(os.getenv("RAG_INGEST_JOB_HEARTBEAT_SECONDS", "30"))
+
+# Upload streaming settings
+# Uploads are piped straight into GCS resumable uploads in chunks of this size
+# (rounded down to a multiple of 256 KiB, as GCS requires)
+UPLOAD_CHUNK_SIZE = int(os.getenv("RAG_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Also keep a copy of every upload under the local file locker
+UPLOAD_KEEP_LOCAL = os.getenv("RAG_UPLOAD_KEEP_LOCAL", "false").lower() == "true"
+UPLOAD_DIR = os.getenv("RAG_UPLOAD_DIR", "./api_data/file_locker/")
+# Files of one multi-file upload written to GCS at the same time
+UPLOAD_CONCURRENCY = int(os.getenv("RAG_UPLOAD_CONCURRENCY", "4"))
+
+# Content index: digest of every uploaded document per corpus, so uploads of
+# bytes that are already in the corpus skip GCS and the import
+CONTENT_INDEX_DB = os.getenv("RAG_CONTENT_INDEX_DB", "./api_data/content_index.sqlite3")
+
+# Import coalescing: add_data calls for the same corpus within this window
+# share one rag.import_files call (0 disables coalescing)
+IMPORT_BATCH_WINDOW_SECONDS = float(os.getenv("RAG_IMPORT_BATCH_WINDOW_SECONDS", "2"))
+# Paths per import_files call (the API accepts at most 25)
+IMPORT_BATCH_MAX_PATHS = int(os.getenv("RAG_IMPORT_BATCH_MAX_PATHS", "25"))
+
+# Embedding quota shared by concurrent imports
+# Each import_files call is leased a share of this budget instead of the full
+# DEFAULT_EMBEDDING_REQUESTS_PER_MIN
+EMBEDDING_QUOTA_PER_MIN = int(
+    os.getenv("RAG_EMBEDDING_QUOTA_PER_MIN", str(DEFAULT_EMBEDDING_REQUESTS_PER_MIN))
+)
+# Imports wait for at least this share rather than start slower
+EMBEDDING_MIN_SHARE_PER_MIN = int(os.getenv("RAG_EMBEDDING_MIN_SHARE_PER_MIN", "50"))
+# Fraction of the budget kept for small interactive imports
+EMBEDDING_INTERACTIVE_RESERVE = float(os.getenv("RAG_EMBEDDING_INTERACTIVE_RESERVE", "0.2"))
+# Imports of at most this many files count as interactive uploads
+EMBEDDING_SMALL_IMPORT_PATHS = int(os.getenv("RAG_EMBEDDING_SMALL_IMPORT_PATHS", "5"))
+# While other imports wait for a share, a batch is imported in calls of at
+# most this many files, renewing its lease at the then-current share for each;
+# otherwise every batch is one import_files call
+EMBEDDING_LEASE_MAX_PATHS = int(os.getenv("RAG_EMBEDDING_LEASE_MAX_PATHS", str(IMPORT_BATCH_MAX_PATHS)))
+
+# Local file uploads in add_data
+# Files uploaded at the same time
+LOCAL_UPLOAD_WORKERS = int(os.getenv("RAG_LOCAL_UPLOAD_WORKERS", "8"))
+# Files at least this large are sent as concurrent chunks of one upload
+LOCAL_UPLOAD_PARALLEL_THRESHOLD = int(
+    os.getenv("RAG_LOCAL_UPLOAD_PARALLEL_THRESHOLD", str(64 * 1024 * 1024))
+)
+LOCAL_UPLOAD_CHUNK_SIZE = int(os.getenv("RAG_LOCAL_UPLOAD_CHUNK_SIZE", str(32 * 1024 * 1024)))
+LOCAL_UPLOAD_CHUNK_WORKERS = int(os.getenv("RAG_LOCAL_UPLOAD_CHUNK_WORKERS", "8"))
+# HTTP connections the shared storage client keeps open
+GCS_HTTP_POOL_SIZE = int(os.getenv("RAG_GCS_HTTP_POOL_SIZE", "32"))
+
+# Bulk (manifest) imports
+# Plan and checkpoint files of every bulk import job live under this directory
+BULK_IMPORT_DIR = os.getenv("RAG_BULK_IMPORT_DIR", "./api_data/bulk_imports")
+# Sources per import_files call (capped at IMPORT_BATCH_MAX_PATHS)
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("RAG_BULK_IMPORT_BATCH_SIZE", "25"))
+# Batches of one bulk import running at the same time
+BULK_IMPORT_PARALLEL_BATCHES = int(os.getenv("RAG_BULK_IMPORT_PARALLEL_BATCHES", "4"))
+
+# Incremental GCS-prefix sync
+# Synced objects (generation, content hash, RAG file) per corpus
+SYNC_STATE_DB = os.getenv("RAG_SYNC_STATE_DB", "./api_data/sync_state.sqlite3")
+# A run compares its state with rag.list_files at least this often
+SYNC_RECONCILE_SECONDS = float(os.getenv("RAG_SYNC_RECONCILE_SECONDS", "3600"))
+# Import batches and deletions of one sync run in flight at the same time
+SYNC_PARALLEL_BATCHES = int(os.getenv("RAG_SYNC_PARALLEL_BATCHES", "4"))
+
+# Text extraction
+# PDFs with at least this many pages are extracted in page ranges across processes
+EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("RAG_EXTRACT_PARALLEL_MIN_PAGES", "64"))
+# Pages per range handed to one extraction process
+EXTRACT_PAGES_PER_TASK = int(os.getenv("RAG_EXTRACT_PAGES_PER_TASK", "32"))
+# Extraction processes (1 extracts every PDF in the calling thread)
+EXTRACT_PROCESS_WORKERS = int(
+    os.getenv("RAG_EXTRACT_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+
+# Extraction cache: page text of parsed PDF and Word files, keyed by the
+# digest of their bytes, so the same file is only parsed once
+EXTRACTION_CACHE_ENABLED = os.getenv("RAG_EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+EXTRACTION_CACHE_DB = os.getenv("RAG_EXTRACTION_CACHE_DB", "./api_data/extraction_cache.sqlite3")
+# Compressed size the cache is kept under; least recently used files go first
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("RAG_EXTRACTION_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Chunk-level re-ingestion: revisions of documents (by document id, or by
+# source URI for stable GCS paths) are chunked locally and compared with the
+# previous revision's chunks. Only used with the local index, which is where
+# unchanged chunks save embeddings; Vertex AI always re-embeds whole files
+INCREMENTAL_REINGEST_ENABLED = os.getenv("RAG_INCREMENTAL_REINGEST_ENABLED", "false").lower() == "true"
+CHUNK_INDEX_DB = os.getenv("RAG_CHUNK_INDEX_DB", "./api_data/chunk_index.sqlite3")
+
+# Near-duplicate chunks at ingestion (MinHash/LSH over word 3-shingles),
+# screened once by add_data. "flag" reports them, "drop" keeps them out of
+# the local index (and skips uploads made only of them), "off" disables the
+# check and the extra download and chunking it needs
+NEAR_DUP_MODE = os.getenv("RAG_NEAR_DUP_MODE", "off").lower()
+# Estimated Jaccard similarity from which two chunks count as near-duplicates
+NEAR_DUP_THRESHOLD = float(os.getenv("RAG_NEAR_DUP_THRESHOLD", "0.85"))
+NEAR_DUP_NUM_PERM = int(os.getenv("RAG_NEAR_DUP_NUM_PERM", "128"))
+NEAR_DUP_DB = os.getenv("RAG_NEAR_DUP_DB", "./api_data/near_duplicates.sqlite3")
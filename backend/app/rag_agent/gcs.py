@@ -0,0 +1,38 @@
+"""
+Shared Cloud Storage client.
+
+storage.Client() is expensive to build (credential discovery, HTTP session)
+and safe to share across threads, so the process builds it once, with a
+connection pool sized for concurrent uploads.
+"""
+
+import os
+import threading
+from typing import Optional
+
+from google.cloud import storage
+from requests.adapters import HTTPAdapter
+
+from .config import GCS_HTTP_POOL_SIZE
+
+_storage_client: Optional[storage.Client] = None
+_storage_client_lock = threading.Lock()
+
+
+def get_storage_client() -> storage.Client:
+    """Return the process-wide storage client, creating it on first use."""
+    global _storage_client
+    with _storage_client_lock:
+        if _storage_client is None:
+            client = storage.Client()
+            # requests keeps 10 connections per host by default; concurrent
+            # uploads would keep opening and dropping extra ones
+            adapter = HTTPAdapter(pool_connections=GCS_HTTP_POOL_SIZE, pool_maxsize=GCS_HTTP_POOL_SIZE)
+            client._http.mount("https://", adapter)
+            _storage_client = client
+        return _storage_client
+
+
+def upload_bucket_name() -> str:
+    """Bucket that API uploads are written to."""
+    return os.getenv("GCS_BUCKET", "my-rag-upload-bucket")
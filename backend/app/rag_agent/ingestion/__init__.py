@@ -0,0 +1,49 @@
+"""
+Background ingestion: persistent job queue, the deterministic upload
+pipeline, manifest-driven bulk imports and incremental GCS-prefix
+syncs.
+"""
+
+from .jobs import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    Job,
+    JobQueue,
+    JobStore,
+    ingest_queue,
+)
+from .bulk import iter_manifest_sources, submit_bulk_import
+from .sync import submit_sync, sync_prefix
+from .pipeline import (
+    IngestionError,
+    ensure_and_import,
+    ensure_corpus,
+    import_documents,
+    ingest_gcs_uris,
+    new_tool_context,
+    verify_documents,
+)
+
+__all__ = [
+    "JOB_FAILED",
+    "JOB_QUEUED",
+    "JOB_RUNNING",
+    "JOB_SUCCEEDED",
+    "IngestionError",
+    "Job",
+    "JobQueue",
+    "JobStore",
+    "ensure_and_import",
+    "ensure_corpus",
+    "import_documents",
+    "ingest_gcs_uris",
+    "ingest_queue",
+    "iter_manifest_sources",
+    "new_tool_context",
+    "submit_bulk_import",
+    "submit_sync",
+    "sync_prefix",
+    "verify_documents",
+]
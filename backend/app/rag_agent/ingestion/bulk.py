@@ -0,0 +1,296 @@
+"""
+Bulk imports from a manifest of thousands of sources.
+
+A manifest is either a JSONL file (local or gs://) with one source per line,
+given as a JSON string or an object with a "path" (or "uri") field, or a
+GCS prefix whose objects are all imported. A bulk import is an ingestion
+job with two checkpointed stages:
+
+plan    streams the manifest once, validates every source with the add_data
+        rules and writes the valid, de-duplicated paths to a plan file
+import  imports the plan in API-sized batches, a few batches at a time, and
+        appends every finished batch to a checkpoint file
+
+A retried or resumed job skips the batches listed in its checkpoint file,
+so a crash never re-embeds what was already imported.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Iterator, List, Optional, Set, Tuple
+
+from ..concurrency import run_blocking
+from ..config import (
+    BULK_IMPORT_BATCH_SIZE,
+    BULK_IMPORT_DIR,
+    BULK_IMPORT_PARALLEL_BATCHES,
+    IMPORT_BATCH_MAX_PATHS,
+)
+from ..gcs import get_storage_client
+from ..tools.add_data import normalize_source_path
+from ..tools.utils import split_gcs_uri
+from .jobs import Checkpoint, Job, ingest_queue
+from .pipeline import IngestionError, ensure_corpus, import_documents, new_tool_context
+
+logger = logging.getLogger(__name__)
+
+# Invalid entries reported back in the job result; the rest are only counted
+MAX_INVALID_SAMPLES = 100
+
+
+def _iter_lines(manifest: dict) -> Iterator[str]:
+    """Raw manifest lines, read incrementally."""
+    if manifest.get("manifest_uri"):
+        bucket, name = split_gcs_uri(manifest["manifest_uri"])
+        blob = get_storage_client().bucket(bucket).blob(name)
+        with blob.open("r", encoding="utf-8") as f:
+            yield from f
+    else:
+        with open(manifest["manifest_path"], "r", encoding="utf-8") as f:
+            yield from f
+
+
+def iter_manifest_sources(manifest: dict) -> Iterator[Tuple[Optional[str], str, Optional[str]]]:
+    """
+    Stream the sources named by a manifest.
+
+    Args:
+        manifest (dict): One of {"gcs_prefix": "gs://bucket/prefix"},
+            {"manifest_uri": "gs://.../sources.jsonl"} or
+            {"manifest_path": "/local/sources.jsonl"}
+
+    Yields:
+        Tuple[Optional[str], str, Optional[str]]: The source path (None if
+        the entry has none), the raw entry and why the entry is unusable
+    """
+    if manifest.get("gcs_prefix"):
+        bucket, prefix = split_gcs_uri(manifest["gcs_prefix"])
+        # Names only: listings of large prefixes stay small
+        blobs = get_storage_client().list_blobs(
+            bucket, prefix=prefix, fields="items(name),nextPageToken"
+        )
+        for blob in blobs:
+            if not blob.name.endswith("/"):
+                yield f"gs://{bucket}/{blob.name}", blob.name, None
+        return
+
+    for line in _iter_lines(manifest):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            yield None, line, "Not valid JSON"
+            continue
+        if isinstance(entry, dict):
+            entry = entry.get("path") or entry.get("uri")
+        if isinstance(entry, str):
+            yield entry, line, None
+        else:
+            yield None, line, "No path in entry"
+
+
+def _job_dir(job_id: str) -> str:
+    path = os.path.join(BULK_IMPORT_DIR, job_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _plan_path(job_id: str) -> str:
+    return os.path.join(_job_dir(job_id), "plan.txt")
+
+
+def _checkpoint_path(job_id: str) -> str:
+    return os.path.join(_job_dir(job_id), "done.jsonl")
+
+
+def plan_bulk_import(job_id: str, manifest: dict, batch_size: int) -> dict:
+    """
+    Validate a manifest in one streaming pass and write the job's plan file.
+
+    Returns:
+        dict: Counts of valid, duplicate and invalid sources, samples of the
+        invalid ones and the number of batches to import
+    """
+    seen: Set[str] = set()
+    valid = duplicates = invalid = 0
+    invalid_samples: List[dict] = []
+    tmp_path = _plan_path(job_id) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as plan:
+        for path, raw, error in iter_manifest_sources(manifest):
+            normalized = None
+            if error is None:
+                normalized, error = normalize_source_path(path)
+            if normalized is None:
+                invalid += 1
+                if len(invalid_samples) < MAX_INVALID_SAMPLES:
+                    invalid_samples.append({"entry": raw[:500], "error": error})
+                continue
+            if normalized in seen:
+                duplicates += 1
+                continue
+            seen.add(normalized)
+            plan.write(normalized + "\n")
+            valid += 1
+    # Only a complete plan is ever read back
+    os.replace(tmp_path, _plan_path(job_id))
+    return {
+        "valid": valid,
+        "duplicates": duplicates,
+        "invalid": invalid,
+        "invalid_samples": invalid_samples,
+        "batch_size": batch_size,
+        "batches_total": -(-valid // batch_size),
+    }
+
+
+def iter_plan_batches(job_id: str, batch_size: int) -> Iterator[Tuple[int, List[str]]]:
+    """Numbered batches of the plan file, read incrementally."""
+    batch: List[str] = []
+    index = 0
+    with open(_plan_path(job_id), "r", encoding="utf-8") as plan:
+        for line in plan:
+            batch.append(line.rstrip("\n"))
+            if len(batch) == batch_size:
+                yield index, batch
+                index, batch = index + 1, []
+    if batch:
+        yield index, batch
+
+
+def read_checkpoint(job_id: str) -> dict:
+    """Batches recorded as imported: batch number -> files added."""
+    done = {}
+    path = _checkpoint_path(job_id)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line torn by a crash; that batch is simply redone
+                    continue
+                done[entry["batch"]] = entry.get("files_added") or 0
+    return done
+
+
+class _CheckpointFile:
+    """Append-only record of finished batches, safe to call from threads."""
+
+    def __init__(self, job_id: str):
+        self.path = _checkpoint_path(job_id)
+        self._lock = threading.Lock()
+        # A line torn by a crash must not swallow the next entry
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb+") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+    def append(self, batch: int, files_added: int) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"batch": batch, "files_added": files_added}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _import_batch(corpus_name: str, index: int, paths: List[str], record: _CheckpointFile) -> int:
+    """
+    Import one batch and checkpoint it (blocking).
+
+    A batch some of whose files failed inside Vertex AI is not checkpointed,
+    so the retry imports it again; import_files skips the files it has.
+    """
+    result = import_documents(corpus_name, paths, new_tool_context())
+    if result.get("files_failed"):
+        raise IngestionError(f"{result['files_failed']} of {len(paths)} file(s) failed to import")
+    files_added = result.get("files_added") or 0
+    record.append(index, files_added)
+    return files_added
+
+
+async def process_bulk_import_job(job: Job, checkpoint: Checkpoint) -> dict:
+    """
+    Ingestion job for manifests: plan -> import.
+
+    Up to BULK_IMPORT_PARALLEL_BATCHES batches are imported at once; they
+    go through add_data, so they share the embedding quota with uploads.
+    Failed batches fail the attempt after the others finished, and the
+    retry only redoes those.
+    """
+    corpus_name = job.payload["corpus_name"]
+    batch_size = job.payload["batch_size"]
+
+    if job.stage in (None, "plan"):
+        await run_blocking(ensure_corpus, corpus_name, new_tool_context())
+        plan = await run_blocking(plan_bulk_import, job.id, job.payload["manifest"], batch_size)
+        print(
+            f"📋 Bulk import {job.id}: {plan['valid']} source(s) in "
+            f"{plan['batches_total']} batch(es), {plan['invalid']} invalid"
+        )
+        checkpoint("import", dict(plan, batches_done=0, files_added=0, failed_batches=[]))
+
+    done = await run_blocking(read_checkpoint, job.id)
+    record = _CheckpointFile(job.id)
+    slots = asyncio.Semaphore(BULK_IMPORT_PARALLEL_BATCHES)
+    failed: List[dict] = []
+    tasks = []
+
+    def progress() -> None:
+        checkpoint("import", {
+            "batches_done": len(done),
+            "files_added": sum(done.values()),
+            "failed_batches": failed[:MAX_INVALID_SAMPLES],
+        })
+
+    async def run(index: int, paths: List[str]) -> None:
+        try:
+            done[index] = await run_blocking(_import_batch, corpus_name, index, paths, record)
+        except Exception as e:
+            logger.warning(f"Bulk import {job.id}: batch {index} failed: {e}")
+            failed.append({"batch": index, "error": f"{type(e).__name__}: {str(e)}"})
+        finally:
+            slots.release()
+        progress()
+
+    try:
+        batches = iter_plan_batches(job.id, batch_size)
+        while True:
+            # The plan is read a batch at a time, only when a slot is free
+            await slots.acquire()
+            item = await run_blocking(next, batches, None)
+            if item is None:
+                slots.release()
+                break
+            index, paths = item
+            if index in done:
+                slots.release()
+                continue
+            tasks.append(asyncio.ensure_future(run(index, paths)))
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    progress()
+    if failed:
+        raise IngestionError(f"{len(failed)} batch(es) failed; first: {failed[0]['error']}")
+    return {"batches_done": len(done), "files_added": sum(done.values()), "failed_batches": []}
+
+
+def submit_bulk_import(corpus_name: str, manifest: dict, batch_size: int = BULK_IMPORT_BATCH_SIZE) -> Job:
+    """Queue a bulk import of the sources named by `manifest`."""
+    batch_size = max(1, min(batch_size, IMPORT_BATCH_MAX_PATHS))
+    return ingest_queue.submit("bulk_import", {
+        "corpus_name": corpus_name,
+        "manifest": manifest,
+        "batch_size": batch_size,
+    })
+
+
+ingest_queue.register("bulk_import", process_bulk_import_job)
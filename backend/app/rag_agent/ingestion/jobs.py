@@ -0,0 +1,469 @@
+"""
+Persistent queue of ingestion jobs.
+
+Requests enqueue a job and return its id at once; a bounded set of worker
+tasks runs the job's handler in the background. Job state lives in SQLite,
+so queued jobs and jobs interrupted by a restart are picked up again when
+the queue starts. Handlers record progress with `checkpoint()` and resume
+from the last recorded stage when a job is retried.
+
+A running job is leased to the process that claimed it and the queue renews
+the lease while the handler runs. Several processes can share the job table:
+a job is taken over only after its lease expired, i.e. its owner stopped
+heartbeating, never while another live worker is still running it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ..config import (
+    INGEST_JOB_DB,
+    INGEST_JOB_HEARTBEAT_SECONDS,
+    INGEST_JOB_LEASE_SECONDS,
+    INGEST_MAX_ATTEMPTS,
+    INGEST_RETRY_BACKOFF_SECONDS,
+    INGEST_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """One ingestion job as stored in the job table."""
+
+    id: str
+    kind: str
+    status: str
+    stage: Optional[str]
+    payload: dict
+    result: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    owner: Optional[str] = None
+    lease_expires_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+Checkpoint = Callable[[str, dict], None]
+Handler = Callable[[Job, Checkpoint], Awaitable[dict]]
+
+
+class JobStore:
+    """
+    SQLite-backed job table.
+
+    One connection is shared behind a lock; every write is a single short
+    transaction, so calling the store from the event loop is cheap. Each store
+    has its own owner id, recorded on the jobs it claims; writes for a running
+    job only apply while this store still owns it.
+    """
+
+    def __init__(self, path: str = INGEST_JOB_DB, lease_seconds: float = INGEST_JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    payload TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT,
+                    lease_expires_at REAL
+                )
+                """
+            )
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_expires_at", "REAL")):
+                if column not in columns:
+                    # Tables created before job leases
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+            )
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            kind=row["kind"],
+            status=row["status"],
+            stage=row["stage"],
+            payload=json.loads(row["payload"]),
+            result=json.loads(row["result"]),
+            error=row["error"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            owner=row["owner"],
+            lease_expires_at=row["lease_expires_at"],
+        )
+
+    def create(self, kind: str, payload: dict, stage: Optional[str] = None) -> Job:
+        now = time.time()
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            status=JOB_QUEUED,
+            stage=stage,
+            payload=payload,
+            created_at=now,
+            updated_at=now,
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id, job.kind, job.status, job.stage, json.dumps(payload),
+                    json.dumps(job.result), None, 0, now, now, None, None,
+                ),
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Most recent jobs first, optionally filtered by status."""
+        query = "SELECT * FROM jobs"
+        params: tuple = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, params + (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim(self, job_id: str) -> Optional[Job]:
+        """
+        Move a queued job to running and lease it to this store.
+
+        Returns:
+            Optional[Job]: The claimed job, or None if it is not queued
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?, "
+                "owner = ?, lease_expires_at = ? WHERE id = ? AND status = ?",
+                (JOB_RUNNING, now, self.owner, now + self.lease_seconds, job_id, JOB_QUEUED),
+            )
+        return self.get(job_id) if cursor.rowcount else None
+
+    def renew(self, job_ids: List[str]) -> List[str]:
+        """
+        Extend the leases of running jobs owned by this store.
+
+        Returns:
+            List[str]: Ids whose lease was extended; a job missing from it was
+                taken over after its lease expired
+        """
+        if not job_ids:
+            return []
+        expires_at = time.time() + self.lease_seconds
+        renewed = []
+        with self._lock:
+            for job_id in job_ids:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET lease_expires_at = ? "
+                    "WHERE id = ? AND status = ? AND owner = ?",
+                    (expires_at, job_id, JOB_RUNNING, self.owner),
+                )
+                if cursor.rowcount:
+                    renewed.append(job_id)
+        return renewed
+
+    def checkpoint(self, job_id: str, stage: str, result: dict) -> None:
+        """Record the next stage and merge `result` into the job's result."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM jobs WHERE id = ? AND owner = ?", (job_id, self.owner)
+            ).fetchone()
+            if row is None:
+                logger.warning(f"Ingestion job {job_id} is no longer owned by {self.owner}")
+                return
+            merged = dict(json.loads(row["result"]), **result)
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, result = ?, updated_at = ? WHERE id = ? AND owner = ?",
+                (stage, json.dumps(merged), time.time(), job_id, self.owner),
+            )
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """
+        Mark a job succeeded or failed, merging `result` into its result.
+
+        Ignored if the job's lease expired and another process took it over.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stage, result FROM jobs WHERE id = ? AND owner = ?", (job_id, self.owner)
+            ).fetchone()
+            if row is None:
+                logger.warning(f"Ingestion job {job_id} is no longer owned by {self.owner}")
+                return
+            merged = dict(json.loads(row["result"]), **(result or {}))
+            stage = "done" if status == JOB_SUCCEEDED else row["stage"]
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, result = ?, error = ?, updated_at = ?, "
+                "owner = NULL, lease_expires_at = NULL WHERE id = ? AND owner = ?",
+                (status, stage, json.dumps(merged), error, time.time(), job_id, self.owner),
+            )
+
+    def requeue(self, job_id: str, error: Optional[str] = None) -> None:
+        """Give up this store's lease and put the job back in the queue."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?, "
+                "owner = NULL, lease_expires_at = NULL WHERE id = ? AND owner = ?",
+                (JOB_QUEUED, error, time.time(), job_id, self.owner),
+            )
+
+    def reclaim_expired(self) -> List[str]:
+        """
+        Requeue running jobs whose lease expired: their owner died or hung.
+
+        Jobs of live workers, which keep renewing their leases, are left
+        alone. Rows written before job leases existed have no lease and
+        count as expired.
+
+        Returns:
+            List[str]: Ids of the requeued jobs, oldest first
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? "
+                "AND (lease_expires_at IS NULL OR lease_expires_at < ?) ORDER BY created_at",
+                (JOB_RUNNING, now),
+            ).fetchall()
+            reclaimed = []
+            for row in rows:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ?, owner = NULL, lease_expires_at = NULL "
+                    "WHERE id = ? AND status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                    (JOB_QUEUED, now, row["id"], JOB_RUNNING, now),
+                )
+                if cursor.rowcount:
+                    reclaimed.append(row["id"])
+        return reclaimed
+
+    def recover(self) -> List[str]:
+        """
+        Requeue jobs whose lease expired and list everything waiting to run.
+
+        Returns:
+            List[str]: Ids of all queued jobs, oldest first
+        """
+        self.reclaim_expired()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+class JobQueue:
+    """
+    Runs persisted jobs on a fixed number of asyncio worker tasks.
+
+    Handlers are registered per job kind and awaited by the workers, so they
+    must keep blocking work off the event loop (see concurrency.run_blocking).
+    A failed job is retried with a growing delay until it has been attempted
+    `max_attempts` times. A heartbeat task renews the leases of running jobs
+    and requeues jobs whose owner stopped renewing theirs.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = INGEST_WORKERS,
+        max_attempts: int = INGEST_MAX_ATTEMPTS,
+        retry_backoff_seconds: float = INGEST_RETRY_BACKOFF_SECONDS,
+        heartbeat_seconds: float = INGEST_JOB_HEARTBEAT_SECONDS,
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._handlers: Dict[str, Handler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._active: Dict[str, Job] = {}
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Start the workers and enqueue jobs persisted by earlier runs."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        recovered = self.store.recover()
+        for job_id in recovered:
+            self._queue.put_nowait(job_id)
+        if recovered:
+            print(f"🔁 Resuming {len(recovered)} ingestion job(s)")
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"ingest-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._heartbeat(), name="ingest-heartbeat"))
+
+    async def stop(self) -> None:
+        """
+        Cancel the workers. Unfinished jobs stop being renewed and are resumed
+        once their lease expired, by this process or another one.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def submit(self, kind: str, payload: dict, stage: Optional[str] = None) -> Job:
+        """
+        Persist a new job and hand it to the workers.
+
+        Args:
+            kind (str): Registered handler name
+            payload (dict): JSON-serialisable job input
+            stage (str, optional): Stage to start from
+
+        Returns:
+            Job: The queued job
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = self.store.create(kind, payload, stage)
+        if self._queue is not None:
+            self._queue.put_nowait(job.id)
+        return job
+
+    def _retry_later(self, job_id: str, delay: float) -> None:
+        queue = self._queue
+        if queue is not None:
+            asyncio.get_running_loop().call_later(delay, queue.put_nowait, job_id)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                renewed = set(self.store.renew(list(self._active)))
+                for job_id in self._active:
+                    if job_id not in renewed:
+                        logger.warning(f"Lost the lease on ingestion job {job_id}")
+                for job_id in self.store.reclaim_expired():
+                    print(f"🔁 Resuming ingestion job {job_id} after its lease expired")
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                logger.warning(f"Ingestion job heartbeat failed: {str(e)}")
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self.store.claim(job_id)
+            if job is None:
+                continue
+            self._active[job.id] = job
+            try:
+                await self._run(job)
+            finally:
+                del self._active[job.id]
+
+    async def _run(self, job: Job) -> None:
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            self.store.finish(job.id, JOB_FAILED, error=f"Unknown job kind '{job.kind}'")
+            return
+
+        def checkpoint(stage: str, result: dict) -> None:
+            self.store.checkpoint(job.id, stage, result)
+            job.stage = stage
+            job.result.update(result)
+
+        try:
+            result = await handler(job, checkpoint)
+        except asyncio.CancelledError:
+            # Shutting down: the handler's blocking work may still be running
+            # in a thread, so keep the job leased until the lease expires
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            logger.warning(f"Ingestion job {job.id} failed at stage {job.stage}: {error}")
+            traceback.print_exc()
+            if job.attempts < self.max_attempts:
+                self.store.requeue(job.id, error)
+                self._retry_later(job.id, self.retry_backoff_seconds * 2 ** (job.attempts - 1))
+            else:
+                self.store.finish(job.id, JOB_FAILED, error=error)
+            return
+        self.store.finish(job.id, JOB_SUCCEEDED, result=result or {})
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "active": len(self._active),
+            "owner": self.store.owner,
+            "queued_in_memory": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": self.store.counts(),
+        }
+
+
+# Shared by the upload endpoints and the /jobs status endpoints
+ingest_queue = JobQueue(JobStore())
@@ -0,0 +1,139 @@
+"""
+Deterministic ingestion pipeline: ensure corpus -> import -> verify.
+
+Uploads always follow the same steps, so they call the corpus tools in code
+instead of asking the upload agent to choose them; the agent is only needed
+for free-form, chat-driven corpus management.
+"""
+
+from typing import List, Optional
+
+from google.adk.tools.tool_context import ToolContext
+
+from ..tools.add_data import add_data
+from ..tools.create_corpus import create_corpus
+from ..tools.get_corpus_info import get_corpus_info
+from ..tools.utils import StateToolContext, check_corpus_exists
+
+
+class IngestionError(RuntimeError):
+    """A pipeline step reported an error."""
+
+
+def new_tool_context() -> StateToolContext:
+    """Fresh tool context for calling tools outside an agent run."""
+    return StateToolContext()
+
+
+def ensure_corpus(corpus_name: str, tool_context: ToolContext) -> bool:
+    """
+    Create the corpus unless it already exists.
+
+    Returns:
+        bool: True if the corpus was created
+    """
+    if check_corpus_exists(corpus_name, tool_context):
+        return False
+    result = create_corpus(corpus_name, tool_context)
+    if result["status"] == "error":
+        raise IngestionError(result["message"])
+    return bool(result.get("corpus_created"))
+
+
+def import_documents(
+    corpus_name: str,
+    gcs_uris: List[str],
+    tool_context: ToolContext,
+    document_ids: Optional[List[Optional[str]]] = None,
+) -> dict:
+    """
+    Import GCS files into the corpus with the add_data tool.
+
+    `document_ids`, in the order of `gcs_uris`, name the documents the files
+    are revisions of (None for files without one).
+    """
+    result = add_data(
+        corpus_name,
+        paths=gcs_uris,
+        tool_context=tool_context,
+        document_ids=[document_id or "" for document_id in document_ids or []],
+    )
+    if result["status"] != "success":
+        raise IngestionError(result["message"])
+    return result
+
+
+def verify_documents(
+    corpus_name: str,
+    gcs_uris: List[str],
+    tool_context: ToolContext,
+) -> dict:
+    """
+    Check that every file is now listed in the corpus.
+
+    Files are matched on their exact source URI only: a same-named file from
+    another upload does not verify this one.
+
+    Returns:
+        dict: The corpus file count, the URIs that are missing and the RAG
+        file id of each URI that was found
+    """
+    info = get_corpus_info(corpus_name, tool_context)
+    if info.get("status") != "success":
+        raise IngestionError(info.get("message", "Could not read corpus info"))
+
+    listed = {
+        rag_file["source_uri"]: rag_file.get("file_id")
+        for rag_file in info.get("files", [])
+        if rag_file.get("source_uri")
+    }
+    file_ids = {}
+    missing = []
+    for uri in gcs_uris:
+        if uri in listed:
+            file_ids[uri] = listed[uri]
+        else:
+            missing.append(uri)
+    return {"file_count": info.get("file_count", 0), "missing": missing, "file_ids": file_ids}
+
+
+def ensure_and_import(
+    corpus_name: str,
+    gcs_uris: List[str],
+    document_ids: Optional[List[Optional[str]]] = None,
+) -> dict:
+    """
+    Create the corpus if needed and import the files (blocking).
+
+    See import_documents() for `document_ids`.
+
+    Returns:
+        dict: corpus_created, files_added, local_index and the near-duplicate
+        URIs that were left out
+    """
+    tool_context = new_tool_context()
+    corpus_created = ensure_corpus(corpus_name, tool_context)
+    imported = import_documents(corpus_name, gcs_uris, tool_context, document_ids)
+    return {
+        "corpus_created": corpus_created,
+        "files_added": imported.get("files_added"),
+        "local_index": imported.get("local_index"),
+        "near_duplicates": imported.get("near_duplicates", {}).get("dropped", []),
+    }
+
+
+def ingest_gcs_uris(corpus_name: str, gcs_uris: List[str]) -> dict:
+    """
+    Run the whole pipeline for files already in GCS (blocking).
+
+    Returns:
+        dict: corpus_created, files_added, local_index and verification
+    """
+    result = ensure_and_import(corpus_name, gcs_uris)
+    imported_uris = [uri for uri in gcs_uris if uri not in result["near_duplicates"]]
+    verification = verify_documents(corpus_name, imported_uris, new_tool_context())
+    if verification["missing"]:
+        raise IngestionError(
+            f"Files not found in corpus after import: {verification['missing']}"
+        )
+    return dict(result, verification=verification)
@@ -0,0 +1,234 @@
+"""
+Incremental sync of a GCS prefix into a corpus.
+
+Each run lists the prefix (names, generations and hashes only) and diffs it
+against the sync state persisted by the previous run:
+
+- objects not synced yet are imported
+- objects with a new generation and different content are re-imported (the
+  old RAG file is deleted first); a new generation with the same hash, e.g.
+  a metadata update or a rewrite, only updates the state
+- RAG files whose source object is gone are deleted
+
+The state mirrors what the corpus holds. It is reconciled against
+rag.list_files on the first run, every SYNC_RECONCILE_SECONDS, and whenever
+file ids are needed for deletions, which also picks up files that were
+removed from or added to the corpus by other means. Between reconciles a run
+with no changes costs one listing and a diff, so it can be scheduled every
+minute on large prefixes.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from vertexai import rag
+
+from ..concurrency import run_blocking
+from ..config import (
+    IMPORT_BATCH_MAX_PATHS,
+    SYNC_PARALLEL_BATCHES,
+    SYNC_RECONCILE_SECONDS,
+)
+from ..gcs import get_storage_client
+from ..tools.delete_document import delete_document
+from ..tools.sync_state import sync_state
+from ..tools.utils import get_corpus_resource_name, split_gcs_uri
+from .jobs import JOB_QUEUED, JOB_RUNNING, Checkpoint, Job, ingest_queue
+from .pipeline import IngestionError, ensure_corpus, import_documents, new_tool_context
+
+logger = logging.getLogger(__name__)
+
+
+def list_prefix(gcs_prefix: str) -> Dict[str, dict]:
+    """Objects under a gs:// prefix: uri -> generation and content_hash."""
+    bucket, prefix = split_gcs_uri(gcs_prefix)
+    blobs = get_storage_client().list_blobs(
+        bucket, prefix=prefix, fields="items(name,generation,md5Hash,crc32c),nextPageToken"
+    )
+    objects = {}
+    for blob in blobs:
+        if blob.name.endswith("/"):
+            continue
+        # Composite objects have no MD5; their CRC32C still tracks the content
+        content_hash = f"md5:{blob.md5_hash}" if blob.md5_hash else f"crc32c:{blob.crc32c}"
+        objects[f"gs://{bucket}/{blob.name}"] = {
+            "generation": str(blob.generation),
+            "content_hash": content_hash,
+        }
+    return objects
+
+
+def list_corpus_files(corpus_resource_name: str, gcs_prefix: str) -> Dict[str, str]:
+    """RAG files imported from under the prefix: source uri -> file id."""
+    files = {}
+    for rag_file in rag.list_files(corpus_resource_name):
+        source_uri = getattr(rag_file, "source_uri", None) or ""
+        if source_uri.startswith(gcs_prefix):
+            files[source_uri] = rag_file.name.split("/")[-1]
+    return files
+
+
+def sync_prefix(corpus_name: str, gcs_prefix: str, reconcile: bool = False) -> dict:
+    """
+    Bring the corpus in line with the objects under `gcs_prefix` (blocking).
+
+    Args:
+        corpus_name (str): Corpus to sync into; created if missing
+        gcs_prefix (str): gs://bucket/prefix to mirror
+        reconcile (bool): Compare against rag.list_files even if not due
+
+    Returns:
+        dict: Counts of listed, imported, re-imported, deleted, unchanged and
+        failed objects
+    """
+    started = time.monotonic()
+    ensure_corpus(corpus_name, new_tool_context())
+    corpus = get_corpus_resource_name(corpus_name)
+
+    listing = list_prefix(gcs_prefix)
+    state = sync_state.load(corpus, gcs_prefix)
+    last_reconciled = sync_state.reconciled_at(corpus, gcs_prefix)
+    reconcile = (
+        reconcile
+        or last_reconciled is None
+        or time.time() - last_reconciled >= SYNC_RECONCILE_SECONDS
+    )
+    corpus_files = list_corpus_files(corpus, gcs_prefix) if reconcile else None
+
+    new: List[str] = []
+    changed: List[str] = []
+    refreshed: Dict[str, dict] = {}
+    adopted: Dict[str, dict] = {}
+    for uri, obj in listing.items():
+        known = state.get(uri)
+        if known is None or (corpus_files is not None and uri not in corpus_files):
+            if corpus_files is not None and uri in corpus_files and known is None:
+                # Already in the corpus (imported some other way); take it over
+                adopted[uri] = dict(obj, file_id=corpus_files[uri])
+            else:
+                new.append(uri)
+        elif known["generation"] != obj["generation"]:
+            if known["content_hash"] == obj["content_hash"]:
+                refreshed[uri] = dict(obj, file_id=known["file_id"])
+            else:
+                changed.append(uri)
+
+    vanished = [uri for uri in state if uri not in listing]
+    if corpus_files is not None:
+        # Corpus files whose objects are gone but that the state never knew
+        vanished += [uri for uri in corpus_files if uri not in listing and uri not in state]
+
+    def file_id(uri: str) -> Optional[str]:
+        known = state.get(uri)
+        if known is not None and known["file_id"]:
+            return known["file_id"]
+        return corpus_files.get(uri) if corpus_files is not None else None
+
+    stale = vanished + changed
+    if corpus_files is None and any(file_id(uri) is None for uri in stale):
+        # Files imported by earlier runs have no id yet
+        corpus_files = list_corpus_files(corpus, gcs_prefix)
+        reconcile = True
+
+    sync_state.upsert(corpus, dict(refreshed, **adopted))
+    if corpus_files is not None:
+        sync_state.set_file_ids(corpus, {uri: fid for uri, fid in corpus_files.items() if uri in state})
+
+    failed: List[dict] = []
+
+    def remove(uri: str) -> bool:
+        fid = file_id(uri)
+        if fid is not None:
+            result = delete_document(corpus, fid, new_tool_context())
+            if result["status"] != "success":
+                failed.append({"uri": uri, "error": result["message"]})
+                return False
+        sync_state.delete(corpus, [uri])
+        return True
+
+    def add(paths: List[str]) -> int:
+        try:
+            import_documents(corpus_name, paths, new_tool_context())
+        except Exception as e:
+            logger.warning(f"Sync into '{corpus_name}': import of {len(paths)} object(s) failed: {e}")
+            failed.extend({"uri": uri, "error": str(e)} for uri in paths)
+            return 0
+        # Ids are filled in by the next reconcile
+        sync_state.upsert(corpus, {uri: dict(listing[uri], file_id=None) for uri in paths})
+        return len(paths)
+
+    with ThreadPoolExecutor(max_workers=SYNC_PARALLEL_BATCHES, thread_name_prefix="gcs-sync") as pool:
+        removed = list(pool.map(remove, stale))
+        # A changed object is only re-imported once its old file is gone
+        to_import = new + [uri for uri, ok in zip(stale[len(vanished):], removed[len(vanished):]) if ok]
+        batches = [
+            to_import[start:start + IMPORT_BATCH_MAX_PATHS]
+            for start in range(0, len(to_import), IMPORT_BATCH_MAX_PATHS)
+        ]
+        imported = sum(pool.map(add, batches))
+
+    sync_state.mark_run(corpus, gcs_prefix, reconciled=reconcile)
+    summary = {
+        "listed": len(listing),
+        "new": len(new),
+        "changed": len(changed),
+        "imported": imported,
+        "deleted": sum(removed[:len(vanished)]),
+        "metadata_only": len(refreshed),
+        "adopted": len(adopted),
+        "unchanged": len(listing) - len(new) - len(changed) - len(refreshed) - len(adopted),
+        "failed": failed[:100],
+        "reconciled": reconcile,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+    print(
+        f"🔄 Synced {gcs_prefix} into '{corpus_name}': {summary['imported']} imported, "
+        f"{summary['deleted']} deleted, {summary['unchanged']} unchanged"
+    )
+    return summary
+
+
+async def process_sync_job(job: Job, checkpoint: Checkpoint) -> dict:
+    """
+    Ingestion job for one sync run.
+
+    A run only records objects in the sync state once they are handled, so
+    a retry simply diffs again and picks up what is left.
+    """
+    result = await run_blocking(
+        sync_prefix,
+        job.payload["corpus_name"],
+        job.payload["gcs_prefix"],
+        job.payload.get("reconcile", False),
+    )
+    if result["failed"]:
+        checkpoint("sync", {"last_attempt": result})
+        raise IngestionError(f"{len(result['failed'])} object(s) failed to sync")
+    return result
+
+
+def submit_sync(corpus_name: str, gcs_prefix: str, reconcile: bool = False) -> Job:
+    """
+    Queue a sync run, unless one for the same prefix is already pending.
+
+    Returns:
+        Job: The new job, or the queued or running one for this prefix
+    """
+    for status in (JOB_QUEUED, JOB_RUNNING):
+        for job in ingest_queue.store.list(status=status, limit=500):
+            if (
+                job.kind == "gcs_sync"
+                and job.payload.get("corpus_name") == corpus_name
+                and job.payload.get("gcs_prefix") == gcs_prefix
+            ):
+                return job
+    return ingest_queue.submit("gcs_sync", {
+        "corpus_name": corpus_name,
+        "gcs_prefix": gcs_prefix,
+        "reconcile": reconcile,
+    })
+
+
+ingest_queue.register("gcs_sync", process_sync_job)
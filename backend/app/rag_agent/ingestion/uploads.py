@@ -0,0 +1,420 @@
+"""
+Streaming upload receiver: multipart body -> GCS resumable upload.
+
+The request body is parsed incrementally and every file part is written to
+a GCS resumable upload as its bytes arrive, hashed on the way through. Only
+a couple of upload chunks per in-flight file are buffered, and the body is
+read no faster than GCS accepts it, so memory stays bounded no matter how
+large the PDF is. Nothing is written to local disk
+unless RAG_UPLOAD_KEEP_LOCAL is set.
+
+When a digest lookup is given, a file whose bytes are already known is
+dropped. A file smaller than one upload chunk is hashed before anything is
+sent to GCS, so a duplicate costs no GCS request at all; a larger duplicate
+has already been partly uploaded, so its object is committed and deleted.
+"""
+
+import asyncio
+import os
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from ..concurrency import run_blocking
+from ..config import UPLOAD_CHUNK_SIZE, UPLOAD_CONCURRENCY, UPLOAD_DIR, UPLOAD_KEEP_LOCAL
+from ..gcs import get_storage_client, upload_bucket_name
+from ..models.document import is_supported_content_type, new_content_digest
+
+# GCS resumable uploads take chunks in multiples of 256 KiB
+_GCS_CHUNK_GRANULARITY = 256 * 1024
+# Plain form fields are kept in memory, so cap them
+MAX_FIELD_SIZE = 64 * 1024
+
+
+class UploadRejected(ValueError):
+    """The request body is not an acceptable upload (maps to HTTP 400)."""
+
+
+@dataclass
+class StreamedFile:
+    """One file part that was written to GCS."""
+
+    field_name: str
+    filename: str
+    content_type: str
+    gcs_uri: str
+    sha256: str
+    size: int
+    local_path: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class FailedUpload:
+    """A file part that could not be uploaded."""
+
+    filename: str
+    error: str
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class DeduplicatedUpload:
+    """A file part whose content is already stored; no object was kept."""
+
+    filename: str
+    sha256: str
+    size: int
+    duplicate_of: dict
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class StreamedUpload:
+    """Outcome of streaming one multipart request."""
+
+    files: List[StreamedFile] = field(default_factory=list)
+    failed: List[FailedUpload] = field(default_factory=list)
+    deduplicated: List[DeduplicatedUpload] = field(default_factory=list)
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+def _upload_chunk_size() -> int:
+    return max(_GCS_CHUNK_GRANULARITY, UPLOAD_CHUNK_SIZE // _GCS_CHUNK_GRANULARITY * _GCS_CHUNK_GRANULARITY)
+
+
+class _GCSUploadSink:
+    """
+    Resumable GCS upload (and optional local copy) for one file part.
+
+    The resumable upload is only started once a full chunk has arrived;
+    until then the bytes stay in `head`, so a file smaller than one chunk
+    reaches GCS only when close() commits it.
+    """
+
+    def __init__(self, field_name: str, filename: str, content_type: str, keep_local: bool):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.bucket_name = upload_bucket_name()
+        self.gcs_path = f"uploads/{uuid.uuid4()}/{filename}"
+        self.blob = get_storage_client().bucket(self.bucket_name).blob(self.gcs_path)
+        self.chunk_size = _upload_chunk_size()
+        self.writer = None
+        self.head = bytearray()
+        self.digest = new_content_digest()
+        self.size = 0
+        self.local_path = None
+        self.local_file = None
+        if keep_local:
+            # One directory per upload so files with the same name never collide
+            upload_dir = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+            os.makedirs(upload_dir, exist_ok=True)
+            self.local_path = os.path.join(upload_dir, filename)
+            self.local_file = open(self.local_path, "wb")
+
+    @property
+    def gcs_uri(self) -> str:
+        return f"gs://{self.bucket_name}/{self.gcs_path}"
+
+    def _start_upload(self) -> None:
+        self.writer = self.blob.open("wb", chunk_size=self.chunk_size, content_type=self.content_type)
+        self.writer.write(bytes(self.head))
+        self.head = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.digest.update(data)
+        self.size += len(data)
+        if self.writer is not None:
+            self.writer.write(data)
+        else:
+            self.head.extend(data)
+            if len(self.head) >= self.chunk_size:
+                self._start_upload()
+        if self.local_file is not None:
+            self.local_file.write(data)
+
+    def close(self) -> StreamedFile:
+        """Finish the resumable upload (blocking I/O)."""
+        if self.writer is None:
+            self._start_upload()
+        self.writer.close()
+        if self.local_file is not None:
+            self.local_file.close()
+        print(f"Streamed to GCS: {self.gcs_uri} ({self.size} bytes)")
+        return StreamedFile(
+            field_name=self.field_name,
+            filename=self.filename,
+            content_type=self.content_type,
+            gcs_uri=self.gcs_uri,
+            sha256=self.digest.hexdigest(),
+            size=self.size,
+            local_path=self.local_path,
+        )
+
+    def discard(self) -> None:
+        """Drop the upload, leaving no object behind (blocking I/O)."""
+        if self.local_file is not None:
+            self.local_file.close()
+            _remove_quietly(self.local_path)
+        self.head = bytearray()
+        if self.writer is None:
+            return  # Nothing reached GCS
+        # BlobWriter cannot cancel a resumable upload, and closing it (which
+        # its finaliser would do anyway) commits the object, so commit and
+        # delete it
+        try:
+            self.writer.close()
+            self.blob.delete()
+        except Exception as e:
+            print(f"⚠️ Could not delete discarded upload {self.gcs_uri}: {e}")
+
+
+def _remove_quietly(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def delete_streamed(files: List[StreamedFile]) -> None:
+    """Remove uploads of a rejected request from GCS (blocking, best effort)."""
+    bucket = get_storage_client().bucket(upload_bucket_name())
+    for file in files:
+        _remove_quietly(file.local_path)
+        try:
+            bucket.blob(file.gcs_uri.split("/", 3)[3]).delete()
+        except Exception as e:
+            print(f"⚠️ Could not delete {file.gcs_uri}: {e}")
+
+
+def _parse_disposition(value: bytes) -> Tuple[str, Optional[str]]:
+    _, options = parse_options_header(value)
+    name = options.get(b"name", b"").decode("latin-1")
+    filename = options.get(b"filename")
+    if filename is not None:
+        filename = os.path.basename(filename.decode("utf-8", errors="replace").replace("\\", "/"))
+    return name, filename
+
+
+async def _upload_part(
+    field_name: str,
+    filename: str,
+    content_type: str,
+    keep_local: bool,
+    chunks: asyncio.Queue,
+    slots: asyncio.Semaphore,
+    lookup_digest: Optional[Callable[[str], Optional[dict]]],
+    seen: Dict[str, dict],
+) -> Union[StreamedFile, DeduplicatedUpload]:
+    """Write the chunks of one file part to GCS until the None sentinel."""
+    async with slots:
+        sink = None
+        try:
+            sink = await run_blocking(_GCSUploadSink, field_name, filename, content_type, keep_local)
+            while (data := await chunks.get()) is not None:
+                await run_blocking(sink.write, data)
+            if sink.size == 0:
+                raise UploadRejected(f"Empty file: {filename}")
+
+            digest = sink.digest.hexdigest()
+            # Same bytes earlier in this request, or already in the corpus
+            duplicate_of = seen.get(digest)
+            if duplicate_of is None:
+                seen[digest] = {"filename": filename}
+                if lookup_digest is not None:
+                    duplicate_of = await run_blocking(lookup_digest, digest)
+            if duplicate_of is not None:
+                await run_blocking(sink.discard)
+                print(f"♻️ Deduplicated {filename} (sha256 {digest[:12]}…)")
+                return DeduplicatedUpload(filename, digest, sink.size, duplicate_of)
+            return await run_blocking(sink.close)
+        except BaseException:
+            if sink is not None:
+                await run_blocking(sink.discard)
+            # Unblock the request reader; it stops feeding a finished task
+            while not chunks.empty():
+                chunks.get_nowait()
+            raise
+
+
+def _error_message(error: BaseException) -> str:
+    if isinstance(error, UploadRejected):
+        return str(error)
+    return f"{type(error).__name__}: {str(error)}"
+
+
+async def stream_multipart_to_gcs(
+    content_type_header: str,
+    body: AsyncIterator[bytes],
+    keep_local: Optional[bool] = None,
+    concurrency: Optional[int] = None,
+    lookup_digest: Optional[Callable[[str], Optional[dict]]] = None,
+) -> StreamedUpload:
+    """
+    Stream every file part of a multipart/form-data body into GCS.
+
+    Each file part is written by its own task, so finishing one file's
+    upload overlaps with receiving the next; at most `concurrency` files are
+    in flight and each holds only a couple of chunks. A file that fails
+    (unsupported type, empty, GCS error) is reported in `failed` without
+    affecting the others. A file whose digest was already seen in the
+    request or is found by `lookup_digest` is reported in `deduplicated`
+    and not stored.
+
+    Args:
+        content_type_header (str): The request's Content-Type header
+        body (AsyncIterator[bytes]): The raw request body, e.g. request.stream()
+        keep_local (bool, optional): Also write each file under UPLOAD_DIR;
+            defaults to RAG_UPLOAD_KEEP_LOCAL
+        concurrency (int, optional): Files uploaded at once; defaults to
+            RAG_UPLOAD_CONCURRENCY
+        lookup_digest (Callable, optional): Blocking digest -> stored file
+            lookup, e.g. the corpus content index
+
+    Returns:
+        StreamedUpload: Uploaded files and failures in request order, plus
+        the plain form fields
+
+    Raises:
+        UploadRejected: If the body is not multipart or a form field is too
+            large; nothing is left in GCS
+    """
+    mime_type, options = parse_options_header(content_type_header or "")
+    boundary = options.get(b"boundary")
+    if mime_type != b"multipart/form-data" or not boundary:
+        raise UploadRejected("Expected a multipart/form-data body")
+
+    if keep_local is None:
+        keep_local = UPLOAD_KEEP_LOCAL
+    slots = asyncio.Semaphore(max(1, concurrency or UPLOAD_CONCURRENCY))
+    chunk_size = _upload_chunk_size()
+    events: List[Tuple[str, bytes]] = []
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        events.append(("header", (bytes(header_field).lower(), bytes(header_value))))
+        header_field.clear()
+        header_value.clear()
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": lambda: events.append(("begin", b"")),
+        "on_part_data": lambda data, start, end: events.append(("data", bytes(data[start:end]))),
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("headers_finished", b"")),
+        "on_part_end": lambda: events.append(("end", b"")),
+    })
+
+    # One entry per file part: (filename, upload task or rejection message)
+    parts: List[Tuple[str, Union[asyncio.Task, str]]] = []
+    fields: Dict[str, str] = {}
+    headers: Dict[bytes, bytes] = {}
+    chunks: Optional[asyncio.Queue] = None
+    upload_task: Optional[asyncio.Task] = None
+    seen: Dict[str, dict] = {}
+    in_file = False
+    field_name: Optional[str] = None
+    field_value = bytearray()
+    pending = bytearray()
+
+    try:
+        async for chunk in body:
+            parser.write(chunk)
+            for kind, data in events:
+                if kind == "begin":
+                    headers = {}
+                elif kind == "header":
+                    headers[data[0]] = data[1]
+                elif kind == "headers_finished":
+                    name, filename = _parse_disposition(headers.get(b"content-disposition", b""))
+                    in_file = filename is not None
+                    if not in_file:
+                        field_name = name
+                        field_value.clear()
+                        continue
+                    part_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+                    if not is_supported_content_type(part_type):
+                        # Skip the part's bytes; the rest of the batch goes on
+                        parts.append((filename, f"Invalid file: {filename}"))
+                        chunks = None
+                        continue
+                    # A one-chunk queue: the body is read no faster than GCS takes it
+                    chunks = asyncio.Queue(maxsize=1)
+                    upload_task = asyncio.ensure_future(_upload_part(
+                        name, filename, part_type, keep_local, chunks, slots,
+                        lookup_digest, seen,
+                    ))
+                    parts.append((filename, upload_task))
+                elif kind == "data":
+                    if not in_file:
+                        field_value.extend(data)
+                        if len(field_value) > MAX_FIELD_SIZE:
+                            raise UploadRejected(f"Form field '{field_name}' is too large")
+                    elif chunks is not None:
+                        pending.extend(data)
+                        if len(pending) >= chunk_size:
+                            if not upload_task.done():
+                                await chunks.put(bytes(pending))
+                            pending.clear()
+                elif kind == "end":
+                    if not in_file:
+                        fields[field_name] = field_value.decode("utf-8", errors="replace")
+                    elif chunks is not None:
+                        if not upload_task.done():
+                            if pending:
+                                await chunks.put(bytes(pending))
+                            await chunks.put(None)
+                        pending.clear()
+                        chunks = None
+                    in_file = False
+            events.clear()
+        parser.finalize()
+        if in_file:
+            raise UploadRejected("Truncated multipart body")
+    except BaseException:
+        tasks = [task for _, task in parts if isinstance(task, asyncio.Task)]
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        finished = [result for result in results if isinstance(result, StreamedFile)]
+        if finished:
+            await run_blocking(delete_streamed, finished)
+        raise
+
+    upload = StreamedUpload(fields=fields)
+    for filename, task in parts:
+        if isinstance(task, str):
+            upload.failed.append(FailedUpload(filename, task))
+            continue
+        try:
+            result = await task
+        except Exception as e:
+            print(f"❌ Upload of {filename} failed: {_error_message(e)}")
+            upload.failed.append(FailedUpload(filename, _error_message(e)))
+            continue
+        if isinstance(result, DeduplicatedUpload):
+            upload.deduplicated.append(result)
+        else:
+            upload.files.append(result)
+    return upload
@@ -0,0 +1,154 @@
+"""
+Local, token-aware chunking of extracted documents.
+
+Chunking otherwise happens inside rag.import_files, where its boundaries are
+invisible. This stage splits the pages produced by iter_pages into windows
+of DEFAULT_CHUNK_SIZE tokens overlapping by DEFAULT_CHUNK_OVERLAP tokens, the
+same settings the imports use, so local indexes, caches and de-duplication
+can work with chunk records of their own.
+
+Tokens are runs of word characters and single punctuation marks, a close
+stand-in for the embedding model's sub-word tokens that needs no tokenizer.
+Pages are consumed as they arrive: token spans are kept in NumPy arrays, the
+windows that are complete are cut out in one vectorised step per page, and
+only the tokens a later window still needs are carried over.
+"""
+
+import hashlib
+import re
+from dataclasses import asdict, dataclass
+from typing import Iterable, Iterator, List
+
+import numpy as np
+
+from ..config import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Version of the chunking rules; ids only compare within one version
+CHUNKER_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A window of a document's text.
+
+    id is a hash of the chunk's whitespace-normalised text, so it is the same
+    for the same content whatever document or position it comes from.
+    start and end are character offsets into the text extract_text returns
+    for the document; pages are numbered from 1.
+    """
+
+    id: str
+    index: int
+    text: str
+    start: int
+    end: int
+    page_start: int
+    page_end: int
+    token_count: int
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def chunk_id(text: str) -> str:
+    """Stable id of a chunk's content."""
+    normalized = " ".join(text.split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def tokenize(text: str) -> List[str]:
+    """The tokens chunk sizes are counted in."""
+    return _TOKEN.findall(text)
+
+
+def _token_spans(text: str) -> np.ndarray:
+    """(start, end) character offsets of every token, as an (n, 2) array."""
+    spans = np.fromiter(
+        (offset for match in _TOKEN.finditer(text) for offset in match.span()),
+        dtype=np.int64,
+    )
+    return spans.reshape(-1, 2)
+
+
+def iter_chunks(
+    pages: Iterable[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+) -> Iterator[Chunk]:
+    """
+    Split a document's pages into overlapping token windows.
+
+    Args:
+        pages (Iterable[str]): Page texts in order, e.g. iter_pages(path)
+        chunk_size (int): Tokens per chunk
+        chunk_overlap (int): Tokens shared by consecutive chunks
+
+    Yields:
+        Chunk: Non-empty chunks in document order
+    """
+    chunk_size = max(chunk_size, 1)
+    chunk_overlap = min(max(chunk_overlap, 0), chunk_size - 1)
+    step = chunk_size - chunk_overlap
+
+    # Tokens not yet covered by every window that needs them: document
+    # offsets and page numbers, plus the text they were cut from
+    starts = np.empty(0, dtype=np.int64)
+    ends = np.empty(0, dtype=np.int64)
+    page_numbers = np.empty(0, dtype=np.int64)
+    text = ""
+    text_offset = 0
+    document_offset = 0
+    index = 0
+
+    def cut(window_starts: np.ndarray) -> Iterator[Chunk]:
+        nonlocal index
+        window_ends = np.minimum(window_starts + chunk_size, len(starts)) - 1
+        char_starts, char_ends = starts[window_starts], ends[window_ends]
+        first_pages, last_pages = page_numbers[window_starts], page_numbers[window_ends]
+        for i in range(len(window_starts)):
+            chunk_text = text[char_starts[i] - text_offset:char_ends[i] - text_offset]
+            yield Chunk(
+                id=chunk_id(chunk_text),
+                index=index,
+                text=chunk_text,
+                start=int(char_starts[i]),
+                end=int(char_ends[i]),
+                page_start=int(first_pages[i]),
+                page_end=int(last_pages[i]),
+                token_count=int(window_ends[i] - window_starts[i] + 1),
+            )
+            index += 1
+
+    for page_number, page in enumerate(pages, start=1):
+        spans = _token_spans(page) + document_offset
+        document_offset += len(page)
+        # Blank pages too, so text keeps lining up with document offsets
+        text += page
+        if not len(spans):
+            continue
+        starts = np.concatenate((starts, spans[:, 0]))
+        ends = np.concatenate((ends, spans[:, 1]))
+        page_numbers = np.concatenate((page_numbers, np.full(len(spans), page_number)))
+
+        # Windows that are complete now; the next one starts after the last
+        complete = np.arange(0, len(starts) - chunk_size + 1, step)
+        if not len(complete):
+            continue
+        yield from cut(complete)
+        keep = int(complete[-1]) + step
+        if keep < len(starts):
+            text = text[int(starts[keep]) - text_offset:]
+            text_offset = int(starts[keep])
+        else:
+            text, text_offset = "", document_offset
+        starts, ends, page_numbers = starts[keep:], ends[keep:], page_numbers[keep:]
+
+    # The tail: windows until one reaches the end, without a last window that
+    # only repeats the previous one's overlap
+    if index == 0:
+        last_start = max(len(starts) - chunk_overlap, 1) if len(starts) else 0
+    else:
+        last_start = len(starts) - chunk_overlap
+    yield from cut(np.arange(0, max(last_start, 0), step))
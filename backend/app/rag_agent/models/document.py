@@ -1,13 +1,27 @@
 import os
 import hashlib
 import logging
-from typing import Optional, Tuple
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from pydantic import BaseModel
-from PyPDF2 import PdfReader
+from PyPDF2 import PageObject, PdfReader, __version__ as pypdf2_version
+from PyPDF2.generic import IndirectObject, NameObject
 from docx import Document as DocxDocument
 from fastapi import HTTPException, UploadFile
 
+from ..config import (
+    EXTRACTION_CACHE_ENABLED,
+    EXTRACT_PAGES_PER_TASK,
+    EXTRACT_PARALLEL_MIN_PAGES,
+    EXTRACT_PROCESS_WORKERS,
+)
+from .extraction_cache import extraction_cache
+
 
 class DocumentModel(BaseModel):
     """Document model for processing and storage."""
@@ -23,6 +37,48 @@ class DocumentModel(BaseModel):
         return hash_obj.hexdigest()
 
 
+# Digest used to recognise uploads with identical bytes
+CONTENT_DIGEST_ALGORITHM = "sha256"
+
+
+def new_content_digest():
+    """Incremental hash for content digests; feed it with update()."""
+    return hashlib.new(CONTENT_DIGEST_ALGORITHM)
+
+
+def content_digest(chunks: Iterable[bytes]) -> str:
+    """Hex digest of a document's raw bytes, read chunk by chunk.
+
+    Args:
+        chunks: The document's bytes in order, e.g. an open file read in blocks
+
+    Returns:
+        str: Hex digest that identifies the content
+    """
+    digest = new_content_digest()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_content_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Content digest of a file on disk, without loading it whole."""
+    with open(path, "rb") as f:
+        return content_digest(iter(lambda: f.read(chunk_size), b""))
+
+
+SUPPORTED_CONTENT_TYPES: frozenset[str] = frozenset({
+    "text/plain",
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+})
+
+
+def is_supported_content_type(content_type: Optional[str]) -> bool:
+    """Check a MIME type against the supported document types."""
+    return content_type in SUPPORTED_CONTENT_TYPES
+
+
 def validate_document(file: UploadFile) -> bool:
     """Validate if the file type is supported.
 
@@ -32,12 +88,7 @@ def validate_document(file: UploadFile) -> bool:
     Returns:
         bool: True if file type is supported, False otherwise
     """
-    supported_types: set[str] = {
-        "text/plain",
-        "application/pdf",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    }
-    return file.content_type in supported_types
+    return is_supported_content_type(file.content_type)
 
 
 def get_file_extension(filename):
@@ -54,40 +105,158 @@ def get_file_extension(filename):
     return os.path.splitext(filename)[-1].lower()
 
 
-def extract_text(file: str) -> Tuple[str, str]:
-    """Extract text content from a file.
+# Part of every extraction cache key: bump it when extraction output changes
+EXTRACTOR_VERSION = f"1:pypdf2-{pypdf2_version}:python-docx-{version('python-docx')}"
+
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """Process pool for PDF page ranges, created on first use."""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            # Not fork: the server process has threads holding locks
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _extract_pool
+
+
+# Page attributes a page takes from its nearest ancestor in the page tree
+_INHERITABLE_PAGE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+def _load_pdf_page(reader: PdfReader, idnum: int, generation: int) -> PageObject:
+    """Load one page by object reference, without flattening the page tree."""
+    reference = IndirectObject(idnum, generation, reader)
+    page = PageObject(reader, reference)
+    page.update(reference.get_object())
+    parent = page.get("/Parent")
+    while parent is not None:
+        parent = parent.get_object()
+        for key in _INHERITABLE_PAGE_ATTRIBUTES:
+            if key in parent and key not in page:
+                page[NameObject(key)] = parent[key]
+        parent = parent.get("/Parent")
+    return page
+
+
+def _extract_pdf_range(file: str, references: List[Tuple[int, int]]) -> List[str]:
+    """Texts of the referenced PDF pages; runs in an extraction process."""
+    with open(file, "rb") as f:
+        reader = PdfReader(f)
+        return [
+            _load_pdf_page(reader, idnum, generation).extract_text() or ""
+            for idnum, generation in references
+        ]
+
+
+def _iter_pdf_pages(file: str, workers: int) -> Iterator[str]:
+    with open(file, "rb") as f:
+        pages = PdfReader(f).pages
+        references = [page.indirect_reference for page in pages]
+        if (
+            workers <= 1
+            or len(pages) < EXTRACT_PARALLEL_MIN_PAGES
+            or any(reference is None for reference in references)
+        ):
+            for page in pages:
+                yield page.extract_text() or ""
+            return
+
+    # Processes get object references so none of them re-reads the page tree
+    references = [(reference.idnum, reference.generation) for reference in references]
+    pool = get_extract_pool()
+    pending = deque()
+    try:
+        # Ranges are yielded in order; only a couple per worker are in flight,
+        # so at most those pages are held in memory
+        for start in range(0, len(references), EXTRACT_PAGES_PER_TASK):
+            pending.append(pool.submit(
+                _extract_pdf_range, file, references[start:start + EXTRACT_PAGES_PER_TASK]
+            ))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _parse_pages(file: str, content_type: str, workers: int) -> Iterator[str]:
+    if content_type == ".pdf":
+        yield from _iter_pdf_pages(file, workers)
+    else:
+        doc = DocxDocument(file)
+        yield "\n".join(paragraph.text for paragraph in doc.paragraphs)
+
+
+def iter_pages(
+    file: str,
+    workers: Optional[int] = None,
+    digest: Optional[str] = None,
+) -> Iterator[str]:
+    """Extract text from a file page by page.
+
+    PDFs yield one text per page; large ones are split into page ranges that
+    are extracted in the process pool. Text and Word files have no pages and
+    yield their whole text once. Parsed PDF and Word files are kept in the
+    extraction cache, so the same bytes are only parsed once.
 
     Args:
         file: Path to the file
+        workers: Extraction processes for large PDFs (default
+            EXTRACT_PROCESS_WORKERS; 1 extracts in the calling thread)
+        digest: Content digest of the file, if already known
 
-    Returns:
-        Tuple[str, str]: Extracted text and content type
+    Yields:
+        str: The text of each page, in order
 
     Raises:
         HTTPException: If file processing fails
     """
     content_type = get_file_extension(file)
     logging.info(f"the file type is {content_type}")
+    if content_type not in (".txt", ".pdf", ".docx"):
+        raise HTTPException(status_code=400, detail="Unsupported file type")
     try:
         if content_type == ".txt":
             with open(file, "r", encoding="utf-8") as f:
-                return f.read(), content_type
-
-        elif content_type == ".pdf":
-            with open(file, "rb") as f:
-                pdf_reader = PdfReader(f)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                return text, content_type
+                yield f.read()
+            return
 
-        elif content_type == ".docx":
-            doc = DocxDocument(file)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            return text, content_type
+        pages = _parse_pages(
+            file, content_type, EXTRACT_PROCESS_WORKERS if workers is None else workers
+        )
+        if not EXTRACTION_CACHE_ENABLED:
+            yield from pages
+            return
 
+        digest = digest or file_content_digest(file)
+        cached = extraction_cache.get(digest, EXTRACTOR_VERSION)
+        if cached is not None:
+            yield from cached
         else:
-            raise HTTPException(status_code=400, detail="Unsupported file type")
+            yield from extraction_cache.put(digest, EXTRACTOR_VERSION, pages)
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+
+
+def extract_text(file: str) -> Tuple[str, str]:
+    """Extract text content from a file.
+
+    Args:
+        file: Path to the file
+
+    Returns:
+        Tuple[str, str]: Extracted text and content type
+
+    Raises:
+        HTTPException: If file processing fails
+    """
+    return "".join(iter_pages(file)), get_file_extension(file)
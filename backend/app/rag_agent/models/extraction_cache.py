@@ -0,0 +1,180 @@
+"""
+On-disk cache of extracted page text.
+
+Parsing a PDF or Word file is the expensive part of re-processing a
+document that was already seen: a re-upload, a re-sync or a re-chunk with
+new settings. The cache keeps the page texts of every parsed document keyed
+by the digest of its bytes and the extractor version, so the same bytes are
+parsed once per extractor version.
+
+Pages are stored as one zlib stream of length-prefixed UTF-8 texts, written
+and read incrementally, in SQLite next to the other stores. Once the cache
+grows past its size limit the least recently used documents are evicted.
+"""
+
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from ..config import EXTRACTION_CACHE_DB, EXTRACTION_CACHE_MAX_BYTES
+
+_LENGTH = struct.Struct(">I")
+_READ_BLOCK = 256 * 1024
+
+
+def decode_pages(blob: bytes) -> Iterator[str]:
+    """Page texts of a stored blob, decompressed incrementally."""
+    decompressor = zlib.decompressobj()
+    buffer = b""
+    for start in range(0, len(blob), _READ_BLOCK):
+        buffer += decompressor.decompress(blob[start:start + _READ_BLOCK])
+        while len(buffer) >= _LENGTH.size:
+            (length,) = _LENGTH.unpack_from(buffer)
+            if len(buffer) < _LENGTH.size + length:
+                break
+            yield buffer[_LENGTH.size:_LENGTH.size + length].decode("utf-8")
+            buffer = buffer[_LENGTH.size + length:]
+
+
+class ExtractionCache:
+    """
+    SQLite-backed (digest, extractor version) -> compressed pages cache.
+
+    The connection is opened on first use, so importing the module (as the
+    extraction processes do) costs nothing.
+    """
+
+    def __init__(self, path: str = EXTRACTION_CACHE_DB, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """The shared connection; the lock must be held."""
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    digest TEXT NOT NULL,
+                    extractor TEXT NOT NULL,
+                    pages INTEGER NOT NULL,
+                    text_bytes INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (digest, extractor)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS extraction_cache_lru ON extraction_cache (last_used)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, digest: str, extractor: str) -> Optional[Iterator[str]]:
+        """
+        Cached pages of a document.
+
+        Returns:
+            Optional[Iterator[str]]: The page texts in order, or None on a miss
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT data FROM extraction_cache WHERE digest = ? AND extractor = ?",
+                (digest, extractor),
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            conn.execute(
+                "UPDATE extraction_cache SET last_used = ? WHERE digest = ? AND extractor = ?",
+                (time.time(), digest, extractor),
+            )
+        return decode_pages(row[0])
+
+    def put(self, digest: str, extractor: str, pages: Iterable[str]) -> Iterator[str]:
+        """
+        Pass pages through while compressing them, and store the document
+        once the last page went by.
+
+        A document whose pages are not all consumed is not cached.
+
+        Yields:
+            str: The same page texts
+        """
+        compressor = zlib.compressobj(6)
+        parts = []
+        page_count = text_bytes = 0
+        for page in pages:
+            data = page.encode("utf-8")
+            parts.append(compressor.compress(_LENGTH.pack(len(data)) + data))
+            page_count += 1
+            text_bytes += len(data)
+            yield page
+        parts.append(compressor.flush())
+        blob = b"".join(parts)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, extractor, page_count, text_bytes, len(blob), blob, time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop least recently used documents until under the limit; the lock must be held."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT digest, extractor, size FROM extraction_cache ORDER BY last_used"
+        ).fetchall()
+        evict = []
+        for digest, extractor, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((digest, extractor))
+            total -= size
+        conn.executemany(
+            "DELETE FROM extraction_cache WHERE digest = ? AND extractor = ?", evict
+        )
+        self._evictions += len(evict)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size, text_bytes = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(text_bytes), 0) "
+                "FROM extraction_cache"
+            ).fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "compression_ratio": text_bytes / size if size else 0.0,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+# Shared by every extraction in the process
+extraction_cache = ExtractionCache()
@@ -0,0 +1,93 @@
+"""
+Retrieval backends behind the rag_query tool.
+
+The backend is selected with RAG_RETRIEVAL_BACKEND ("vertex" or "local"),
+optionally wrapped in hybrid BM25 fusion with RAG_HYBRID_RETRIEVAL=true.
+"""
+
+from typing import Optional
+
+from ..config import HYBRID_RETRIEVAL, RETRIEVAL_BACKEND
+from .base import RetrievalBackend
+from .bm25 import BM25Index
+from .cache import RetrievalCache, retrieval_cache
+from .embedders import Embedder, HashingEmbedder, VertexEmbedder, create_embedder
+from .hnsw import HNSWIndex
+from .hybrid import HybridRetrievalBackend, reciprocal_rank_fusion
+from .local import LocalCorpusIndex, LocalRetrievalBackend
+from .semantic_cache import (
+    SemanticCache,
+    query_embedding,
+    semantic_answer_cache,
+    semantic_context_cache,
+)
+from .store import ChunkStore
+from .vertex import VertexRetrievalBackend
+
+_local_backend: Optional[LocalRetrievalBackend] = None
+_vertex_backend: Optional[VertexRetrievalBackend] = None
+_hybrid_backend: Optional[HybridRetrievalBackend] = None
+
+
+def get_local_backend() -> LocalRetrievalBackend:
+    """Return the process-wide local backend."""
+    global _local_backend
+    if _local_backend is None:
+        _local_backend = LocalRetrievalBackend()
+    return _local_backend
+
+
+def local_index_enabled() -> bool:
+    """True when ingestion should mirror documents into the local backend."""
+    return RETRIEVAL_BACKEND == "local" or HYBRID_RETRIEVAL
+
+
+def get_retrieval_backend() -> RetrievalBackend:
+    """Return the configured retrieval backend."""
+    global _hybrid_backend
+    if HYBRID_RETRIEVAL:
+        if _hybrid_backend is None:
+            _hybrid_backend = HybridRetrievalBackend(
+                _get_dense_backend(), get_local_backend()
+            )
+        return _hybrid_backend
+    return _get_dense_backend()
+
+
+def _get_dense_backend() -> RetrievalBackend:
+    global _vertex_backend
+    if RETRIEVAL_BACKEND == "local":
+        return get_local_backend()
+    if RETRIEVAL_BACKEND == "vertex":
+        if _vertex_backend is None:
+            _vertex_backend = VertexRetrievalBackend()
+        return _vertex_backend
+    raise ValueError(
+        f"Unknown retrieval backend '{RETRIEVAL_BACKEND}'. Expected 'vertex' or 'local'."
+    )
+
+
+__all__ = [
+    "BM25Index",
+    "ChunkStore",
+    "Embedder",
+    "HNSWIndex",
+    "HashingEmbedder",
+    "HybridRetrievalBackend",
+    "LocalCorpusIndex",
+    "LocalRetrievalBackend",
+    "RetrievalBackend",
+    "RetrievalCache",
+    "SemanticCache",
+    "VertexEmbedder",
+    "VertexRetrievalBackend",
+    "create_embedder",
+    "get_local_backend",
+    "get_retrieval_backend",
+    "local_index_enabled",
+    "query_embedding",
+    "reciprocal_rank_fusion",
+    "retrieval_cache",
+    "semantic_answer_cache",
+    "semantic_context_cache",
+]
@@ -0,0 +1,41 @@
+"""
+Interface shared by all retrieval backends.
+"""
+
+from abc import ABC, abstractmethod
+from typing import List
+
+from ..config import (
+    DEFAULT_DISTANCE_THRESHOLD,
+    DEFAULT_TOP_K,
+)
+
+
+class RetrievalBackend(ABC):
+    """
+    A source of ranked contexts for a corpus.
+
+    Implementations must follow Vertex AI RAG semantics: at most `top_k`
+    contexts, each with a vector distance below `distance_threshold`, ordered
+    by ascending distance and reported in the `score` field.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def retrieve(
+        self,
+        corpus_resource_name: str,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+    ) -> List[dict]:
+        """
+        Return contexts with source_uri, source_name, text and score.
+        """
+
+    @abstractmethod
+    def has_corpus(self, corpus_resource_name: str) -> bool:
+        """
+        Check whether this backend can serve the given corpus.
+        """
@@ -0,0 +1,159 @@
+"""
+BM25 inverted index over chunk texts, plus helpers for spotting identifier
+queries (part numbers, register names) that lexical search answers best.
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import (
+    BM25_B,
+    BM25_K1,
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+# Original-case tokens that look like identifiers: contain a digit or an
+# underscore (STM32L476RG, GPIOA_MODER, PA5) or are all caps (MODER, USART)
+_IDENTIFIER_RE = re.compile(r"^(?=\w*[A-Za-z])(?:\w*\d\w*|\w+_\w+|[A-Z]{3,}[A-Z0-9]*)$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, as indexed by BM25Index."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def identifier_tokens(query: str, max_tokens: int = 4) -> Optional[List[str]]:
+    """
+    Return the query's tokens if the query is nothing but identifiers.
+
+    Args:
+        query (str): Raw user query
+        max_tokens (int): Longer queries are treated as natural language
+
+    Returns:
+        Optional[List[str]]: Lowercased identifier tokens, or None
+    """
+    raw = _TOKEN_RE.findall(query)
+    if not raw or len(raw) > max_tokens:
+        return None
+    if not all(_IDENTIFIER_RE.match(token) for token in raw):
+        return None
+    return [token.lower() for token in raw]
+
+
+def identifier_terms(text: str) -> frozenset:
+    """
+    Lowercased identifiers anywhere in a text, plus bare numbers (SKUs,
+    part numbers), which must match exactly for two queries to be the same.
+    """
+    return frozenset(
+        token.lower()
+        for token in _TOKEN_RE.findall(text)
+        if _IDENTIFIER_RE.match(token) or any(char.isdigit() for char in token)
+    )
+
+
+class BM25Index:
+    """
+    Okapi BM25 over rows of a chunk store.
+
+    Postings are kept as Python lists while rows are appended and converted
+    to NumPy arrays on first use, so scoring a query term is a handful of
+    vectorised operations over that term's posting list.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_lengths: List[int] = []
+        self._doc_lengths_array = np.zeros(0, dtype=np.float32)
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        """Number of rows indexed."""
+        return len(self._doc_lengths)
+
+    def add(self, texts: Iterable[str]) -> None:
+        """Index texts as the next consecutive rows."""
+        with self._lock:
+            for text in texts:
+                row = len(self._doc_lengths)
+                tokens = tokenize(text)
+                self._doc_lengths.append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    rows, tfs = self._postings.setdefault(term, ([], []))
+                    rows.append(row)
+                    tfs.append(tf)
+                    self._arrays.pop(term, None)
+            self._doc_lengths_array = np.array(self._doc_lengths, dtype=np.float32)
+
+    def _posting(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            posting = self._postings.get(term)
+            if posting is None:
+                return None
+            arrays = (
+                np.array(posting[0], dtype=np.int64),
+                np.array(posting[1], dtype=np.float32),
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(
+        self,
+        query_tokens: List[str],
+        top_k: int,
+        live: Optional[np.ndarray] = None,
+        require_all: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score rows against the query terms.
+
+        Args:
+            query_tokens (List[str]): Tokens from tokenize()
+            top_k (int): Number of rows to return
+            live (np.ndarray, optional): Boolean mask of rows that may be returned
+            require_all (bool): Only return rows containing every query term
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Rows and BM25 scores, best first
+        """
+        with self._lock:
+            count = self.size
+            if not count or top_k <= 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+            lengths = self._doc_lengths_array
+            average_length = max(float(lengths.mean()), 1.0)
+            scores = np.zeros(count, dtype=np.float32)
+            matched = np.zeros(count, dtype=np.int32)
+            terms = list(dict.fromkeys(query_tokens))
+            for term in terms:
+                posting = self._posting(term)
+                if posting is None:
+                    if require_all:
+                        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+                    continue
+                rows, tfs = posting
+                idf = np.log1p((count - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[rows] / average_length)
+                scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+                matched[rows] += 1
+
+        eligible = matched == len(terms) if require_all else matched > 0
+        if live is not None:
+            eligible &= np.asarray(live[:count], dtype=bool)
+        candidates = np.flatnonzero(eligible)
+        if candidates.size > top_k:
+            best = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+            candidates = candidates[best]
+        order = np.argsort(-scores[candidates], kind="stable")
+        return candidates[order], scores[candidates[order]]
@@ -0,0 +1,181 @@
+"""
+LRU + TTL cache of retrieval results.
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from ..config import (
+    RETRIEVAL_CACHE_MAX_BYTES,
+    RETRIEVAL_CACHE_MAX_ENTRIES,
+    RETRIEVAL_CACHE_TTL_SECONDS,
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace and trailing punctuation."""
+    return _WHITESPACE_RE.sub(" ", query.casefold()).strip().rstrip("?!.").strip()
+
+
+def estimate_size(results: List[dict]) -> int:
+    """Approximate memory held by a list of context dicts, in bytes."""
+    size = sys.getsizeof(results)
+    for result in results:
+        size += sys.getsizeof(result)
+        for value in result.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class RetrievalCache:
+    """
+    Thread-safe cache of retrieval results.
+
+    Entries are keyed by corpus resource name, normalised query text, top_k
+    and distance threshold, and remember the corpus version they were
+    computed at. A lookup with a newer version treats the entry as stale, so
+    bumping a corpus's version invalidates all of its entries at once.
+    Entries also expire after `ttl_seconds`, and the least recently used ones
+    are evicted beyond `max_entries` or `max_bytes`.
+
+    Versions live in the process's corpus registry, so invalidation is per
+    process only: a change made through another worker is not seen here, and
+    this worker may serve results cached before it for up to `ttl_seconds`.
+    Callers must bump the version only after every index they read from has
+    been updated.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES,
+        max_bytes: int = RETRIEVAL_CACHE_MAX_BYTES,
+        ttl_seconds: float = RETRIEVAL_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (version, expires_at, results, size)
+        self._entries: "OrderedDict[Tuple, Tuple[int, float, List[dict], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._expired = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _key(corpus_resource_name, query, top_k, distance_threshold) -> Tuple:
+        return (corpus_resource_name, normalize_query(query), top_k, distance_threshold)
+
+    def _remove(self, key) -> None:
+        _, _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(
+        self,
+        corpus_resource_name: str,
+        query: str,
+        top_k: int,
+        distance_threshold: float,
+        version: int,
+    ) -> Optional[List[dict]]:
+        """
+        Return cached results, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        key = self._key(corpus_resource_name, query, top_k, distance_threshold)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, expires_at, results, _ = entry
+                if entry_version != version:
+                    self._stale += 1
+                    self._remove(key)
+                elif expires_at <= time.monotonic():
+                    self._expired += 1
+                    self._remove(key)
+                else:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return [dict(result) for result in results]
+            self._misses += 1
+            return None
+
+    def put(
+        self,
+        corpus_resource_name: str,
+        query: str,
+        top_k: int,
+        distance_threshold: float,
+        version: int,
+        results: List[dict],
+    ) -> None:
+        """Store results computed at the given corpus version."""
+        if not self.enabled:
+            return
+        key = self._key(corpus_resource_name, query, top_k, distance_threshold)
+        results = [dict(result) for result in results]
+        size = estimate_size(results)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, time.monotonic() + self.ttl_seconds, results, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, corpus_resource_name: Optional[str] = None) -> int:
+        """
+        Drop entries for one corpus, or for all corpora.
+
+        Returns:
+            int: Number of entries dropped
+        """
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if corpus_resource_name is None or key[0] == corpus_resource_name
+            ]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> dict:
+        """
+        Report hit ratio and memory footprint for tuning.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "stale": self._stale,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# Shared by rag_query and the /retrieve endpoints
+retrieval_cache = RetrievalCache()
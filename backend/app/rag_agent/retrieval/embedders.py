@@ -0,0 +1,121 @@
+"""
+Text embedders used by the local retrieval backend.
+"""
+
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+
+from ..config import (
+    DEFAULT_EMBEDDING_MODEL,
+    HASHING_EMBEDDER_DIM,
+    LOCAL_EMBEDDER,
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class Embedder(ABC):
+    """Turns text into L2-normalised float32 vectors."""
+
+    dim: int
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed chunk texts; returns an array of shape (len(texts), dim)."""
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query; returns an array of shape (dim,)."""
+        return self.embed_documents([text])[0]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise each row, leaving all-zero rows untouched."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HashingEmbedder(Embedder):
+    """
+    Offline bag-of-words embedder based on signed feature hashing.
+
+    It needs no model or network access, which makes it suitable for tests,
+    benchmarks and running the agent without Vertex AI. Quality is lexical
+    rather than semantic.
+    """
+
+    def __init__(self, dim: int = HASHING_EMBEDDER_DIM):
+        self.dim = dim
+
+    def _embed_one(self, text: str, out: np.ndarray) -> None:
+        tokens = _TOKEN_RE.findall(text.lower())
+        if not tokens:
+            return
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode()) for token in tokens),
+            dtype=np.uint32,
+            count=len(tokens),
+        )
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(out, hashes % self.dim, signs)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            self._embed_one(text, vectors[row])
+        return normalize_rows(vectors)
+
+
+class VertexEmbedder(Embedder):
+    """Embeds text with the same Vertex AI model the RAG corpora use."""
+
+    # Vertex AI accepts at most this many instances per prediction call
+    batch_size = 250
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        from vertexai.language_models import TextEmbeddingModel
+
+        self.model = TextEmbeddingModel.from_pretrained(model_name.split("/")[-1])
+        self.dim = 768
+
+    def _embed(self, texts: List[str], task_type: str) -> np.ndarray:
+        from vertexai.language_models import TextEmbeddingInput
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [
+                TextEmbeddingInput(text=text, task_type=task_type)
+                for text in texts[start:start + self.batch_size]
+            ]
+            vectors.extend(e.values for e in self.model.get_embeddings(batch))
+        if not vectors:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return normalize_rows(np.array(vectors, dtype=np.float32))
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self._embed(texts, "RETRIEVAL_DOCUMENT")
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed([text], "RETRIEVAL_QUERY")[0]
+
+
+def create_embedder(kind: str = LOCAL_EMBEDDER) -> Embedder:
+    """
+    Build the embedder selected by configuration.
+
+    Args:
+        kind (str): "vertex" or "hashing"
+
+    Returns:
+        Embedder: A new embedder instance
+    """
+    if kind == "hashing":
+        return HashingEmbedder()
+    if kind == "vertex":
+        return VertexEmbedder()
+    raise ValueError(f"Unknown embedder '{kind}'. Expected 'vertex' or 'hashing'.")
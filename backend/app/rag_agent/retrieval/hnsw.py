@@ -0,0 +1,375 @@
+"""
+Hierarchical Navigable Small World (HNSW) graph for approximate nearest
+neighbour search over normalised embeddings.
+
+Follows Malkov & Yashunin, "Efficient and robust approximate nearest neighbor
+search using Hierarchical Navigable Small World graphs" (2016), using cosine
+distance (1 - dot product) on unit vectors.
+
+The index can read vectors through an accessor instead of keeping its own
+copy, so a graph over a chunk store scores the store's memory-mapped rows
+and every worker shares them through the page cache. A graph is saved to a
+single .npz file holding only its links and loaded back over the same
+vectors, so it is built once per corpus rather than once per worker.
+"""
+
+import heapq
+import math
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import (
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+)
+
+
+class HNSWIndex:
+    """
+    Approximate k-NN index supporting incremental inserts and deletes.
+
+    Labels are dense integers assigned in insertion order. Deleted labels are
+    tombstoned: they stay in the graph so it remains navigable, but are never
+    returned from a search.
+
+    Args:
+        dim (int): Vector dimensionality
+        m (int): Links per node on upper layers (layer 0 keeps 2 * m)
+        ef_construction (int): Candidate list size while inserting
+        ef_search (int): Default candidate list size while searching
+        seed (int, optional): Seed for level assignment
+        vectors (Callable, optional): Returns the float32 vectors of an array
+            of labels, e.g. rows of a chunk store; label i must be row i, so
+            vectors are added in row order. Without it the index keeps its
+            own copy of the vectors added.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        m: int = HNSW_M,
+        ef_construction: int = HNSW_EF_CONSTRUCTION,
+        ef_search: int = HNSW_EF_SEARCH,
+        seed: Optional[int] = None,
+        vectors: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    ):
+        self.dim = dim
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = max(ef_construction, m)
+        self.ef_search = ef_search
+        self._level_mult = 1.0 / math.log(max(m, 2))
+        self._rng = np.random.default_rng(seed)
+
+        self._fetch = vectors
+        self._vectors = np.zeros((0, dim), dtype=np.float32) if vectors is None else None
+        self._count = 0
+        # _links[node][level] -> neighbour labels on that level
+        self._links: List[List[List[int]]] = []
+        self._deleted = np.zeros(0, dtype=bool)
+        self._deleted_count = 0
+        self._entry_point: Optional[int] = None
+        self._max_level = -1
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Number of live (non-deleted) vectors."""
+        return self._count - self._deleted_count
+
+    @property
+    def size(self) -> int:
+        """Number of labels ever assigned, including deleted ones."""
+        return self._count
+
+    @property
+    def deleted_ratio(self) -> float:
+        return self._deleted_count / self._count if self._count else 0.0
+
+    def _rows(self, labels) -> np.ndarray:
+        """Vectors of the given labels, shape (len(labels), dim)."""
+        if self._fetch is None:
+            return self._vectors[labels]
+        return self._fetch(np.asarray(labels, dtype=np.int64))
+
+    def _distances(self, query: np.ndarray, labels: List[int]) -> np.ndarray:
+        return 1.0 - self._rows(labels) @ query
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._count + extra
+        if needed <= len(self._deleted):
+            return
+        capacity = max(needed, 2 * len(self._deleted), 1024)
+        if self._vectors is not None:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            vectors[:self._count] = self._vectors[:self._count]
+            self._vectors = vectors
+        deleted = np.zeros(capacity, dtype=bool)
+        deleted[:self._count] = self._deleted[:self._count]
+        self._deleted = deleted
+
+    def _random_level(self) -> int:
+        return int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: List[int],
+        ef: int,
+        level: int,
+    ) -> List[Tuple[float, int]]:
+        """Best-first search of one layer; returns (distance, label) pairs."""
+        visited = set(entry_points)
+        entry_distances = self._distances(query, entry_points)
+        candidates = [(float(d), e) for d, e in zip(entry_distances, entry_points)]
+        heapq.heapify(candidates)
+        results = [(-d, e) for d, e in candidates]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            distance, current = heapq.heappop(candidates)
+            if distance > -results[0][0]:
+                break
+            neighbours = [n for n in self._links[current][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            distances = self._distances(query, neighbours)
+            if len(results) >= ef:
+                # Only neighbours that beat the current worst result matter
+                closer = distances < -results[0][0]
+                neighbours = [n for n, keep in zip(neighbours, closer.tolist()) if keep]
+                distances = distances[closer]
+            for neighbour, d in zip(neighbours, distances.tolist()):
+                if len(results) < ef or d < -results[0][0]:
+                    heapq.heappush(candidates, (d, neighbour))
+                    heapq.heappush(results, (-d, neighbour))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted((-d, label) for d, label in results)
+
+    def _select_neighbours(
+        self,
+        candidates: List[Tuple[float, int]],
+        m: int,
+    ) -> List[int]:
+        """
+        Neighbour selection heuristic: prefer candidates that are closer to
+        the base element than to any already selected neighbour, which keeps
+        links spread across clusters. Pruned candidates top up the list.
+        """
+        if len(candidates) <= m:
+            return [label for _, label in candidates]
+
+        distances = np.array([d for d, _ in candidates], dtype=np.float32)
+        labels = np.array([label for _, label in candidates], dtype=np.int64)
+        vectors = self._rows(labels)
+        # Distance from every candidate to its nearest selected neighbour
+        to_selected = np.full(len(labels), np.inf, dtype=np.float32)
+        chosen = np.zeros(len(labels), dtype=bool)
+
+        position = 0
+        while chosen.sum() < m:
+            # Candidates are sorted by distance, so the next acceptable one is
+            # the first remaining candidate not dominated by a selected one
+            acceptable = np.flatnonzero(to_selected[position:] >= distances[position:])
+            if not acceptable.size:
+                break
+            position += int(acceptable[0])
+            chosen[position] = True
+            to_selected = np.minimum(to_selected, 1.0 - vectors @ vectors[position])
+            position += 1
+
+        selected = labels[chosen].tolist()
+        if len(selected) < m:
+            selected.extend(labels[~chosen][:m - len(selected)].tolist())
+        return selected
+
+    def _shrink(self, node: int, level: int, max_links: int) -> None:
+        links = self._links[node][level]
+        if len(links) <= max_links:
+            return
+        distances = self._distances(self._rows([node])[0], links)
+        ranked = sorted(zip(distances.tolist(), links))
+        self._links[node][level] = self._select_neighbours(ranked, max_links)
+
+    def add(self, vectors: np.ndarray) -> List[int]:
+        """
+        Insert normalised vectors.
+
+        The lock is taken per vector, so a search running alongside a large
+        insert waits for one insertion at most.
+
+        Args:
+            vectors (np.ndarray): Array of shape (n, dim); with a vector
+                accessor, the rows it returns for the next n labels
+
+        Returns:
+            List[int]: Labels assigned to the inserted vectors
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        labels = []
+        for vector in vectors:
+            with self._lock:
+                self._reserve(1)
+                labels.append(self._insert(vector))
+        return labels
+
+    def _insert(self, vector: np.ndarray) -> int:
+        label = self._count
+        if self._vectors is not None:
+            self._vectors[label] = vector
+        self._count += 1
+        level = self._random_level()
+        self._links.append([[] for _ in range(level + 1)])
+
+        if self._entry_point is None:
+            self._entry_point, self._max_level = label, level
+            return label
+
+        entry = [self._entry_point]
+        for current_level in range(self._max_level, level, -1):
+            entry = [self._search_layer(vector, entry, 1, current_level)[0][1]]
+
+        for current_level in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(
+                vector, entry, self.ef_construction, current_level
+            )
+            max_links = self.m0 if current_level == 0 else self.m
+            neighbours = self._select_neighbours(candidates, self.m)
+            self._links[label][current_level] = neighbours
+            for neighbour in neighbours:
+                self._links[neighbour][current_level].append(label)
+                self._shrink(neighbour, current_level, max_links)
+            entry = [candidate for _, candidate in candidates]
+
+        if level > self._max_level:
+            self._entry_point, self._max_level = label, level
+        return label
+
+    def delete(self, label: int) -> None:
+        """Tombstone a label so it is no longer returned by searches."""
+        with self._lock:
+            if 0 <= label < self._count and not self._deleted[label]:
+                self._deleted[label] = True
+                self._deleted_count += 1
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        ef: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the approximate k nearest live vectors.
+
+        Args:
+            query (np.ndarray): Normalised query vector
+            k (int): Number of neighbours to return
+            ef (int, optional): Candidate list size; defaults to ef_search
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Labels and cosine distances, nearest first
+        """
+        with self._lock:
+            if self._entry_point is None or k <= 0 or not len(self):
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+            query = np.asarray(query, dtype=np.float32)
+            entry = [self._entry_point]
+            for level in range(self._max_level, 0, -1):
+                entry = [self._search_layer(query, entry, 1, level)[0][1]]
+
+            # Widen the beam to compensate for tombstoned results
+            ef = max(ef or self.ef_search, k)
+            ef = int(math.ceil(ef / max(1.0 - self.deleted_ratio, 0.1)))
+            found = self._search_layer(query, entry, ef, 0)
+
+            live = [(d, label) for d, label in found if not self._deleted[label]][:k]
+            return (
+                np.array([label for _, label in live], dtype=np.int64),
+                np.array([d for d, _ in live], dtype=np.float32),
+            )
+
+    def save(self, path: str) -> None:
+        """
+        Write the graph (not the vectors) to `path` atomically.
+
+        Links are stored flattened: the level count of every node, the link
+        count of every (node, level) in order, and all links back to back.
+        """
+        with self._lock:
+            levels = np.fromiter(
+                (len(node) for node in self._links), dtype=np.int32, count=self._count
+            )
+            counts = np.fromiter(
+                (len(links) for node in self._links for links in node),
+                dtype=np.int32,
+                count=int(levels.sum()),
+            )
+            links = np.fromiter(
+                (label for node in self._links for level in node for label in level),
+                dtype=np.int32,
+                count=int(counts.sum()),
+            )
+            header = np.array(
+                [
+                    self.dim,
+                    self.m,
+                    self.ef_construction,
+                    self.ef_search,
+                    -1 if self._entry_point is None else self._entry_point,
+                    self._max_level,
+                ],
+                dtype=np.int64,
+            )
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, header=header, levels=levels, counts=counts, links=links)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        vectors: Callable[[np.ndarray], np.ndarray],
+        rows: int,
+    ) -> "HNSWIndex":
+        """
+        Load a graph saved with save() over the vectors it was built from.
+
+        Args:
+            path (str): File written by save()
+            vectors (Callable): Vector accessor over the rows the graph was
+                built from (see the class), which it reads without copying
+            rows (int): Rows the accessor can return; at least as many as
+                the graph has labels
+
+        Returns:
+            HNSWIndex: The graph; its labels are the first rows of `vectors`
+        """
+        with np.load(path) as data:
+            dim, m, ef_construction, ef_search, entry_point, max_level = data["header"].tolist()
+            levels, counts, links = data["levels"], data["counts"], data["links"]
+        count = len(levels)
+        if rows < count:
+            raise ValueError(f"Graph has {count} labels but only {rows} vectors were given")
+
+        index = cls(dim, m=m, ef_construction=ef_construction, ef_search=ef_search, vectors=vectors)
+        index._reserve(count)
+        index._count = count
+        per_level = np.split(links, np.cumsum(counts)[:-1]) if len(counts) else []
+        per_level = [level.tolist() for level in per_level]
+        bounds = np.concatenate(([0], np.cumsum(levels))).tolist()
+        index._links = [per_level[bounds[i]:bounds[i + 1]] for i in range(count)]
+        index._entry_point = None if entry_point < 0 else entry_point
+        index._max_level = max_level
+        return index
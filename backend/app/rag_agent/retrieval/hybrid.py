@@ -0,0 +1,116 @@
+"""
+Hybrid retrieval: dense results fused with BM25 results from the local index.
+"""
+
+from typing import List
+
+import numpy as np
+
+from ..config import (
+    DEFAULT_DISTANCE_THRESHOLD,
+    DEFAULT_TOP_K,
+    HYBRID_CANDIDATE_FACTOR,
+    RRF_K,
+)
+from ..models.chunking import chunk_id
+from .base import RetrievalBackend
+from .bm25 import identifier_tokens, tokenize
+from .local import LocalRetrievalBackend
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[dict]],
+    top_k: int,
+    k: int = RRF_K,
+) -> List[dict]:
+    """
+    Merge ranked result lists with reciprocal rank fusion.
+
+    Each context scores sum(1 / (k + rank)) over the lists it appears in.
+    Contexts are identified by their chunk id, the content hash of their
+    whitespace-normalised text, so the same passage merges whichever
+    retriever (and backend) returned it. The first list a context appears in
+    supplies its fields, so pass the dense results first to keep their
+    vector distances.
+
+    Returns:
+        List[dict]: Up to top_k contexts with an added `fusion_score`
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            key = result.get("chunk_id") or chunk_id(result.get("text", ""))
+            entry = fused.setdefault(key, dict(result, fusion_score=0.0))
+            entry["fusion_score"] += 1.0 / (k + rank)
+    ranked = sorted(fused.values(), key=lambda r: r["fusion_score"], reverse=True)
+    return ranked[:top_k]
+
+
+class HybridRetrievalBackend(RetrievalBackend):
+    """
+    Wraps a dense backend with lexical search over the local chunk store.
+
+    - Queries made only of identifiers (part numbers, register names) are
+      answered straight from the inverted index, with no embedding call, when
+      some chunk contains all of them. Those hits are exact matches and carry
+      a score (distance) of 0.
+    - Other queries fetch candidates from both retrievers and fuse them with
+      reciprocal rank fusion. Lexical hits are not subject to the distance
+      threshold. With the local dense backend their score is the cosine
+      distance to the query vector already computed for the dense search;
+      with Vertex AI nothing is embedded locally, so lexical-only hits carry
+      a score of None.
+    - Corpora without a local store, or whose BM25 index is still being
+      built, fall back to the dense backend alone.
+    """
+
+    name = "hybrid"
+
+    def __init__(self, dense: RetrievalBackend, local: LocalRetrievalBackend):
+        self.dense = dense
+        self.local = local
+
+    def has_corpus(self, corpus_resource_name: str) -> bool:
+        return self.dense.has_corpus(corpus_resource_name) or self.local.has_corpus(
+            corpus_resource_name
+        )
+
+    def retrieve(
+        self,
+        corpus_resource_name: str,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+    ) -> List[dict]:
+        index = self.local.get_corpus(corpus_resource_name)
+        if index is None or not len(index):
+            return self.dense.retrieve(
+                corpus_resource_name, query, top_k, distance_threshold
+            )
+
+        identifiers = identifier_tokens(query)
+        if identifiers:
+            found = index.lexical_search(identifiers, top_k, require_all=True)
+            if found is not None and found[0].size:
+                return index.results(found[0], np.zeros(found[0].size, dtype=np.float32))
+
+        candidates = top_k * HYBRID_CANDIDATE_FACTOR
+        query_vector = None
+        if self.dense is self.local:
+            query_vector = self.local.embedder.embed_query(query)
+            dense_results = index.search(query_vector, candidates, distance_threshold)
+        else:
+            dense_results = self.dense.retrieve(
+                corpus_resource_name, query, candidates, distance_threshold
+            )
+
+        found = index.lexical_search(tokenize(query), candidates)
+        if found is None:
+            return dense_results[:top_k]
+        rows, _ = found
+        distances = (
+            index.distances(rows, query_vector) if query_vector is not None else [None] * rows.size
+        )
+        lexical_results = index.results(rows, distances)
+
+        return reciprocal_rank_fusion([dense_results, lexical_results], top_k)
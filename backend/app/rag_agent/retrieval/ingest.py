@@ -0,0 +1,113 @@
+"""
+Mirror documents imported into Vertex AI RAG into the local retrieval index.
+"""
+
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import NEAR_DUP_MODE
+from ..gcs import get_storage_client
+from ..models.chunking import iter_chunks
+from ..models.document import iter_pages
+from ..tools.utils import split_gcs_uri
+from .local import LocalRetrievalBackend
+
+logger = logging.getLogger(__name__)
+
+
+def download_gcs_object(gcs_uri: str, directory: str) -> str:
+    """
+    Download a GCS object into a directory, under its base name.
+
+    Returns:
+        str: Path of the local copy
+    """
+    bucket_name, blob_name = split_gcs_uri(gcs_uri)
+    local_path = os.path.join(directory, os.path.basename(blob_name))
+    get_storage_client().bucket(bucket_name).blob(blob_name).download_to_filename(local_path)
+    return local_path
+
+
+def index_documents(
+    backend: LocalRetrievalBackend,
+    corpus_resource_name: str,
+    sources: List[Tuple[str, Optional[str]]],
+    known_embeddings: Optional[Dict[str, np.ndarray]] = None,
+    near_duplicates: Optional[Dict[str, List[Optional[dict]]]] = None,
+) -> dict:
+    """
+    Extract, chunk and index documents into the local backend.
+
+    A source already in the index is replaced, like Vertex AI skips a path
+    it already imported rather than adding it twice.
+
+    Args:
+        backend (LocalRetrievalBackend): Backend to index into
+        corpus_resource_name (str): Corpus the documents were imported into
+        sources (List[Tuple[str, Optional[str]]]): (source_uri, local_path) pairs.
+            When local_path is None, GCS objects are downloaded first; other
+            sources (e.g. Google Drive) are skipped.
+        known_embeddings (Dict[str, np.ndarray], optional): Embeddings by
+            chunk id, e.g. of a previous revision, reused instead of embedding
+        near_duplicates (Dict[str, List[Optional[dict]]], optional): Per source,
+            the near-duplicate match (or None) of each chunk, as found when
+            add_data screened it; in drop mode matched chunks are left out
+
+    Returns:
+        dict: Counts of indexed documents and chunks, of chunks embedded,
+        reused and found to be near-duplicates, plus skipped sources
+    """
+    known_embeddings = known_embeddings or {}
+    near_duplicates = near_duplicates or {}
+    indexed_documents = 0
+    indexed_chunks = 0
+    reused_chunks = 0
+    near_duplicate_chunks = 0
+    skipped = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for source_uri, local_path in sources:
+            try:
+                if local_path is None:
+                    if not source_uri.startswith("gs://"):
+                        skipped.append(f"{source_uri} (Not available locally)")
+                        continue
+                    local_path = download_gcs_object(source_uri, tmp_dir)
+
+                # Matches the display name Vertex AI gives the RagFile
+                source_name = os.path.basename(
+                    source_uri if source_uri.startswith("gs://") else local_path
+                )
+                chunks = [
+                    dict(chunk.to_dict(), source_uri=source_uri, source_name=source_name)
+                    for chunk in iter_chunks(iter_pages(local_path))
+                ]
+                # Same file and chunker as the screen, so the matches line up
+                matches = near_duplicates.get(source_uri)
+                if matches is not None and len(matches) == len(chunks):
+                    near_duplicate_chunks += sum(1 for match in matches if match is not None)
+                    if NEAR_DUP_MODE == "drop":
+                        chunks = [chunk for chunk, match in zip(chunks, matches) if match is None]
+                reused_chunks += sum(1 for chunk in chunks if chunk["id"] in known_embeddings)
+                # The index only appends, so a source imported again would
+                # have every chunk twice
+                backend.delete_source(corpus_resource_name, source_uri)
+                indexed_chunks += backend.add_chunks(corpus_resource_name, chunks, known_embeddings)
+                indexed_documents += 1
+            except Exception as e:
+                logger.warning(f"Could not index {source_uri} locally: {str(e)}")
+                skipped.append(f"{source_uri} ({str(e)})")
+
+    return {
+        "documents": indexed_documents,
+        "chunks": indexed_chunks,
+        "embedded": indexed_chunks - reused_chunks,
+        "reused": reused_chunks,
+        "near_duplicates": near_duplicate_chunks,
+        "near_duplicates_dropped": near_duplicate_chunks if NEAR_DUP_MODE == "drop" else 0,
+        "skipped": skipped,
+    }
@@ -0,0 +1,519 @@
+"""
+In-process retrieval backend using NumPy cosine search over chunk embeddings,
+with an HNSW graph index for large corpora.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import (
+    DEFAULT_DISTANCE_THRESHOLD,
+    DEFAULT_TOP_K,
+    HNSW_MIN_CHUNKS,
+    HNSW_SAVE_EVERY,
+    HYBRID_RETRIEVAL,
+    LOCAL_INDEX_COMPACT_RATIO,
+    LOCAL_INDEX_TYPE,
+    LOCAL_STORE_DIR,
+)
+from ..models.chunking import chunk_id
+from .base import RetrievalBackend
+from .bm25 import BM25Index
+from .embedders import Embedder, create_embedder
+from .hnsw import HNSWIndex
+from .store import ChunkStore
+
+logger = logging.getLogger(__name__)
+
+HNSW_FILE = "hnsw.npz"
+HNSW_LOCK = ".hnsw.lock"
+# Seconds between checks for a newer graph saved by another worker
+HNSW_POLL_SECONDS = 1.0
+
+
+class LocalCorpusIndex:
+    """
+    Search over the chunk store of one corpus.
+
+    The embeddings stay in the memory-mapped store; small corpora are searched
+    exactly, block by block, straight from the mapping. Large ones (see
+    LOCAL_INDEX_TYPE) get an HNSW graph, saved next to the store's current
+    generation. One worker at a time (whichever holds the build lock) inserts
+    new rows into it in a background thread and saves it as it goes; the
+    others load the saved graph. Searches never insert: rows the graph does
+    not cover yet are scored exactly and merged in. Either way the cosine
+    distance (1 - similarity) is filtered and ranked the same way Vertex AI
+    ranks vector distances.
+
+    With `lexical`, a BM25 index is kept as well: extended as chunks are
+    added, built in a background thread when the corpus is opened or
+    compacted, and never rebuilt by a query.
+
+    Rows are append-only; deleting a document tombstones its rows and the
+    store is compacted once too many rows are dead.
+    """
+
+    def __init__(
+        self,
+        store: ChunkStore,
+        index_type: str = LOCAL_INDEX_TYPE,
+        background_build: bool = True,
+        lexical: bool = HYBRID_RETRIEVAL,
+    ):
+        self.store = store
+        self.index_type = index_type
+        self.background_build = background_build
+        self.lexical = lexical
+        self.hnsw: Optional[HNSWIndex] = None
+        self._hnsw_generation: Optional[int] = None
+        # Stat of the saved graph last loaded or written, to spot newer ones
+        self._hnsw_file_stat: Optional[Tuple[int, int]] = None
+        self._hnsw_checked_at = 0.0
+        self.bm25: Optional[BM25Index] = None
+        self._bm25_generation: Optional[int] = None
+        self._bm25_building = False
+        self._building = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self.store.live_count
+
+    def _wants_hnsw(self) -> bool:
+        if self.index_type == "hnsw":
+            return len(self.store) > 0
+        return self.index_type == "auto" and len(self.store) >= HNSW_MIN_CHUNKS
+
+    def _publish_hnsw(self, index: HNSWIndex, generation: int) -> bool:
+        """Make `index` the graph searches use, unless the store moved on."""
+        with self._lock:
+            if self.store.generation != generation:
+                return False
+            if self.hnsw is not index:
+                self.hnsw, self._hnsw_generation = index, generation
+            return True
+
+    def _load_saved_hnsw(self, generation: int) -> Optional[HNSWIndex]:
+        """
+        The saved graph of a generation, if it is newer than the one in use
+        and covers more rows; otherwise None.
+        """
+        path = self.store.index_file(HNSW_FILE, generation)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key == self._hnsw_file_stat:
+            return None
+        self._hnsw_file_stat = key
+        with self._lock:
+            if self.store.generation != generation:
+                return None
+            rows, live = len(self.store), np.asarray(self.store.live, dtype=bool)
+            current = self.hnsw if self._hnsw_generation == generation else None
+        # Scored against the store's memory map, not a copy of its vectors
+        index = HNSWIndex.load(path, self.store.vectors, rows)
+        if current is not None and current.size >= index.size:
+            return None
+        for row in np.flatnonzero(~live[:index.size]):
+            index.delete(int(row))
+        return index
+
+    def _catch_up_hnsw(self, generation: int) -> None:
+        """
+        Bring the graph up to date with the store (background thread).
+
+        Loads the graph another worker saved; then, if this worker gets the
+        build lock, inserts the rows still missing in batches, publishing
+        the graph at once and saving it after every batch.
+        """
+        try:
+            index = self._load_saved_hnsw(generation)
+            if index is not None:
+                self._publish_hnsw(index, generation)
+            with self.store.try_lock(HNSW_LOCK) as owner:
+                if not owner:
+                    return
+                # The previous owner may have saved more while we waited
+                index = self._load_saved_hnsw(generation)
+                if index is not None:
+                    self._publish_hnsw(index, generation)
+                with self._lock:
+                    index = self.hnsw if self._hnsw_generation == generation else None
+                if index is None:
+                    index = HNSWIndex(self.store.dim, vectors=self.store.vectors)
+                    if not self._publish_hnsw(index, generation):
+                        return
+                path = self.store.index_file(HNSW_FILE, generation)
+                while True:
+                    with self._lock:
+                        if self.store.generation != generation:
+                            return
+                        start, count = index.size, len(self.store)
+                        if start >= count:
+                            break
+                        end = min(start + HNSW_SAVE_EVERY, count)
+                        vectors = self.store.vectors(slice(start, end))
+                        dead = np.flatnonzero(~np.asarray(self.store.live[start:end])) + start
+                    index.add(vectors)
+                    for row in dead:
+                        index.delete(int(row))
+                    index.save(path)
+                    stat = os.stat(path)
+                    self._hnsw_file_stat = (stat.st_mtime_ns, stat.st_size)
+        except Exception as e:
+            # Exact search keeps serving; the next sync tries again
+            logger.warning(f"Could not update the HNSW graph of {self.store.path}: {str(e)}")
+        finally:
+            self._building = False
+
+    def _start_hnsw_build(self) -> None:
+        now = time.monotonic()
+        if self._building or now - self._hnsw_checked_at < HNSW_POLL_SECONDS:
+            return
+        self._building, self._hnsw_checked_at = True, now
+        generation = self.store.generation
+        if self.background_build:
+            threading.Thread(
+                target=self._catch_up_hnsw, args=(generation,), name="hnsw-build", daemon=True
+            ).start()
+        else:
+            self._catch_up_hnsw(generation)
+
+    def _sync(self) -> None:
+        """
+        Pick up changes made by other workers. Never builds the graph itself:
+        missing rows are handed to the background catch-up.
+        """
+        self.store.reload()
+        if self.hnsw is not None and self._hnsw_generation != self.store.generation:
+            # Compaction renumbered the rows
+            self.hnsw, self._hnsw_file_stat = None, None
+        if self._wants_hnsw() and (self.hnsw is None or self.hnsw.size < len(self.store)):
+            self._start_hnsw_build()
+        if self.lexical and (
+            self._bm25_generation != self.store.generation or self.bm25.size < len(self.store)
+        ):
+            self._start_bm25_build()
+
+    def add(self, chunks: List[dict], embeddings: np.ndarray) -> None:
+        """
+        Append chunks with their embeddings.
+
+        Args:
+            chunks (List[dict]): Chunk records with source_uri, source_name and text
+            embeddings (np.ndarray): One row per chunk
+        """
+        with self._lock:
+            rows = self.store.append(chunks, embeddings)
+            # Index time: keep the lexical index in step when it is current
+            if (
+                self.bm25 is not None
+                and self._bm25_generation == self.store.generation
+                and self.bm25.size == rows.start
+            ):
+                self.bm25.add(chunk["text"] for chunk in chunks)
+            self._sync()
+
+    def source_vectors(self, source: str, field: str = "source_uri") -> Tuple[List[str], np.ndarray]:
+        """Texts and embeddings of the live chunks of one source document."""
+        with self._lock:
+            self.store.reload()
+            rows = self.store.rows_for_source(source, field)
+            return [self.store.text(int(row)) for row in rows], self.store.vectors(rows)
+
+    def remove_source(self, source: str, field: str = "source_uri") -> int:
+        """
+        Drop every chunk that came from the given source document.
+
+        Args:
+            source (str): Source URI, or display name when field="source_name"
+            field (str): Chunk field to match against
+
+        Returns:
+            int: Number of chunks removed
+        """
+        with self._lock:
+            self.store.reload()
+            rows = self.store.rows_for_source(source, field)
+            removed = self.store.delete_rows(rows)
+            if self.hnsw is not None:
+                for row in rows:
+                    self.hnsw.delete(int(row))
+            total = len(self.store)
+            if total and self.store.manifest["deleted"] / total >= LOCAL_INDEX_COMPACT_RATIO:
+                self.compact()
+            return removed
+
+    def compact(self) -> None:
+        """Physically drop tombstoned rows and rebuild the graph if any."""
+        with self._lock:
+            self.store.compact()
+            self.hnsw, self._hnsw_file_stat = None, None
+            self._hnsw_checked_at = 0.0
+            self._sync()
+
+    def _build_bm25(self, generation: int) -> None:
+        """
+        Index the rows the BM25 index is missing (background thread).
+
+        A fresh index is filled before it is published, so queries never wait
+        on a full build; rows other workers appended are added in place.
+        """
+        try:
+            with self._lock:
+                if self.store.generation != generation:
+                    return
+                current = self.bm25 if self._bm25_generation == generation else None
+                start = current.size if current is not None else 0
+                texts = [self.store.text(row) for row in range(start, len(self.store))]
+            index = current if current is not None else BM25Index()
+            index.add(texts)
+            with self._lock:
+                if self.store.generation == generation:
+                    self.bm25, self._bm25_generation = index, generation
+        except Exception as e:
+            logger.warning(f"Could not build the BM25 index of {self.store.path}: {str(e)}")
+        finally:
+            self._bm25_building = False
+
+    def _start_bm25_build(self) -> None:
+        if self._bm25_building:
+            return
+        self._bm25_building = True
+        generation = self.store.generation
+        if self.background_build:
+            threading.Thread(
+                target=self._build_bm25, args=(generation,), name="bm25-build", daemon=True
+            ).start()
+        else:
+            self._build_bm25(generation)
+
+    def lexical_search(
+        self,
+        query_tokens: List[str],
+        top_k: int,
+        require_all: bool = False,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Rank live rows by BM25.
+
+        Returns:
+            Optional[Tuple[np.ndarray, np.ndarray]]: Rows and BM25 scores,
+            best first, or None while the BM25 index is still being built
+        """
+        with self._lock:
+            self._sync()
+            if self._bm25_generation != self.store.generation:
+                self._start_bm25_build()
+            bm25 = self.bm25 if self._bm25_generation == self.store.generation else None
+            live = self.store.live
+        if bm25 is None:
+            return None
+        return bm25.search(query_tokens, top_k, live=live, require_all=require_all)
+
+    def distances(self, rows: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+        """Cosine distance from the query to the given rows."""
+        with self._lock:
+            return 1.0 - self.store.vectors(np.asarray(rows, dtype=np.int64)) @ query_vector
+
+    def results(self, rows: np.ndarray, distances: Iterable[Optional[float]]) -> List[dict]:
+        """
+        Turn rows into context dicts, scored with the given distances (None
+        when unknown), carrying the chunker's content id of their text.
+        """
+        with self._lock:
+            results = []
+            for row, distance in zip(rows, distances):
+                chunk = self.store.chunk(int(row))
+                text = chunk.get("text", "")
+                results.append({
+                    "source_uri": chunk.get("source_uri", ""),
+                    "source_name": chunk.get("source_name", ""),
+                    "text": text,
+                    "chunk_id": chunk_id(text),
+                    "score": None if distance is None else float(distance),
+                })
+            return results
+
+    def _exact_search(self, query_vector: np.ndarray, top_k: int, first_row: int = 0):
+        """Exact top_k over the rows from `first_row` on."""
+        distances = 1.0 - self.store.similarities(query_vector, first_row)
+        distances[~self.store.live[first_row:]] = np.inf
+        if distances.size > top_k:
+            rows = np.argpartition(distances, top_k - 1)[:top_k]
+        else:
+            rows = np.arange(distances.size)
+        return rows + first_row, distances[rows]
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = DEFAULT_TOP_K,
+        distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+    ) -> List[dict]:
+        """
+        Return up to `top_k` chunks closer than `distance_threshold`.
+        """
+        with self._lock:
+            self._sync()
+            if not len(self) or top_k <= 0:
+                return []
+            hnsw = self.hnsw
+            if hnsw is not None and hnsw.size:
+                covered = min(hnsw.size, len(self.store))
+                rows, distances = hnsw.search(query_vector, top_k)
+                rows, distances = rows[rows < covered], distances[rows < covered]
+                # Another worker may have deleted rows the graph still holds
+                live = np.asarray(self.store.live[rows], dtype=bool)
+                rows, distances = rows[live], distances[live]
+                if covered < len(self.store):
+                    # Rows the graph has not caught up with yet
+                    tail_rows, tail_distances = self._exact_search(query_vector, top_k, covered)
+                    rows = np.concatenate((rows, tail_rows))
+                    distances = np.concatenate((distances, tail_distances))
+            else:
+                rows, distances = self._exact_search(query_vector, top_k)
+
+            order = np.argsort(distances, kind="stable")
+            order = order[distances[order] < distance_threshold]
+            return self.results(rows[order], distances[order])
+
+
+class LocalRetrievalBackend(RetrievalBackend):
+    """
+    Serves corpora from chunk stores under `store_dir`.
+
+    Corpora are keyed by the same resource names the Vertex backend uses, so
+    tools can switch backends without changing how they name corpora. Any
+    worker process can open a corpus another process wrote.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        store_dir: str = LOCAL_STORE_DIR,
+    ):
+        self._embedder = embedder
+        self.store_dir = store_dir
+        self._corpora: Dict[str, LocalCorpusIndex] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def embedder(self) -> Embedder:
+        # Created lazily so importing the backend never needs Vertex AI
+        if self._embedder is None:
+            self._embedder = create_embedder()
+        return self._embedder
+
+    def corpus_path(self, corpus_resource_name: str) -> str:
+        return os.path.join(
+            self.store_dir, re.sub(r"[^a-zA-Z0-9_-]", "_", corpus_resource_name)
+        )
+
+    def get_corpus(self, corpus_resource_name: str) -> Optional[LocalCorpusIndex]:
+        path = self.corpus_path(corpus_resource_name)
+        with self._lock:
+            if not ChunkStore.exists(path):
+                # Dropped, possibly by another worker
+                self._corpora.pop(corpus_resource_name, None)
+                return None
+            index = self._corpora.get(corpus_resource_name)
+            if index is None:
+                index = LocalCorpusIndex(ChunkStore(path))
+                self._corpora[corpus_resource_name] = index
+            return index
+
+    def _get_or_create_corpus(self, corpus_resource_name: str) -> LocalCorpusIndex:
+        with self._lock:
+            index = self.get_corpus(corpus_resource_name)
+            if index is None:
+                store = ChunkStore(
+                    self.corpus_path(corpus_resource_name), dim=self.embedder.dim
+                )
+                index = LocalCorpusIndex(store)
+                self._corpora[corpus_resource_name] = index
+            return index
+
+    def add_chunks(
+        self,
+        corpus_resource_name: str,
+        chunks: List[dict],
+        known_embeddings: Optional[Dict[str, np.ndarray]] = None,
+    ) -> int:
+        """
+        Embed and index chunks for a corpus, creating the corpus if needed.
+
+        Args:
+            corpus_resource_name (str): Corpus to index into
+            chunks (List[dict]): Chunk records with source_uri, source_name and text
+            known_embeddings (Dict[str, np.ndarray], optional): Embeddings by
+                chunk id; chunks with an "id" found here are not embedded again
+
+        Returns:
+            int: Number of chunks indexed
+        """
+        if not chunks:
+            return 0
+        known_embeddings = known_embeddings or {}
+        missing = [i for i, c in enumerate(chunks) if c.get("id") not in known_embeddings]
+        if len(missing) == len(chunks):
+            embeddings = self.embedder.embed_documents([c["text"] for c in chunks])
+        else:
+            embeddings = np.empty((len(chunks), self.embedder.dim), dtype=np.float32)
+            for i, chunk in enumerate(chunks):
+                if chunk.get("id") in known_embeddings:
+                    embeddings[i] = known_embeddings[chunk["id"]]
+            if missing:
+                embeddings[missing] = self.embedder.embed_documents([chunks[i]["text"] for i in missing])
+        self._get_or_create_corpus(corpus_resource_name).add(chunks, embeddings)
+        return len(chunks)
+
+    def source_embeddings(self, corpus_resource_name: str, source_uri: str) -> Dict[str, np.ndarray]:
+        """Embeddings of a source document's chunks by chunk id, for reuse."""
+        index = self.get_corpus(corpus_resource_name)
+        if index is None:
+            return {}
+        texts, vectors = index.source_vectors(source_uri)
+        return {chunk_id(text): vector for text, vector in zip(texts, vectors)}
+
+    def delete_source(
+        self,
+        corpus_resource_name: str,
+        source: str,
+        field: str = "source_uri",
+    ) -> int:
+        """Remove a document's chunks; returns the number removed."""
+        index = self.get_corpus(corpus_resource_name)
+        return index.remove_source(source, field) if index is not None else 0
+
+    def drop_corpus(self, corpus_resource_name: str) -> None:
+        with self._lock:
+            self._corpora.pop(corpus_resource_name, None)
+            path = self.corpus_path(corpus_resource_name)
+            if ChunkStore.exists(path):
+                ChunkStore(path).destroy()
+
+    def has_corpus(self, corpus_resource_name: str) -> bool:
+        return self.get_corpus(corpus_resource_name) is not None
+
+    def retrieve(
+        self,
+        corpus_resource_name: str,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+    ) -> List[dict]:
+        index = self.get_corpus(corpus_resource_name)
+        if index is None or not len(index):
+            return []
+        query_vector = self.embedder.embed_query(query)
+        return index.search(query_vector, top_k, distance_threshold)
@@ -0,0 +1,303 @@
+"""
+MinHash/LSH detection of near-duplicate chunks across a corpus.
+
+Corpora collect revisions of the same spec and boilerplate pages; their
+near-identical chunks crowd the top_k results and cost embeddings. Each
+chunk gets a MinHash signature of its word 3-shingles, and the signatures
+of every chunk in a corpus are kept in banded LSH tables in SQLite. A new
+chunk is only compared with the chunks it shares an LSH bucket with, so a
+check costs a few indexed lookups however large the corpus grows.
+Candidates are confirmed by their estimated Jaccard similarity.
+
+NEAR_DUP_MODE decides what ingestion does with a near-duplicate: "flag"
+indexes it and reports it, "drop" leaves it out, "off" skips the check.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import NEAR_DUP_DB, NEAR_DUP_MODE, NEAR_DUP_NUM_PERM, NEAR_DUP_THRESHOLD
+from ..models.chunking import tokenize
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHINGLE_SIZE = 3
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    (bands, rows) whose LSH S-curve turns at or just below `threshold`.
+
+    Pairs above the threshold are then almost always candidates; the ones
+    below it that slip through are dropped by the similarity check.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """MinHash signatures of word shingles, with fixed seeded permutations."""
+
+    def __init__(self, num_perm: int = NEAR_DUP_NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Distinct 32-bit hashes of the text's word 3-shingles."""
+        tokens = tokenize(text.lower())
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode("utf-8")) for token in tokens),
+            dtype=np.uint64,
+            count=len(tokens),
+        )
+        width = min(_SHINGLE_SIZE, len(hashes))
+        if width == 0:
+            return np.zeros(1, dtype=np.uint64)
+        count = len(hashes) - width + 1
+        combined = np.zeros(count, dtype=np.uint64)
+        for offset in range(width):
+            combined = combined * np.uint64(1000003) ^ hashes[offset:offset + count]
+        return np.unique(combined & _MAX_HASH)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of one text, shape (num_perm,)."""
+        shingles = self.shingles(text)[:, None]
+        permuted = ((shingles * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """Signatures of several texts, shape (len(texts), num_perm)."""
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for row, text in enumerate(texts):
+            out[row] = self.signature(text)
+        return out
+
+
+class NearDuplicateIndex:
+    """
+    Persistent LSH tables of the chunk signatures of every corpus.
+
+    One connection is shared behind a lock, like the other ingestion stores;
+    it is opened on first use.
+    """
+
+    def __init__(
+        self,
+        path: str = NEAR_DUP_DB,
+        threshold: float = NEAR_DUP_THRESHOLD,
+        num_perm: int = NEAR_DUP_NUM_PERM,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._checked = 0
+        self._duplicates = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """The shared connection; the lock must be held."""
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS corpora (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS signatures (
+                    id INTEGER PRIMARY KEY,
+                    corpus_id INTEGER NOT NULL,
+                    source_uri TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    signature BLOB NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS signatures_source ON signatures (corpus_id, source_uri)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS buckets (
+                    corpus_id INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    signature_id INTEGER NOT NULL,
+                    PRIMARY KEY (corpus_id, bucket, signature_id)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def _corpus_id(self, conn: sqlite3.Connection, corpus: str, create: bool) -> Optional[int]:
+        row = conn.execute("SELECT id FROM corpora WHERE name = ?", (corpus,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return conn.execute("INSERT INTO corpora (name) VALUES (?)", (corpus,)).lastrowid
+
+    def _buckets(self, signature: np.ndarray) -> List[int]:
+        """LSH bucket of every band, as signed 64-bit keys."""
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(rows.tobytes(), digest_size=8, person=band.to_bytes(2, "big"))
+            keys.append(int.from_bytes(digest.digest(), "big", signed=True))
+        return keys
+
+    def _similarity(self, a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.count_nonzero(a == b)) / len(a)
+
+    def check(
+        self,
+        corpus: str,
+        texts: Sequence[str],
+        exclude_sources: Iterable[str] = (),
+    ) -> Tuple[np.ndarray, List[Optional[dict]]]:
+        """
+        Find a near-duplicate for each chunk, in the corpus or earlier in `texts`.
+
+        Args:
+            corpus (str): Corpus resource name
+            texts (Sequence[str]): Chunk texts of one document, in order
+            exclude_sources (Iterable[str]): Sources not to match against,
+                e.g. the revision a document replaces
+
+        Returns:
+            Tuple[np.ndarray, List[Optional[dict]]]: The chunks' signatures and,
+            per chunk, None or the match's source_uri, chunk_id (or index
+            within `texts`) and estimated similarity
+        """
+        exclude = set(exclude_sources)
+        signatures = self.hasher.signatures(texts)
+        matches: List[Optional[dict]] = []
+        # Buckets of this document's own chunks, for repeats within it
+        local_buckets: dict = {}
+        with self._lock:
+            conn = self._connect()
+            corpus_id = self._corpus_id(conn, corpus, create=False)
+            for row, signature in enumerate(signatures):
+                buckets = self._buckets(signature)
+                best = None
+                if corpus_id is not None:
+                    candidates = conn.execute(
+                        "SELECT DISTINCT s.source_uri, s.chunk_id, s.signature FROM buckets b "
+                        "JOIN signatures s ON s.id = b.signature_id "
+                        f"WHERE b.corpus_id = ? AND b.bucket IN ({','.join('?' * len(buckets))})",
+                        (corpus_id, *buckets),
+                    ).fetchall()
+                    for source_uri, chunk_id, blob in candidates:
+                        if source_uri in exclude:
+                            continue
+                        similarity = self._similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+                        if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                            best = {"source_uri": source_uri, "chunk_id": chunk_id, "similarity": similarity}
+                if best is None:
+                    earlier = {index for key in buckets for index in local_buckets.get(key, ())}
+                    for index in sorted(earlier):
+                        similarity = self._similarity(signature, signatures[index])
+                        if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                            best = {"source_uri": None, "chunk_index": index, "similarity": similarity}
+                for key in buckets:
+                    local_buckets.setdefault(key, []).append(row)
+                matches.append(best)
+            self._checked += len(texts)
+            self._duplicates += sum(1 for match in matches if match is not None)
+        return signatures, matches
+
+    def add(
+        self,
+        corpus: str,
+        source_uri: str,
+        chunk_ids: Sequence[str],
+        signatures: np.ndarray,
+    ) -> None:
+        """Record indexed chunks so later chunks are checked against them."""
+        if not len(chunk_ids):
+            return
+        with self._lock:
+            conn = self._connect()
+            corpus_id = self._corpus_id(conn, corpus, create=True)
+            conn.execute("BEGIN")
+            try:
+                for chunk_id, signature in zip(chunk_ids, signatures):
+                    signature_id = conn.execute(
+                        "INSERT INTO signatures (corpus_id, source_uri, chunk_id, signature) "
+                        "VALUES (?, ?, ?, ?)",
+                        (corpus_id, source_uri, chunk_id, signature.tobytes()),
+                    ).lastrowid
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                        [(corpus_id, key, signature_id) for key in self._buckets(signature)],
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def remove_source(self, corpus: str, source_uri: str) -> int:
+        """Forget the chunks of a deleted document; returns how many."""
+        with self._lock:
+            conn = self._connect()
+            corpus_id = self._corpus_id(conn, corpus, create=False)
+            if corpus_id is None:
+                return 0
+            conn.execute(
+                "DELETE FROM buckets WHERE corpus_id = ? AND signature_id IN "
+                "(SELECT id FROM signatures WHERE corpus_id = ? AND source_uri = ?)",
+                (corpus_id, corpus_id, source_uri),
+            )
+            cursor = conn.execute(
+                "DELETE FROM signatures WHERE corpus_id = ? AND source_uri = ?", (corpus_id, source_uri)
+            )
+        return cursor.rowcount
+
+    def remove_corpus(self, corpus: str) -> int:
+        """Forget every chunk of a deleted corpus."""
+        with self._lock:
+            conn = self._connect()
+            corpus_id = self._corpus_id(conn, corpus, create=False)
+            if corpus_id is None:
+                return 0
+            conn.execute("DELETE FROM buckets WHERE corpus_id = ?", (corpus_id,))
+            cursor = conn.execute("DELETE FROM signatures WHERE corpus_id = ?", (corpus_id,))
+            conn.execute("DELETE FROM corpora WHERE id = ?", (corpus_id,))
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            chunks = self._connect().execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+            return {
+                "mode": NEAR_DUP_MODE,
+                "threshold": self.threshold,
+                "bands": self.bands,
+                "rows_per_band": self.rows,
+                "chunks": chunks,
+                "checked": self._checked,
+                "near_duplicates": self._duplicates,
+            }
+
+
+def near_dup_enabled() -> bool:
+    return NEAR_DUP_MODE in ("flag", "drop")
+
+
+# Shared by add_data and the delete tools
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,283 @@
+"""
+Semantic cache: serves a cached value for queries that are near-duplicates of
+a recent query, judged by the cosine similarity of their embeddings.
+
+Embeddings barely register a changed part number or SKU, so a match must
+also name exactly the same identifiers, and queries made only of
+identifiers are never embedded or cached: they are answered by the
+retrieval cache and by lexical search.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import (
+    SEMANTIC_CACHE_EMBEDDING_CACHE_SIZE,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_SIMILARITY,
+    SEMANTIC_CACHE_TTL_SECONDS,
+)
+from .bm25 import identifier_terms, identifier_tokens
+from .cache import normalize_query
+from .embedders import Embedder, create_embedder, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+_embedder: Optional[Embedder] = None
+_embedder_lock = threading.Lock()
+
+
+def _get_embedder() -> Embedder:
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = create_embedder()
+        return _embedder
+
+
+@lru_cache(maxsize=SEMANTIC_CACHE_EMBEDDING_CACHE_SIZE)
+def _embed_normalized(normalized_query: str) -> np.ndarray:
+    vector = normalize_rows(_get_embedder().embed_query(normalized_query))
+    vector.flags.writeable = False
+    return vector
+
+
+def query_embedding(query: str) -> Optional[np.ndarray]:
+    """
+    Embed a query for semantic cache lookups.
+
+    Embeddings are memoised by normalised query text, so the answer cache and
+    the context cache looked up for the same request embed it only once.
+
+    Returns:
+        Optional[np.ndarray]: Unit vector, or None for identifier queries
+        (which bypass the cache) and if embedding failed
+    """
+    if identifier_tokens(query) is not None:
+        return None
+    try:
+        return _embed_normalized(normalize_query(query))
+    except Exception as e:
+        logger.warning(f"Semantic cache embedding failed: {str(e)}")
+        return None
+
+
+class _Partition:
+    """Query vectors and values cached for one corpus and scope."""
+
+    def __init__(self, dim: int, version: int):
+        self.version = version
+        self.vectors = np.zeros((8, dim), dtype=np.float32)
+        # (query, identifier terms, value, expires_at)
+        self.entries: List[Optional[Tuple[str, frozenset, Any, float]]] = [None] * 8
+        self.free = list(range(7, -1, -1))
+
+    def insert(self, vector: np.ndarray, entry: Tuple[str, frozenset, Any, float]) -> int:
+        if not self.free:
+            capacity = len(self.entries)
+            self.vectors = np.vstack([self.vectors, np.zeros_like(self.vectors)])
+            self.entries.extend([None] * capacity)
+            self.free = list(range(2 * capacity - 1, capacity - 1, -1))
+        slot = self.free.pop()
+        self.vectors[slot] = vector
+        self.entries[slot] = entry
+        return slot
+
+    def remove(self, slot: int) -> None:
+        # A zero vector never reaches a positive similarity radius
+        self.vectors[slot] = 0.0
+        self.entries[slot] = None
+        self.free.append(slot)
+
+    def __len__(self) -> int:
+        return len(self.entries) - len(self.free)
+
+
+class SemanticCache:
+    """
+    Thread-safe near-duplicate cache.
+
+    Entries are grouped into partitions keyed by corpus resource name plus an
+    optional scope (e.g. top_k and distance threshold for retrieval results).
+    Each partition holds a small matrix of unit query vectors, so a lookup is
+    one matrix-vector product; the best match with a similarity of at least
+    `similarity` and the same identifier terms as the query is served.
+
+    Partitions remember the corpus version their entries were computed at and
+    are emptied as soon as a newer version is seen. Entries expire after
+    `ttl_seconds` and the least recently used ones are evicted once the cache
+    holds `max_entries`, across all partitions.
+    """
+
+    def __init__(
+        self,
+        similarity: float = SEMANTIC_CACHE_SIMILARITY,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._enabled = enabled
+        self._partitions: Dict[Tuple, _Partition] = {}
+        # (partition key, slot) in least-recently-used order
+        self._lru: "OrderedDict[Tuple[Tuple, int], None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._similarity_total = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and self.max_entries > 0
+
+    def _partition(self, key: Tuple, dim: int, version: int) -> Optional[_Partition]:
+        partition = self._partitions.get(key)
+        if partition is not None and partition.version != version:
+            # The corpus changed since these entries were cached
+            self._drop_partition(key)
+            partition = None
+        if partition is None and dim:
+            partition = _Partition(dim, version)
+            self._partitions[key] = partition
+        return partition
+
+    def _drop_partition(self, key: Tuple) -> int:
+        partition = self._partitions.pop(key)
+        for slot, entry in enumerate(partition.entries):
+            if entry is not None:
+                del self._lru[(key, slot)]
+        return len(partition)
+
+    def _remove(self, key: Tuple, slot: int) -> None:
+        self._partitions[key].remove(slot)
+        del self._lru[(key, slot)]
+        if not len(self._partitions[key]):
+            del self._partitions[key]
+
+    def lookup(
+        self,
+        corpus_resource_name: str,
+        query: str,
+        query_vector: Optional[np.ndarray],
+        version: int,
+        scope: Hashable = (),
+    ) -> Optional[Tuple[Any, float, str]]:
+        """
+        Find a cached value for a near-duplicate query.
+
+        Args:
+            corpus_resource_name (str): Corpus the value was computed against
+            query (str): The query text, for its identifier terms
+            query_vector (np.ndarray): Unit query embedding from query_embedding()
+            version (int): Current corpus version from the corpus registry
+            scope (Hashable): Further partitioning, e.g. retrieval parameters
+
+        Returns:
+            Optional[Tuple[Any, float, str]]: The value, the similarity of the
+                match and the cached query text, or None on a miss
+        """
+        if not self.enabled or query_vector is None:
+            return None
+        key = (corpus_resource_name, scope)
+        identifiers = identifier_terms(query)
+        with self._lock:
+            partition = self._partition(key, 0, version)
+            if partition is not None:
+                similarities = partition.vectors @ query_vector
+                close = np.flatnonzero(similarities >= self.similarity)
+                now = time.monotonic()
+                for slot in close[np.argsort(-similarities[close], kind="stable")].tolist():
+                    entry = partition.entries[slot]
+                    if entry is None:
+                        continue
+                    cached_query, cached_identifiers, value, expires_at = entry
+                    if expires_at <= now:
+                        self._remove(key, slot)
+                        if key not in self._partitions:
+                            break
+                        continue
+                    if cached_identifiers != identifiers:
+                        continue
+                    self._lru.move_to_end((key, slot))
+                    self._hits += 1
+                    self._similarity_total += float(similarities[slot])
+                    return value, float(similarities[slot]), cached_query
+            self._misses += 1
+            return None
+
+    def store(
+        self,
+        corpus_resource_name: str,
+        query: str,
+        query_vector: Optional[np.ndarray],
+        version: int,
+        value: Any,
+        scope: Hashable = (),
+    ) -> None:
+        """Cache a value computed for `query` at the given corpus version."""
+        if not self.enabled or query_vector is None:
+            return
+        key = (corpus_resource_name, scope)
+        with self._lock:
+            partition = self._partition(key, query_vector.shape[0], version)
+            slot = partition.insert(
+                query_vector,
+                (query, identifier_terms(query), value, time.monotonic() + self.ttl_seconds),
+            )
+            self._lru[(key, slot)] = None
+            while len(self._lru) > self.max_entries:
+                self._remove(*next(iter(self._lru)))
+                self._evictions += 1
+
+    def invalidate(self, corpus_resource_name: Optional[str] = None) -> int:
+        """
+        Drop entries for one corpus, or for all corpora.
+
+        Returns:
+            int: Number of entries dropped
+        """
+        with self._lock:
+            keys = [
+                key for key in self._partitions
+                if corpus_resource_name is None or key[0] == corpus_resource_name
+            ]
+            return sum(self._drop_partition(key) for key in keys)
+
+    def stats(self) -> dict:
+        """
+        Report hit ratio, mean matched similarity and memory footprint.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "mean_hit_similarity": (
+                    self._similarity_total / self._hits if self._hits else None
+                ),
+                "evictions": self._evictions,
+                "entries": len(self._lru),
+                "max_entries": self.max_entries,
+                "partitions": len(self._partitions),
+                "vector_bytes": sum(p.vectors.nbytes for p in self._partitions.values()),
+                "similarity": self.similarity,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# Retrieved contexts, scoped by (top_k, distance_threshold)
+semantic_context_cache = SemanticCache()
+# Final agent answers from the /query endpoint
+semantic_answer_cache = SemanticCache()
@@ -0,0 +1,431 @@
+"""
+Persistent on-disk chunk store for local corpora.
+
+Each corpus lives in its own directory:
+
+    manifest.json          row/byte counts and the active generation
+    gen-<n>/embeddings.bin float32 or int8 embedding matrix (rows x dim)
+    gen-<n>/scales.bin     float32 per-row scales (int8 only)
+    gen-<n>/text.bin       UTF-8 chunk texts, back to back
+    gen-<n>/offsets.bin    int64 end offset of each chunk in text.bin
+    gen-<n>/sources.bin    int32 source id of each chunk
+    gen-<n>/sources.jsonl  one {"source_uri", "source_name"} record per source id
+    gen-<n>/live.bin       uint8 tombstone mask (0 = deleted)
+    gen-<n>/hnsw.npz       HNSW graph over the generation's rows, if built
+
+Readers open the files with np.memmap, so every worker process shares one copy
+through the page cache and opening a corpus costs no parsing. Writers append
+to the data files and then atomically replace the manifest; readers only look
+at the rows the manifest covers, so a half-written append is never visible,
+and the next append truncates it away. Compaction writes a new generation
+directory and switches the manifest to it; the old generation is only
+removed LOCAL_STORE_RETIRE_SECONDS later, so readers that read the previous
+manifest can still open it.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import LOCAL_STORE_DTYPE, LOCAL_STORE_RETIRE_SECONDS
+from .embedders import normalize_rows
+
+MANIFEST = "manifest.json"
+LOCK = ".lock"
+
+# Rows scored per block so int8 matrices are never fully upcast at once
+SCORE_BLOCK_ROWS = 8192
+
+# Times a reader retries opening a generation that was just retired
+MAP_ATTEMPTS = 3
+
+
+def _read_array(path: str, dtype, count: int, dim: Optional[int] = None) -> np.ndarray:
+    shape = (count, dim) if dim else (count,)
+    if count == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class ChunkStore:
+    """
+    Append-only chunk store for one corpus, read through memory maps.
+
+    Args:
+        path (str): Corpus directory
+        dim (int, optional): Embedding dimensionality; required to create a store
+        dtype (str): "float32" or "int8" for newly created stores
+    """
+
+    def __init__(self, path: str, dim: Optional[int] = None, dtype: str = LOCAL_STORE_DTYPE):
+        self.path = path
+        self._manifest_stat: Optional[Tuple[int, int]] = None
+        self.manifest: dict = {}
+        if not os.path.exists(os.path.join(path, MANIFEST)):
+            if dim is None:
+                raise FileNotFoundError(f"No chunk store at {path}")
+            if dtype not in ("float32", "int8"):
+                raise ValueError(f"Unsupported store dtype '{dtype}'")
+            os.makedirs(os.path.join(path, "gen-0"), exist_ok=True)
+            with self._locked():
+                if not os.path.exists(os.path.join(path, MANIFEST)):
+                    self._write_manifest({
+                        "dim": dim,
+                        "dtype": dtype,
+                        "generation": 0,
+                        "count": 0,
+                        "deleted": 0,
+                        "text_bytes": 0,
+                        "sources": 0,
+                        "sources_bytes": 0,
+                        "retired": [],
+                    })
+        self.reload()
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, MANIFEST))
+
+    # ---- manifest and locking -------------------------------------------
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def try_lock(self, name: str):
+        """
+        Take a named exclusive lock without waiting.
+
+        Yields:
+            bool: True if this process holds the lock
+        """
+        with open(os.path.join(self.path, name), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_manifest(self, manifest: dict) -> None:
+        tmp_path = os.path.join(self.path, f"{MANIFEST}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+    def _file(self, name: str, generation: Optional[int] = None) -> str:
+        if generation is None:
+            generation = self.manifest["generation"]
+        return os.path.join(self.path, f"gen-{generation}", name)
+
+    def index_file(self, name: str, generation: Optional[int] = None) -> str:
+        """Path of a derived index kept with a generation (default: the current one)."""
+        return self._file(name, generation)
+
+    def reload(self) -> bool:
+        """
+        Re-open the memory maps if another writer changed the store.
+
+        Returns:
+            bool: True if the store changed since the last call
+        """
+        for attempt in range(MAP_ATTEMPTS):
+            stat = os.stat(os.path.join(self.path, MANIFEST))
+            key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if key == self._manifest_stat:
+                return False
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                manifest = json.load(f)
+            try:
+                self._map(manifest)
+            except FileNotFoundError:
+                # The generation was retired after we read the manifest; a
+                # newer manifest points at the current one
+                if attempt == MAP_ATTEMPTS - 1:
+                    raise
+                continue
+            self._manifest_stat = key
+            return True
+        return False
+
+    def _map(self, manifest: dict) -> None:
+        self.manifest = manifest
+        count, dim = manifest["count"], manifest["dim"]
+        dtype = np.int8 if self.is_quantized else np.float32
+        self.embeddings = _read_array(self._file("embeddings.bin"), dtype, count, dim)
+        self.scales = (
+            _read_array(self._file("scales.bin"), np.float32, count)
+            if self.is_quantized else None
+        )
+        self.offsets = _read_array(self._file("offsets.bin"), np.int64, count)
+        self.source_ids = _read_array(self._file("sources.bin"), np.int32, count)
+        self.live = _read_array(self._file("live.bin"), np.uint8, count).view(bool)
+        self._text = _read_array(self._file("text.bin"), np.uint8, self.manifest["text_bytes"])
+        self._sources: Optional[List[dict]] = None
+        self._sources_bytes: Optional[int] = self.manifest.get("sources_bytes")
+
+    # ---- reading -----------------------------------------------------------
+
+    @property
+    def dim(self) -> int:
+        return self.manifest["dim"]
+
+    @property
+    def is_quantized(self) -> bool:
+        return self.manifest["dtype"] == "int8"
+
+    @property
+    def generation(self) -> int:
+        return self.manifest["generation"]
+
+    def __len__(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def live_count(self) -> int:
+        return self.manifest["count"] - self.manifest["deleted"]
+
+    @property
+    def sources(self) -> List[dict]:
+        if self._sources is None:
+            count = self.manifest["sources"]
+            if not count:
+                self._sources, self._sources_bytes = [], 0
+                return self._sources
+            with open(self._file("sources.jsonl"), "rb") as f:
+                if self._sources_bytes is not None:
+                    lines = f.read(self._sources_bytes).splitlines()
+                else:
+                    # Written before the manifest recorded the byte length
+                    lines = f.read().splitlines()[:count]
+                    self._sources_bytes = sum(len(line) + 1 for line in lines)
+            self._sources = [json.loads(line) for line in lines]
+        return self._sources
+
+    def text(self, row: int) -> str:
+        start = int(self.offsets[row - 1]) if row else 0
+        return bytes(self._text[start:int(self.offsets[row])]).decode("utf-8")
+
+    def chunk(self, row: int) -> dict:
+        """Return the chunk record (source fields and text) stored at a row."""
+        record = dict(self.sources[int(self.source_ids[row])])
+        record["text"] = self.text(row)
+        return record
+
+    def vectors(self, rows=None) -> np.ndarray:
+        """Dequantised float32 embeddings for the given rows (default: all)."""
+        if rows is None:
+            rows = slice(None)
+        vectors = np.asarray(self.embeddings[rows], dtype=np.float32)
+        if self.is_quantized:
+            vectors = vectors * self.scales[rows][:, None]
+        return vectors
+
+    def similarities(self, query: np.ndarray, first_row: int = 0) -> np.ndarray:
+        """Cosine similarity of a normalised query to every row from `first_row` on."""
+        count = len(self)
+        scores = np.empty(max(count - first_row, 0), dtype=np.float32)
+        for start in range(first_row, count, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, count)
+            block = self.embeddings[start:end]
+            if self.is_quantized:
+                scores[start - first_row:end - first_row] = (block @ query) * self.scales[start:end]
+            else:
+                scores[start - first_row:end - first_row] = block @ query
+        return scores
+
+    def rows_for_source(self, source: str, field: str = "source_uri") -> np.ndarray:
+        """Live rows whose source record has `field` equal to `source`."""
+        source_ids = [i for i, s in enumerate(self.sources) if s.get(field) == source]
+        if not source_ids or not len(self):
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.isin(self.source_ids, source_ids) & self.live)
+
+    # ---- writing -----------------------------------------------------------
+
+    def _quantize(self, embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(embeddings / scales[:, None]), -127, 127)
+        return quantized.astype(np.int8), scales.astype(np.float32)
+
+    def _append_file(self, name: str, data: bytes, expected_size: int, generation: int) -> None:
+        path = self._file(name, generation)
+        # Drop bytes left behind by an append that never reached the manifest
+        with open(path, "ab") as f:
+            f.truncate(expected_size)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, chunks: List[dict], embeddings: np.ndarray) -> range:
+        """
+        Append chunks and their embeddings.
+
+        Args:
+            chunks (List[dict]): Records with source_uri, source_name and text
+            embeddings (np.ndarray): One row per chunk
+
+        Returns:
+            range: Row numbers assigned to the new chunks
+        """
+        if len(chunks) != len(embeddings):
+            raise ValueError("Number of chunks and embeddings must match")
+        embeddings = normalize_rows(embeddings)
+
+        with self._locked():
+            self.reload()
+            manifest = dict(self.manifest)
+            generation, count, dim = manifest["generation"], manifest["count"], manifest["dim"]
+            if embeddings.shape[1] != dim:
+                raise ValueError(f"Expected {dim}-dimensional embeddings")
+
+            source_index: Dict[Tuple[str, str], int] = {
+                (s.get("source_uri", ""), s.get("source_name", "")): i
+                for i, s in enumerate(self.sources)
+            }
+            new_sources = []
+            source_ids = np.empty(len(chunks), dtype=np.int32)
+            texts = []
+            for i, chunk in enumerate(chunks):
+                key = (chunk.get("source_uri", ""), chunk.get("source_name", ""))
+                if key not in source_index:
+                    source_index[key] = len(source_index)
+                    new_sources.append({"source_uri": key[0], "source_name": key[1]})
+                source_ids[i] = source_index[key]
+                texts.append(chunk["text"].encode("utf-8"))
+
+            lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+            offsets = manifest["text_bytes"] + np.cumsum(lengths)
+
+            if self.is_quantized:
+                matrix, scales = self._quantize(embeddings)
+                self._append_file("embeddings.bin", matrix.tobytes(), count * dim, generation)
+                self._append_file("scales.bin", scales.tobytes(), count * 4, generation)
+            else:
+                self._append_file("embeddings.bin", embeddings.tobytes(), count * dim * 4, generation)
+            self._append_file("text.bin", b"".join(texts), manifest["text_bytes"], generation)
+            self._append_file("offsets.bin", offsets.tobytes(), count * 8, generation)
+            self._append_file("sources.bin", source_ids.tobytes(), count * 4, generation)
+            self._append_file("live.bin", b"\x01" * len(chunks), count, generation)
+            source_lines = "".join(json.dumps(source) + "\n" for source in new_sources).encode("utf-8")
+            self._append_file("sources.jsonl", source_lines, self._sources_bytes, generation)
+
+            manifest["count"] = count + len(chunks)
+            manifest["text_bytes"] = int(offsets[-1]) if len(offsets) else manifest["text_bytes"]
+            manifest["sources"] = len(source_index)
+            manifest["sources_bytes"] = self._sources_bytes + len(source_lines)
+            manifest["retired"] = self._remove_retired(manifest.get("retired", []))
+            self._write_manifest(manifest)
+            self.reload()
+        return range(count, count + len(chunks))
+
+    def delete_rows(self, rows: Iterable[int]) -> int:
+        """
+        Tombstone rows. The mask is shared, so other workers see it at once.
+
+        Returns:
+            int: Number of rows newly deleted
+        """
+        rows = np.asarray(list(rows), dtype=np.int64)
+        if not rows.size:
+            return 0
+        with self._locked():
+            self.reload()
+            live = np.memmap(self._file("live.bin"), dtype=np.uint8, mode="r+", shape=(len(self),))
+            newly_deleted = int(live[rows].astype(bool).sum())
+            live[rows] = 0
+            live.flush()
+            del live
+            manifest = dict(self.manifest)
+            manifest["deleted"] += newly_deleted
+            self._write_manifest(manifest)
+            self.reload()
+        return newly_deleted
+
+    def _remove_retired(self, retired: List[list]) -> List[list]:
+        """
+        Delete retired generations no reader can still be opening; the lock
+        must be held.
+
+        Returns:
+            List[list]: The [generation, retired_at] entries still kept
+        """
+        now = time.time()
+        kept = []
+        for generation, retired_at in retired:
+            if now - retired_at >= LOCAL_STORE_RETIRE_SECONDS:
+                # Open memory maps elsewhere keep the unlinked files alive
+                shutil.rmtree(os.path.join(self.path, f"gen-{generation}"), ignore_errors=True)
+            else:
+                kept.append([generation, retired_at])
+        return kept
+
+    def compact(self) -> None:
+        """
+        Rewrite live rows into a new generation and retire the old one; it
+        is deleted by a later write once LOCAL_STORE_RETIRE_SECONDS passed.
+        """
+        with self._locked():
+            self.reload()
+            self.sources  # Committed length of sources.jsonl
+            old_generation = self.generation
+            generation = old_generation + 1
+            rows = np.flatnonzero(self.live)
+            os.makedirs(os.path.join(self.path, f"gen-{generation}"), exist_ok=True)
+
+            starts = np.concatenate([[0], np.asarray(self.offsets[:-1])]) if len(self) else np.zeros(0, np.int64)
+            ends = np.asarray(self.offsets)
+            text = b"".join(bytes(self._text[starts[r]:ends[r]]) for r in rows)
+            lengths = ends[rows] - starts[rows]
+
+            def write(name, data):
+                with open(self._file(name, generation), "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            write("embeddings.bin", np.asarray(self.embeddings[rows]).tobytes())
+            if self.is_quantized:
+                write("scales.bin", np.asarray(self.scales[rows]).tobytes())
+            write("text.bin", text)
+            write("offsets.bin", np.cumsum(lengths).astype(np.int64).tobytes())
+            write("sources.bin", np.asarray(self.source_ids[rows]).tobytes())
+            write("live.bin", b"\x01" * len(rows))
+            with open(self._file("sources.jsonl"), "rb") as f:
+                write("sources.jsonl", f.read(self._sources_bytes))
+
+            manifest = dict(self.manifest)
+            manifest.update({
+                "generation": generation,
+                "count": len(rows),
+                "deleted": 0,
+                "text_bytes": len(text),
+                "sources_bytes": self._sources_bytes,
+                "retired": self._remove_retired(manifest.get("retired", []))
+                + [[old_generation, time.time()]],
+            })
+            self._write_manifest(manifest)
+            self.reload()
+
+    def destroy(self) -> None:
+        """Delete the store from disk."""
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,55 @@
+"""
+Retrieval backend that queries Vertex AI RAG corpora.
+"""
+
+from typing import List
+
+from vertexai import rag
+
+from ..config import (
+    DEFAULT_DISTANCE_THRESHOLD,
+    DEFAULT_TOP_K,
+)
+from ..tools.corpus_registry import corpus_registry
+from .base import RetrievalBackend
+
+
+class VertexRetrievalBackend(RetrievalBackend):
+    """Runs every query as a rag.retrieval_query RPC."""
+
+    name = "vertex"
+
+    def retrieve(
+        self,
+        corpus_resource_name: str,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+    ) -> List[dict]:
+        rag_retrieval_config = rag.RagRetrievalConfig(
+            top_k=top_k,
+            filter=rag.Filter(vector_distance_threshold=distance_threshold),
+        )
+
+        response = rag.retrieval_query(
+            rag_resources=[
+                rag.RagResource(rag_corpus=corpus_resource_name)
+            ],
+            text=query,
+            rag_retrieval_config=rag_retrieval_config,
+        )
+
+        results = []
+        if hasattr(response, "contexts") and response.contexts:
+            for ctx_group in response.contexts.contexts:
+                result = {
+                    "source_uri": getattr(ctx_group, "source_uri", ""),
+                    "source_name": getattr(ctx_group, "source_display_name", ""),
+                    "text": getattr(ctx_group, "text", ""),
+                    "score": getattr(ctx_group, "score", 0.0),
+                }
+                results.append(result)
+        return results
+
+    def has_corpus(self, corpus_resource_name: str) -> bool:
+        return corpus_registry.lookup(corpus_resource_name) is not None
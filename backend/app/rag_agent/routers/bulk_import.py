@@ -0,0 +1,68 @@
+import os
+import shutil
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from app.rag_agent.concurrency import run_blocking
+from app.rag_agent.config import BULK_IMPORT_BATCH_SIZE, BULK_IMPORT_DIR
+from app.rag_agent.ingestion import Job, submit_bulk_import
+
+router = APIRouter()
+
+
+class BulkImportRequest(BaseModel):
+    """A manifest already in GCS: a JSONL file or a prefix to import whole."""
+
+    corpus_name: str = "earthwork"
+    manifest_uri: Optional[str] = Field(None, description="gs:// URI of a JSONL manifest")
+    gcs_prefix: Optional[str] = Field(None, description="Import every object under this gs:// prefix")
+    batch_size: int = Field(BULK_IMPORT_BATCH_SIZE, ge=1, le=25)
+
+
+def _queued_response(job: Job) -> JSONResponse:
+    return JSONResponse(status_code=202, content={
+        "message": "Queued bulk import",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+    })
+
+
+@router.post("/bulk-import", status_code=202)
+def bulk_import(request: BulkImportRequest):
+    """Queue a bulk import; progress is reported by /jobs/{job_id}."""
+    sources = [source for source in (request.manifest_uri, request.gcs_prefix) if source]
+    if len(sources) != 1:
+        raise HTTPException(status_code=400, detail="Provide exactly one of manifest_uri or gcs_prefix")
+    if not sources[0].startswith("gs://"):
+        raise HTTPException(status_code=400, detail="Manifests must be gs:// URIs")
+
+    if request.manifest_uri:
+        manifest = {"manifest_uri": request.manifest_uri}
+    else:
+        manifest = {"gcs_prefix": request.gcs_prefix}
+    return _queued_response(submit_bulk_import(request.corpus_name, manifest, request.batch_size))
+
+
+def _save_manifest(manifest: UploadFile) -> str:
+    os.makedirs(os.path.join(BULK_IMPORT_DIR, "manifests"), exist_ok=True)
+    path = os.path.join(BULK_IMPORT_DIR, "manifests", f"{uuid.uuid4().hex}.jsonl")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(manifest.file, f, 1024 * 1024)
+    return path
+
+
+@router.post("/bulk-import/manifest", status_code=202)
+async def bulk_import_manifest(
+    manifest: UploadFile = File(...),
+    corpus_name: str = Form("earthwork"),
+    batch_size: int = Form(BULK_IMPORT_BATCH_SIZE),
+):
+    """Queue a bulk import from an uploaded JSONL manifest."""
+    path = await run_blocking(_save_manifest, manifest)
+    job = submit_bulk_import(corpus_name, {"manifest_path": path}, batch_size)
+    return _queued_response(job)
@@ -1,159 +1,242 @@
-import os
-import uuid
+from functools import partial
+from typing import Optional
 
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai.types import Content, Part
-from google.cloud import storage
-
-
-from app.rag_agent.agents.upload_agent import upload_agent
-from app.rag_agent.models.document import validate_document
+from app.rag_agent.concurrency import run_blocking
+from app.rag_agent.ingestion import Job, ingest_queue
+from app.rag_agent.ingestion.pipeline import (
+    IngestionError,
+    ensure_and_import,
+    new_tool_context,
+    verify_documents,
+)
+from app.rag_agent.ingestion.uploads import (
+    DeduplicatedUpload,
+    StreamedUpload,
+    UploadRejected,
+    delete_streamed,
+    stream_multipart_to_gcs,
+)
+from app.rag_agent.tools.content_index import content_index
+from app.rag_agent.tools.utils import get_corpus_resource_name
 
 router = APIRouter()
 
-UPLOAD_DIR = "./api_data/file_locker/"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-# Global persistent session service
-session_service = InMemorySessionService()
-
-# Fixed app and user identifiers 
-APP_NAME = "rag_agent"
-USER_ID = "rag_user"
-SESSION_ID = "upload_session_default"
 
-@router.post("/upload/")
-async def file_upload(file: UploadFile = File(...)):
-    if not validate_document(file):
-        raise HTTPException(status_code=400, detail="Invalid document type")
-
-    try:
-        # Save locally (optional)
-        fname = os.path.join(UPLOAD_DIR, file.filename)
-        with open(fname, "wb") as f:
-            while content := file.file.read(1024 * 1024):
-                f.write(content)
-
-        # Upload to GCS
-        storage_client = storage.Client()
-        bucket_name = os.getenv("GCS_BUCKET", "my-rag-upload-bucket")
-        gcs_path = f"uploads/{uuid.uuid4()}/{file.filename}"
-        blob = storage_client.bucket(bucket_name).blob(gcs_path)
-
-        with open(fname, "rb") as f:
-            blob.upload_from_file(f, content_type="application/pdf")
-
-        gcs_uri = f"gs://{bucket_name}/{gcs_path}"
-        print(f"Uploaded to GCS: {gcs_uri}")
-
-        # Create agent session
-        session_service.create_session(
-            app_name=APP_NAME,
-            user_id=USER_ID,
-            session_id=SESSION_ID
+async def process_upload_job(job: Job, checkpoint) -> dict:
+    """
+    Ingestion job for uploads: import -> verify.
+
+    Files arrive already streamed to GCS.
+
+    The import calls the corpus tools directly (ensure corpus, add_data,
+    get_corpus_info), so no model turns are spent on a fixed workflow. Each
+    finished stage is checkpointed, so a retried or resumed job skips the
+    stages it already completed.
+    """
+    corpus_name = job.payload["corpus_name"]
+    files = job.payload["files"]
+
+    gcs_uris = [file["gcs_uri"] for file in files]
+
+    if job.stage == "import":
+        # A retry imports only the files the last verification missed; the
+        # others are in the corpus and the local index already
+        retry_uris = job.result.get("retry_uris")
+        pending = [file for file in files if retry_uris is None or file["gcs_uri"] in retry_uris]
+        imported = await run_blocking(
+            ensure_and_import,
+            corpus_name,
+            [file["gcs_uri"] for file in pending],
+            [file.get("document_id") for file in pending],
         )
-
-        runner = Runner(
-            agent=upload_agent,
-            app_name=APP_NAME,
-            session_service=session_service,
-        )
-
-        message = (
-            f"Please add the following GCS file to the 'earthwork' corpus:\n"
-            f"GCS URI: {gcs_uri}\n"
-            f"File name: {file.filename}\n"
-            f"Use the add_data tool with paths=[{gcs_uri}] and corpus_name='earthwork'"
-        )
-
-        response_events = runner.run(
-            user_id=USER_ID,
-            session_id=SESSION_ID,
-            new_message=Content(role="user", parts=[Part(text=message)])
+        imported["near_duplicates"] = job.result.get("near_duplicates", []) + imported["near_duplicates"]
+        checkpoint("verify", imported)
+
+    # Uploads made only of near-duplicates were left out on purpose
+    near_duplicates = set(job.result.get("near_duplicates", []))
+    imported_uris = [uri for uri in gcs_uris if uri not in near_duplicates]
+    verification = await run_blocking(verify_documents, corpus_name, imported_uris, new_tool_context())
+    await run_blocking(_index_content, corpus_name, files, gcs_uris, verification["file_ids"])
+    missing = set(verification["missing"])
+    if missing and job.attempts < ingest_queue.max_attempts:
+        # Import the missing files again on the next attempt
+        checkpoint("import", {"verification": verification, "retry_uris": sorted(missing)})
+        raise IngestionError(f"Files not found in corpus after import: {verification['missing']}")
+
+    # Out of attempts: report the files that made it instead of failing them all
+    report = [
+        {
+            "filename": file["filename"],
+            "gcs_uri": uri,
+            "status": (
+                "near_duplicate" if uri in near_duplicates
+                else "failed" if uri in missing
+                else "imported"
+            ),
+        }
+        for file, uri in zip(files, gcs_uris)
+    ]
+    report += [dict(file, status="deduplicated") for file in job.payload.get("deduplicated", [])]
+    report += [dict(file, status="failed") for file in job.payload.get("rejected", [])]
+    return {"verification": verification, "files": report}
+
+
+def _index_content(corpus_name: str, files: list, gcs_uris: list, file_ids: dict) -> None:
+    """Remember which RAG file holds each imported upload's bytes."""
+    entries = [
+        (file["sha256"], file_ids[uri], uri, file["filename"], file.get("size"))
+        for file, uri in zip(files, gcs_uris)
+        if file.get("sha256") and uri in file_ids
+    ]
+    if entries:
+        content_index.record(get_corpus_resource_name(corpus_name), entries)
+
+
+ingest_queue.register("upload", process_upload_job)
+
+
+def _queued_response(job: Job, message: str, **extra) -> JSONResponse:
+    return JSONResponse(status_code=202, content={
+        "message": message,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        **extra,
+    })
+
+
+def _file_report(upload: StreamedUpload) -> list:
+    """Per-file outcome of the upload step: uploaded files, then failures."""
+    report = [
+        {"filename": file.filename, "status": "uploaded", "gcs_uri": file.gcs_uri, "size": file.size}
+        for file in upload.files
+    ]
+    report += [_deduplicated_entry(dup) for dup in upload.deduplicated]
+    report += [dict(failed.to_dict(), status="failed") for failed in upload.failed]
+    return report
+
+
+def _deduplicated_entry(dup: DeduplicatedUpload) -> dict:
+    return {
+        "filename": dup.filename,
+        "status": "deduplicated",
+        "sha256": dup.sha256,
+        "file_id": dup.duplicate_of.get("file_id"),
+        "duplicate_of": dup.duplicate_of.get("filename"),
+    }
+
+
+async def _receive_uploads(request: Request, corpus_name: str) -> StreamedUpload:
+    """Stream the request's files into GCS; 400 on an unacceptable body."""
+    # Content already in the corpus is recognised by digest and not stored again
+    corpus_resource_name = await run_blocking(get_corpus_resource_name, corpus_name)
+    try:
+        upload = await stream_multipart_to_gcs(
+            request.headers.get("content-type", ""),
+            request.stream(),
+            lookup_digest=partial(content_index.lookup, corpus_resource_name),
         )
+    except UploadRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not (upload.files or upload.failed or upload.deduplicated):
+        raise HTTPException(status_code=400, detail="No file in upload")
+    return upload
+
+
+def _document_id(upload: StreamedUpload, filename: str) -> Optional[str]:
+    """
+    Id of the document an uploaded file is a revision of, if the client gave
+    one: a "document_id:<filename>" form field, or "document_id" when the
+    request holds a single file.
+    """
+    document_id = upload.fields.get(f"document_id:{filename}")
+    if document_id is None and len(upload.files) == 1:
+        document_id = upload.fields.get("document_id")
+    return document_id or None
+
+
+def _submit_uploads(upload: StreamedUpload, corpus_name: str) -> Job:
+    files = upload.files
+    payload = {
+        "corpus_name": corpus_name,
+        "rejected": [failed.to_dict() for failed in upload.failed],
+        "deduplicated": [_deduplicated_entry(dup) for dup in upload.deduplicated],
+        "files": [
+            {
+                "filename": file.filename,
+                "gcs_uri": file.gcs_uri,
+                "sha256": file.sha256,
+                "size": file.size,
+                "local_path": file.local_path,
+                "document_id": _document_id(upload, file.filename),
+            }
+            for file in files
+        ],
+    }
+    return ingest_queue.submit("upload", payload, stage="import")
+
+
+# The body is piped straight into GCS while it arrives, so the request only
+# enqueues the import and verification on the ingestion workers (see
+# /jobs/{job_id}). The endpoints read the raw stream instead of UploadFile
+# parameters, which would spool every file to a temporary file first.
+@router.post("/upload/", status_code=202)
+async def file_upload(request: Request):
+    corpus_name = "earthwork"
+    upload = await _receive_uploads(request, corpus_name)
+    if upload.failed:
+        await run_blocking(delete_streamed, upload.files)
+        raise HTTPException(status_code=400, detail=upload.failed[0].error)
+    if len(upload.files) + len(upload.deduplicated) != 1:
+        await run_blocking(delete_streamed, upload.files)
+        raise HTTPException(status_code=400, detail="Expected exactly one file; use /multiupload/")
+    if upload.deduplicated:
+        entry = _deduplicated_entry(upload.deduplicated[0])
+        return JSONResponse(content=dict(
+            entry,
+            message=f"{entry['filename']} is already in the corpus",
+            job_id=None,
+            deduplicated=True,
+        ))
 
-        final_response = None
-        for event in response_events:
-            if event.is_final_response():
-                final_response = event.content.parts[0].text
-
-        return JSONResponse(content={
-            "message": f"Uploaded {file.filename} to GCS",
-            "gcs_uri": gcs_uri,
-            "agent_response": final_response
-        })
+    try:
+        job = _submit_uploads(upload, corpus_name)
+        return _queued_response(job, f"Queued {upload.files[0].filename} for ingestion")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/multiupload/")
-async def multi_file_upload(files: list[UploadFile] = File(...)):
-    gcs_uris = []
+# Files are uploaded concurrently (RAG_UPLOAD_CONCURRENCY at a time) and
+# imported together by one job; a bad file is reported, not fatal, and a
+# file already in the corpus is reported as deduplicated
+@router.post("/multiupload/", status_code=202)
+async def multi_file_upload(request: Request):
+    corpus_name = "earthwork"
+    upload = await _receive_uploads(request, corpus_name)
+    report = _file_report(upload)
+    if not upload.files:
+        if upload.deduplicated:
+            return JSONResponse(content={
+                "message": f"{len(upload.deduplicated)} of {len(report)} files are already in the corpus",
+                "job_id": None,
+                "files": report,
+            })
+        return JSONResponse(status_code=400, content={
+            "message": "No file could be uploaded",
+            "files": report,
+        })
 
     try:
-        for file in files:
-            if not validate_document(file):
-                raise HTTPException(status_code=400, detail=f"Invalid file: {file.filename}")
-
-            # Save locally (optional)
-            fname = os.path.join(UPLOAD_DIR, file.filename)
-            with open(fname, "wb") as f:
-                while content := file.file.read(1024 * 1024):
-                    f.write(content)
-
-            # Upload to GCS
-            storage_client = storage.Client()
-            bucket_name = os.getenv("GCS_BUCKET", "my-rag-upload-bucket")
-            gcs_path = f"uploads/{uuid.uuid4()}/{file.filename}"
-            blob = storage_client.bucket(bucket_name).blob(gcs_path)
-
-            with open(fname, "rb") as f:
-                blob.upload_from_file(f, content_type="application/pdf")
-
-            gcs_uri = f"gs://{bucket_name}/{gcs_path}"
-            print(f"Uploaded to GCS: {gcs_uri}")
-            gcs_uris.append(gcs_uri)
-
-        # Create agent session
-        session_service.create_session(
-            app_name=APP_NAME,
-            user_id=USER_ID,
-            session_id=SESSION_ID
-        )
-
-        runner = Runner(
-            agent=upload_agent,
-            app_name=APP_NAME,
-            session_service=session_service,
-        )
-
-        message = (
-            f"Please add the following GCS files to the 'earthwork' corpus:\n"
-            f"GCS URIs:\n" + "\n".join([f"- {uri}" for uri in gcs_uris]) + "\n"
-            f"Use the add_data tool with paths={gcs_uris} and corpus_name='earthwork'"
-        )
-
-        response_events = runner.run(
-            user_id=USER_ID,
-            session_id=SESSION_ID,
-            new_message=Content(role="user", parts=[Part(text=message)])
+        job = _submit_uploads(upload, corpus_name)
+        return _queued_response(
+            job,
+            f"Queued {len(upload.files)} of {len(report)} files for ingestion",
+            files=report,
         )
 
-        final_response = None
-        for event in response_events:
-            if event.is_final_response():
-                final_response = event.content.parts[0].text
-
-        return JSONResponse(content={
-            "message": f"Uploaded {len(gcs_uris)} files to GCS",
-            "gcs_uris": gcs_uris,
-            "agent_response": final_response
-        })
-
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,41 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.rag_agent.ingestion import ingest_queue
+from app.rag_agent.models.extraction_cache import extraction_cache
+from app.rag_agent.retrieval.near_duplicates import near_duplicate_index
+from app.rag_agent.tools.chunk_index import chunk_index
+from app.rag_agent.tools.embedding_quota import embedding_quota
+from app.rag_agent.tools.import_batcher import import_batcher
+
+router = APIRouter()
+
+
+@router.get("/jobs")
+def list_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    """List recent ingestion jobs, newest first."""
+    jobs = ingest_queue.store.list(status=status, limit=limit)
+    return {"jobs": [job.to_dict() for job in jobs], "count": len(jobs)}
+
+
+@router.get("/jobs/stats")
+def job_stats():
+    """Report worker activity, job counts, import batching, quota, caches, re-ingestion savings and near-duplicates."""
+    return dict(
+        ingest_queue.stats(),
+        imports=import_batcher.stats(),
+        embedding_quota=embedding_quota.stats(),
+        extraction_cache=extraction_cache.stats(),
+        incremental=chunk_index.stats(),
+        near_duplicates=near_duplicate_index.stats(),
+    )
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Return the status, current stage and result of an ingestion job."""
+    job = ingest_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
@@ -1,12 +1,23 @@
 from fastapi import APIRouter, Form, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai.types import Content, Part
+import asyncio
+import json
 import uuid
 import traceback
 
 from app.rag_agent.agent import root_agent
+from app.rag_agent.concurrency import run_blocking
+from app.rag_agent.retrieval.semantic_cache import (
+    query_embedding,
+    semantic_answer_cache,
+    semantic_context_cache,
+)
+from app.rag_agent.tools.corpus_registry import corpus_registry
+from app.rag_agent.tools.utils import get_corpus_resource_name
 
 router = APIRouter()
 
@@ -18,15 +29,87 @@ runner = Runner(
     session_service=session_service
 )
 
+def _lookup_cached_answer(corpus_name: str, query: str):
+    """Resolve the corpus and look the query up in the semantic answer cache."""
+    corpus_resource_name = get_corpus_resource_name(corpus_name)
+    corpus_version = corpus_registry.version(corpus_resource_name)
+    query_vector = query_embedding(query) if semantic_answer_cache.enabled else None
+    match = semantic_answer_cache.lookup(corpus_resource_name, query, query_vector, corpus_version)
+    return corpus_resource_name, corpus_version, query_vector, match
+
+
+def _log_corpus_diagnostics(corpus_name: str):
+    """Print whether the target corpus exists and has files (blocking RPCs)."""
+    from app.rag_agent.tools.utils import check_corpus_exists
+    from app.rag_agent.tools.get_corpus_info import get_corpus_info
+    from app.rag_agent.tools.list_corpora import list_corpora
+    from app.rag_agent.tools.utils import StateToolContext
+
+    # Create a temporary tool context for debugging
+    temp_context = StateToolContext()
+
+    print(f"🔍 DEBUGGING: Checking corpus '{corpus_name}'...")
+
+    # Check if our target corpus exists (served from the corpus registry)
+    corpus_exists = check_corpus_exists(corpus_name, temp_context)
+    print(f"📁 Corpus '{corpus_name}' exists: {corpus_exists}")
+
+    if corpus_exists:
+        try:
+            corpus_info = get_corpus_info(corpus_name, temp_context)
+            print(f"📊 Corpus info: {corpus_info}")
+            file_count = corpus_info.get('file_count', 0)
+            print(f"📄 Files in corpus: {file_count}")
+
+            if file_count == 0:
+                print(f"⚠️  WARNING: Corpus '{corpus_name}' exists but has NO files!")
+                print("   This means files were uploaded to GCS but never added to the corpus.")
+                print("   The upload_agent may not have called add_data properly.")
+            else:
+                print(f"✅ Corpus '{corpus_name}' has {file_count} files")
+        except Exception as e:
+            print(f"❌ Error getting corpus info: {str(e)}")
+    else:
+        # Only pay for a full listing when the corpus is missing
+        try:
+            all_corpora = list_corpora()
+            print(f"📋 Available corpora: {all_corpora}")
+        except Exception as e:
+            print(f"❌ Error listing corpora: {str(e)}")
+
+        print(f"❌ WARNING: Corpus '{corpus_name}' does not exist!")
+        print("   This is why you're getting null responses.")
+        print("   Please upload files first to create and populate the corpus.")
+
+
 @router.post("/query")
 async def query_endpoint(
     request: Request,
     query: str = Form(...),
     corpus_name: str = Form("earthwork")
 ):
+    # Everything that blocks (Vertex AI RPCs, embeddings) runs in the shared
+    # I/O pool and the agent is driven with run_async, so a slow Gemini turn
+    # never stalls other requests on this worker.
     try:
         user_id = "rag_user"  
 
+        # Answer near-duplicates of recent questions without running the agent
+        corpus_resource_name, corpus_version, query_vector, match = await run_blocking(
+            _lookup_cached_answer, corpus_name, query
+        )
+        if match is not None:
+            cached_response, similarity, cached_query = match
+            print(f"♻️ Semantic cache hit ({similarity:.3f}) for cached query '{cached_query}'")
+            return JSONResponse(content={
+                "query": query,
+                "response": cached_response,
+                "session_id": None,
+                "cached": True,
+                "cached_query": cached_query,
+                "similarity": similarity,
+            })
+
         # Get or create a session ID — here we generate one per request
         session_id = f"query-session-{uuid.uuid4()}"
         session_service.create_session(
@@ -45,75 +128,33 @@ async def query_endpoint(
         print(" Corpus:", corpus_name)
         print(" Session ID:", session_id)
 
-        # Add debugging: check if corpus exists before querying
-        from rag_agent.tools.utils import check_corpus_exists
-        from rag_agent.tools.get_corpus_info import get_corpus_info
-        from rag_agent.tools.list_corpora import list_corpora
-        from google.adk.tools.tool_context import ToolContext
-        
-        # Create a temporary tool context for debugging
-        temp_context = ToolContext(invocation_context=None)
-        temp_context.state = {}
-        
-        print(f"🔍 DEBUGGING: Checking corpus '{corpus_name}'...")
-        
-        # First, list all available corpora
-        try:
-            all_corpora = list_corpora()
-            print(f"📋 Available corpora: {all_corpora}")
-        except Exception as e:
-            print(f"❌ Error listing corpora: {str(e)}")
-        
-        # Check if our target corpus exists
-        corpus_exists = check_corpus_exists(corpus_name, temp_context)
-        print(f"📁 Corpus '{corpus_name}' exists: {corpus_exists}")
-        
-        if corpus_exists:
-            try:
-                corpus_info = get_corpus_info(corpus_name, temp_context)
-                print(f"📊 Corpus info: {corpus_info}")
-                file_count = corpus_info.get('file_count', 0)
-                print(f"📄 Files in corpus: {file_count}")
-                
-                if file_count == 0:
-                    print(f"⚠️  WARNING: Corpus '{corpus_name}' exists but has NO files!")
-                    print("   This means files were uploaded to GCS but never added to the corpus.")
-                    print("   The upload_agent may not have called add_data properly.")
-                else:
-                    print(f"✅ Corpus '{corpus_name}' has {file_count} files")
-            except Exception as e:
-                print(f"❌ Error getting corpus info: {str(e)}")
-        else:
-            print(f"❌ WARNING: Corpus '{corpus_name}' does not exist!")
-            print("   This is why you're getting null responses.")
-            print("   Please upload files first to create and populate the corpus.")
+        # Corpus diagnostics only log, so run them alongside the agent
+        diagnostics = asyncio.ensure_future(
+            run_blocking(_log_corpus_diagnostics, corpus_name)
+        )
 
-        response_events = runner.run(
+        final_response = None
+        tool_calls = []
+        async for event in runner.run_async(
             user_id=user_id,
             session_id=session_id,
             new_message=Content(role="user", parts=[Part(text=user_message)])
-        )
-
-        final_response = None
-        for event in response_events:
-            if event.is_final_response():
+        ):
+            for function_call in event.get_function_calls():
+                tool_calls.append({
+                    'tool_name': function_call.name,
+                    'arguments': function_call.args
+                })
+            if event.is_final_response() and event.content and event.content.parts:
                 final_response = event.content.parts[0].text
 
+        await diagnostics
+
         print(" Final response:", final_response)
 
         # Add debugging to see if agent called rag_query tool
         print("🔍 DEBUGGING: Checking if agent called rag_query tool...")
-        
-        # Check the response events to see what tools were called
-        tool_calls = []
-        for event in response_events:
-            if hasattr(event, 'tool_calls') and event.tool_calls:
-                for tool_call in event.tool_calls:
-                    tool_calls.append({
-                        'tool_name': tool_call.name,
-                        'arguments': tool_call.args
-                    })
-        
+
         if tool_calls:
             print(f"📋 Agent called {len(tool_calls)} tools:")
             for i, tool_call in enumerate(tool_calls):
@@ -126,29 +167,140 @@ async def query_endpoint(
             print("❌ WARNING: final_response is None!")
             print("   This means the agent didn't provide a proper response.")
             print("   The agent should have called rag_query and provided an answer based on the results.")
+        else:
+            semantic_answer_cache.store(
+                corpus_resource_name, query, query_vector, corpus_version, final_response
+            )
 
         return JSONResponse(content={
             "query": query,
             "response": final_response,
-            "session_id": session_id
+            "session_id": session_id,
+            "cached": False,
         })
 
     except Exception as e:
-        print(" Exception during runner.run:")
+        print(" Exception during runner.run_async:")
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _stream_query_events(query: str, corpus_name: str):
+    """
+    Run the agent with SSE streaming and translate ADK events.
+
+    Emits, in order: `start`, then for each tool call `tool_call` and
+    `tool_result` (plus `contexts` with the retrieved chunks for rag_query),
+    `token` events carrying partial answer text, and finally `final` with
+    the whole answer. Failures end the stream with an `error` event.
+    """
+    user_id = "rag_user"
+    try:
+        corpus_resource_name, corpus_version, query_vector, match = await run_blocking(
+            _lookup_cached_answer, corpus_name, query
+        )
+        if match is not None:
+            cached_response, similarity, cached_query = match
+            yield _sse("start", {"query": query, "session_id": None, "cached": True})
+            yield _sse("final", {
+                "query": query,
+                "response": cached_response,
+                "session_id": None,
+                "cached": True,
+                "cached_query": cached_query,
+                "similarity": similarity,
+            })
+            return
+
+        session_id = f"query-session-{uuid.uuid4()}"
+        session_service.create_session(
+            app_name="rag-app",
+            user_id=user_id,
+            session_id=session_id
+        )
+        yield _sse("start", {"query": query, "session_id": session_id, "cached": False})
+
+        user_message = (
+            f"You are working with a RAG corpus named '{corpus_name}'. "
+            f"Please answer the following query using documents from that corpus:\n\n{query}"
+        )
+
+        final_response = None
+        async for event in runner.run_async(
+            user_id=user_id,
+            session_id=session_id,
+            new_message=Content(role="user", parts=[Part(text=user_message)]),
+            run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+        ):
+            for function_call in event.get_function_calls():
+                yield _sse("tool_call", {
+                    "tool_name": function_call.name,
+                    "arguments": function_call.args,
+                })
+            for function_response in event.get_function_responses():
+                response = function_response.response or {}
+                yield _sse("tool_result", {
+                    "tool_name": function_response.name,
+                    "status": response.get("status"),
+                    "message": response.get("message"),
+                })
+                if function_response.name == "rag_query":
+                    yield _sse("contexts", {"results": response.get("results", [])})
+
+            if not (event.content and event.content.parts):
+                continue
+            text = "".join(part.text or "" for part in event.content.parts)
+            if event.partial and text:
+                yield _sse("token", {"text": text})
+            elif event.is_final_response():
+                final_response = text or None
+
+        if final_response:
+            semantic_answer_cache.store(
+                corpus_resource_name, query, query_vector, corpus_version, final_response
+            )
+        yield _sse("final", {
+            "query": query,
+            "response": final_response,
+            "session_id": session_id,
+            "cached": False,
+        })
+
+    except Exception as e:
+        print(" Exception during streaming query:")
+        traceback.print_exc()
+        yield _sse("error", {"error": str(e)})
+
+
+@router.post("/query/stream")
+async def query_stream_endpoint(
+    query: str = Form(...),
+    corpus_name: str = Form("earthwork")
+):
+    """Streaming variant of /query that sends agent progress as server-sent events."""
+    return StreamingResponse(
+        _stream_query_events(query, corpus_name),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Plain `def`: the lookups below are blocking RPCs, so FastAPI runs this in
+# its threadpool
 @router.get("/corpus-status/{corpus_name}")
-async def get_corpus_status(corpus_name: str):
+def get_corpus_status(corpus_name: str):
     """Debug endpoint to check corpus status"""
     try:
-        from rag_agent.tools.utils import check_corpus_exists
-        from rag_agent.tools.get_corpus_info import get_corpus_info
-        from rag_agent.tools.list_corpora import list_corpora
-        from google.adk.tools.tool_context import ToolContext
+        from app.rag_agent.tools.utils import check_corpus_exists
+        from app.rag_agent.tools.get_corpus_info import get_corpus_info
+        from app.rag_agent.tools.list_corpora import list_corpora
+        from app.rag_agent.tools.utils import StateToolContext
         
-        temp_context = ToolContext(invocation_context=None)
-        temp_context.state = {}
+        temp_context = StateToolContext()
         
         # Check if corpus exists
         corpus_exists = check_corpus_exists(corpus_name, temp_context)
@@ -171,3 +323,18 @@ async def get_corpus_status(corpus_name: str):
             
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@router.get("/corpus-registry/stats")
+async def get_corpus_registry_stats():
+    """Debug endpoint to check corpus registry hit/miss rates"""
+    return JSONResponse(content=corpus_registry.stats())
+
+
+@router.get("/query-cache/stats")
+async def get_query_cache_stats():
+    """Debug endpoint to check semantic cache hit rates and memory use"""
+    return JSONResponse(content={
+        "answers": semantic_answer_cache.stats(),
+        "contexts": semantic_context_cache.stats(),
+    })
@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from app.rag_agent.config import (
+    DEFAULT_DISTANCE_THRESHOLD,
+    DEFAULT_TOP_K,
+    RETRIEVE_BATCH_WORKERS,
+    RETRIEVE_MAX_BATCH_SIZE,
+)
+from app.rag_agent.retrieval import get_retrieval_backend
+from app.rag_agent.retrieval.cache import retrieval_cache
+from app.rag_agent.tools.rag_query import retrieve_contexts
+from app.rag_agent.tools.utils import get_corpus_resource_name
+
+router = APIRouter()
+
+# Shared pool for fanning out batch retrievals
+batch_executor = ThreadPoolExecutor(
+    max_workers=RETRIEVE_BATCH_WORKERS,
+    thread_name_prefix="retrieve",
+)
+
+
+class RetrieveRequest(BaseModel):
+    """A single retrieval against one corpus."""
+
+    query: str = Field(..., min_length=1)
+    corpus_name: str = "earthwork"
+    top_k: int = Field(DEFAULT_TOP_K, ge=1, le=100)
+    distance_threshold: float = Field(DEFAULT_DISTANCE_THRESHOLD, ge=0.0)
+
+
+class BatchRetrieveRequest(BaseModel):
+    """Several retrievals answered in one round trip."""
+
+    requests: List[RetrieveRequest] = Field(..., min_length=1)
+
+
+def _retrieve(request: RetrieveRequest) -> dict:
+    corpus_resource_name = get_corpus_resource_name(request.corpus_name)
+    if not get_retrieval_backend().has_corpus(corpus_resource_name):
+        return {
+            "status": "error",
+            "message": f"Corpus '{request.corpus_name}' does not exist",
+            "query": request.query,
+            "corpus_name": request.corpus_name,
+            "results": [],
+            "results_count": 0,
+        }
+
+    results = retrieve_contexts(
+        corpus_resource_name,
+        request.query,
+        top_k=request.top_k,
+        distance_threshold=request.distance_threshold,
+    )
+    return {
+        "status": "success" if results else "warning",
+        "query": request.query,
+        "corpus_name": request.corpus_name,
+        "results": results,
+        "results_count": len(results),
+    }
+
+
+def _retrieve_safely(request: RetrieveRequest) -> dict:
+    try:
+        return _retrieve(request)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error retrieving contexts: {str(e)}",
+            "query": request.query,
+            "corpus_name": request.corpus_name,
+            "results": [],
+            "results_count": 0,
+        }
+
+
+# Plain `def` handlers: FastAPI runs them in its threadpool, so the blocking
+# retrieval RPC never stalls the event loop.
+@router.post("/retrieve")
+def retrieve_endpoint(request: RetrieveRequest):
+    """Return ranked contexts for a query without going through the LLM agent."""
+    try:
+        result = _retrieve(request)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error retrieving contexts: {str(e)}")
+
+    if result["status"] == "error":
+        raise HTTPException(status_code=404, detail=result["message"])
+    return result
+
+
+@router.post("/retrieve/batch")
+def batch_retrieve_endpoint(batch: BatchRetrieveRequest):
+    """Run several retrievals concurrently; failures are reported per query."""
+    if len(batch.requests) > RETRIEVE_MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(batch.requests)} > {RETRIEVE_MAX_BATCH_SIZE}",
+        )
+
+    results = list(batch_executor.map(_retrieve_safely, batch.requests))
+    return {
+        "results": results,
+        "count": len(results),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+    }
+
+
+@router.get("/retrieve/stats")
+def retrieve_stats_endpoint():
+    """Report retrieval cache hit ratio and memory footprint."""
+    return retrieval_cache.stats()
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from app.rag_agent.ingestion import submit_sync
+
+router = APIRouter()
+
+
+class SyncRequest(BaseModel):
+    """A GCS prefix to mirror into a corpus."""
+
+    corpus_name: str = "earthwork"
+    gcs_prefix: str = Field(..., description="gs://bucket/prefix to sync from")
+    reconcile: bool = Field(False, description="Compare with the corpus's files even if not due")
+
+
+@router.post("/sync", status_code=202)
+def sync(request: SyncRequest):
+    """
+    Queue an incremental sync of a GCS prefix into a corpus.
+
+    Cheap enough to call on a schedule: a run that finds nothing new only
+    lists the prefix, and a run requested while another one for the same
+    prefix is pending returns that one instead.
+    """
+    if not request.gcs_prefix.startswith("gs://"):
+        raise HTTPException(status_code=400, detail="gcs_prefix must be a gs:// URI")
+
+    job = submit_sync(request.corpus_name, request.gcs_prefix, request.reconcile)
+    return JSONResponse(status_code=202, content={
+        "message": "Queued sync",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+    })
@@ -13,12 +13,16 @@ print("✅ LOCATION (early):", os.environ.get("LOCATION"))
 
 
 from .add_data import add_data
+from .chunk_index import chunk_index
+from .content_index import content_index
+from .corpus_registry import corpus_registry
 from .create_corpus import create_corpus
 from .delete_corpus import delete_corpus
 from .delete_document import delete_document
 from .get_corpus_info import get_corpus_info
 from .list_corpora import list_corpora
-from .rag_query import rag_query
+from .rag_query import rag_query, retrieve_contexts
+from .sync_state import sync_state
 from .utils import (
     check_corpus_exists,
     get_corpus_resource_name,
@@ -30,10 +34,15 @@ __all__ = [
     "create_corpus",
     "list_corpora",
     "rag_query",
+    "retrieve_contexts",
     "get_corpus_info",
     "delete_corpus",
     "delete_document",
     "check_corpus_exists",
+    "chunk_index",
+    "content_index",
+    "corpus_registry",
     "get_corpus_resource_name",
     "set_current_corpus",
+    "sync_state",
 ]
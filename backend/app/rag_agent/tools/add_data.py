@@ -4,57 +4,312 @@ Tool for adding new data sources to a Vertex AI RAG corpus, including local PDF
 
 import os
 import re
+import tempfile
 import uuid
-from typing import List, Optional
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
-from google.cloud import storage
+from dotenv import load_dotenv
 from google.adk.tools.tool_context import ToolContext
+from google.cloud.storage import transfer_manager
 from vertexai import rag
 
-
-
 from ..config import (
     DEFAULT_CHUNK_OVERLAP,
     DEFAULT_CHUNK_SIZE,
     DEFAULT_EMBEDDING_REQUESTS_PER_MIN,
+    INCREMENTAL_REINGEST_ENABLED,
+    LOCAL_UPLOAD_CHUNK_SIZE,
+    LOCAL_UPLOAD_CHUNK_WORKERS,
+    LOCAL_UPLOAD_PARALLEL_THRESHOLD,
+    LOCAL_UPLOAD_WORKERS,
+    NEAR_DUP_MODE,
 )
+from ..gcs import get_storage_client
+from ..models.chunking import iter_chunks
+from ..models.document import iter_pages
+from ..retrieval import get_local_backend, local_index_enabled
+from ..retrieval.ingest import download_gcs_object, index_documents
+from ..retrieval.near_duplicates import near_dup_enabled, near_duplicate_index
+from .chunk_index import chunk_index, diff_chunks
+from .content_index import content_index
+from .corpus_registry import corpus_registry
+from .delete_document import delete_document
+from .import_batcher import import_batcher
 from .utils import check_corpus_exists, get_corpus_resource_name
 
 load_dotenv()
 GCS_BUCKET = os.getenv("GCS_BUCKET")
 
 def upload_file_to_gcs(local_file_path: str, bucket_name: str, destination_folder: str = "uploads") -> str:
-    client = storage.Client()
-    bucket = client.bucket(bucket_name)
+    """
+    Upload one local file and return its gs:// URI.
+
+    Files from LOCAL_UPLOAD_PARALLEL_THRESHOLD bytes up are sent as
+    concurrent chunks of one XML multipart upload.
+    """
+    bucket = get_storage_client().bucket(bucket_name)
 
     file_name = os.path.basename(local_file_path)
     unique_name = f"{uuid.uuid4()}_{file_name}"
     blob_path = f"{destination_folder}/{unique_name}"
     blob = bucket.blob(blob_path)
 
-    blob.upload_from_filename(local_file_path)
+    if os.path.getsize(local_file_path) >= LOCAL_UPLOAD_PARALLEL_THRESHOLD:
+        transfer_manager.upload_chunks_concurrently(
+            local_file_path,
+            blob,
+            chunk_size=LOCAL_UPLOAD_CHUNK_SIZE,
+            # Threads share the storage client; processes would each build one
+            worker_type=transfer_manager.THREAD,
+            max_workers=LOCAL_UPLOAD_CHUNK_WORKERS,
+        )
+    else:
+        blob.upload_from_filename(local_file_path)
     return f"gs://{bucket.name}/{blob_path}"
 
-def add_data(
-    corpus_name: str,
-    paths: Optional[List[str]],
-    tool_context: ToolContext,
-    local_files: Optional[List[str]] = None,
-    gcs_bucket: Optional[str] = None,
+
+def upload_local_files(local_files: List[str], bucket_name: str) -> List[dict]:
+    """
+    Upload local files concurrently; one failure does not stop the others.
+
+    Returns:
+        List[dict]: Per file, in input order: local_file, status ("uploaded"
+        or "failed") and gcs_uri or error
+    """
+    def upload(file_path: str) -> dict:
+        try:
+            gcs_uri = upload_file_to_gcs(file_path, bucket_name)
+            return {"local_file": file_path, "status": "uploaded", "gcs_uri": gcs_uri}
+        except Exception as e:
+            return {"local_file": file_path, "status": "failed", "error": str(e)}
+
+    # A pool per call: add_data itself may run on the shared blocking pool
+    workers = max(1, min(LOCAL_UPLOAD_WORKERS, len(local_files)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-upload") as pool:
+        return list(pool.map(upload, local_files))
+
+
+_DOCS_URL = re.compile(
+    r"https:\/\/docs\.google\.com\/(?:document|spreadsheets|presentation)\/d\/([a-zA-Z0-9_-]+)"
+)
+_DRIVE_URL = re.compile(
+    r"https:\/\/drive\.google\.com\/(?:file\/d\/|open\?id=)([a-zA-Z0-9_-]+)"
+)
+
+
+def normalize_source_path(path) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Validate one import source and convert it to the form import_files takes.
+
+    Google Docs/Sheets/Slides and Drive URLs become Drive file URLs and GCS
+    paths are accepted as-is.
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: The normalized path and None, or
+        None and the reason the path is invalid
+    """
+    if not path or not isinstance(path, str):
+        return None, "Not a valid string"
+
+    # Convert Google Docs/Sheets/Slides URLs
+    docs_match = _DOCS_URL.match(path)
+    if docs_match:
+        return f"https://drive.google.com/file/d/{docs_match.group(1)}/view", None
+
+    # Convert Google Drive URL
+    drive_match = _DRIVE_URL.match(path)
+    if drive_match:
+        return f"https://drive.google.com/file/d/{drive_match.group(1)}/view", None
+
+    # Accept GCS path as-is
+    if path.startswith("gs://"):
+        return path, None
+
+    return None, "Invalid format"
+
+
+# Uploads are stored as uploads/<uuid>/<name> (streamed) or uploads/<uuid>_<name>
+_UPLOAD_URI = re.compile(r"^gs://[^/]+/uploads/[0-9a-f-]{36}[/_]([^/]+)$")
+
+
+def uploaded_document_name(path: str) -> Optional[str]:
+    """File name an uploaded document was given, or None for other sources."""
+    match = _UPLOAD_URI.match(path)
+    return match.group(1) if match else None
+
+
+def revision_key(path: str, document_id: Optional[str] = None) -> Optional[str]:
+    """
+    Key the revisions of a document are tracked under.
+
+    An explicit document id wins; otherwise a GCS object at a stable path is
+    its own key. Uploads are stored under a fresh path every time, so
+    without an id they have no earlier revision; matching them by file name
+    would replace unrelated documents that happen to share it.
+
+    Returns:
+        Optional[str]: The key, or None if revisions cannot be tracked
+    """
+    if document_id:
+        return document_id
+    if not path.startswith("gs://") or uploaded_document_name(path) is not None:
+        return None
+    return path
+
+
+def _plan_revisions(
+    corpus_resource_name: str,
+    paths: List[str],
+    document_ids: Dict[str, str],
+    local_copies: dict,
+    directory: str,
 ) -> dict:
-    gcs_bucket = gcs_bucket or GCS_BUCKET
+    """
+    Chunk GCS documents and compare them with their previous revision.
 
-    if local_files and not gcs_bucket:
-        return {
-            "status": "error",
-            "message": "You must provide a GCS bucket to upload local files, either by passing it in or setting GCS_BUCKET in your .env file.",
-            "corpus_name": corpus_name,
-            "paths": paths or [],
+    Revisions are tracked for documents with a revision_key() while the
+    local index, the only index where unchanged chunks save embeddings, is
+    in use; all GCS documents are chunked when near-duplicates are screened.
+    Downloaded copies are added to `local_copies` so the local index does
+    not fetch them again.
+
+    Returns:
+        dict: path -> revision key (or None), chunk ids and texts, previous
+        revision (or None) and ChunkDiff (or None)
+    """
+    track_revisions = INCREMENTAL_REINGEST_ENABLED and local_index_enabled()
+    revisions = {}
+    for path in paths:
+        if not path.startswith("gs://"):
+            continue
+        document = revision_key(path, document_ids.get(path)) if track_revisions else None
+        if document is None and not near_dup_enabled():
+            continue
+        try:
+            if path not in local_copies:
+                local_copies[path] = download_gcs_object(path, tempfile.mkdtemp(dir=directory))
+            chunks = list(iter_chunks(iter_pages(local_copies[path])))
+        except Exception as e:
+            print(f"⚠️ Could not chunk {path} locally, importing it whole: {str(e)}")
+            continue
+        chunk_ids = [chunk.id for chunk in chunks]
+        previous = chunk_index.get(corpus_resource_name, document) if document else None
+        revisions[path] = {
+            "document": document,
+            "chunk_ids": chunk_ids,
+            "texts": [chunk.text for chunk in chunks],
+            "previous": previous,
+            "diff": diff_chunks(previous["chunk_ids"], chunk_ids) if previous else None,
         }
+    return revisions
 
 
+def _screen_near_duplicates(corpus_resource_name: str, revisions: dict, unchanged: set) -> set:
+    """
+    Look for near-duplicates of the uploads' chunks elsewhere in the corpus.
+
+    This is the only place ingestion checks for near-duplicates: the local
+    index is given the matches found here rather than checking again.
+    Vertex AI imports whole files, so in drop mode only uploads made up
+    entirely of near-duplicates are left out; they are returned.
+    """
+    dropped = set()
+    for path, plan in revisions.items():
+        if path in unchanged or not plan["texts"]:
+            continue
+        # A revision repeats the one it replaces
+        exclude = [plan["previous"]["source_uri"]] if plan["previous"] else []
+        plan["signatures"], plan["matches"] = near_duplicate_index.check(
+            corpus_resource_name, plan["texts"], exclude
+        )
+        plan["near_duplicates"] = sum(1 for match in plan["matches"] if match is not None)
+        if NEAR_DUP_MODE == "drop" and plan["near_duplicates"] == len(plan["matches"]):
+            plan["dropped"] = True
+            dropped.add(path)
+    return dropped
+
+
+def _retire_sources(corpus_resource_name: str, source_uris: List[str], tool_context: ToolContext) -> int:
+    """Delete the RAG files imported from these sources; returns how many."""
+    source_uris = set(source_uris)
+    if not source_uris:
+        return 0
+    file_ids = [
+        rag_file.name.split("/")[-1]
+        for rag_file in rag.list_files(corpus_resource_name)
+        if getattr(rag_file, "source_uri", None) in source_uris
+    ]
+    for file_id in file_ids:
+        result = delete_document(corpus_resource_name, file_id, tool_context)
+        if result["status"] != "success":
+            print(f"⚠️ Could not retire an old revision: {result['message']}")
+    return len(file_ids)
+
+
+def _release_rag_files(corpus_resource_name: str, source_uris: List[str]) -> int:
+    """
+    Delete only the Vertex AI files of these sources; returns how many.
 
+    import_files skips a path it already imported, so a revision stored
+    under the same path needs its old file gone first. The local index and
+    the chunk and near-duplicate records keep the old revision until the
+    new one is imported, so a failed import does not lose them too.
+    """
+    source_uris = set(source_uris)
+    if not source_uris:
+        return 0
+    file_ids = [
+        rag_file.name.split("/")[-1]
+        for rag_file in rag.list_files(corpus_resource_name)
+        if getattr(rag_file, "source_uri", None) in source_uris
+    ]
+    for file_id in file_ids:
+        rag.delete_file(f"{corpus_resource_name}/ragFiles/{file_id}")
+        content_index.remove_file(corpus_resource_name, file_id)
+    return len(file_ids)
+
+
+def _revision_report(revisions: dict, unchanged: set, local_index: bool) -> dict:
+    """
+    Chunk-level outcome of the revisions in an import.
+
+    Vertex AI embeds whole files, so only unchanged revisions save Vertex
+    embeddings; the local index also reuses the embeddings of unchanged
+    chunks of changed revisions.
+    """
+    documents = []
+    vertex_saved = local_saved = 0
+    for path, plan in revisions.items():
+        diff = plan["diff"]
+        if diff is None:
+            continue
+        if path in unchanged:
+            vertex_saved += diff.chunks
+            local_saved += diff.chunks if local_index else 0
+            chunk_index.note(diff, diff.chunks)
+        else:
+            local_saved += diff.reused if local_index else 0
+            chunk_index.note(diff, diff.reused if local_index else 0)
+        documents.append(dict(
+            diff.to_dict(),
+            document=plan["document"],
+            path=path,
+            previous_uri=plan["previous"]["source_uri"],
+            imported=path not in unchanged and not plan.get("dropped"),
+        ))
+    return {
+        "revisions": documents,
+        "new_documents": sum(
+            1 for plan in revisions.values() if plan["diff"] is None and not plan.get("dropped")
+        ),
+        "unchanged_revisions": len(unchanged),
+        "chunks_new": sum(d["new"] for d in documents),
+        "chunks_reused": sum(d["reused"] for d in documents),
+        "chunks_retired": sum(d["retired"] for d in documents),
+        "vertex_embeddings_saved": vertex_saved,
+        "local_embeddings_saved": local_saved,
+    }
 
 
 def add_data(
@@ -63,6 +318,7 @@ def add_data(
     tool_context: ToolContext,
     local_files: Optional[List[str]] = None,
     gcs_bucket: Optional[str] = None,
+    document_ids: Optional[List[str]] = None,
 ) -> dict:
     """
     Add new data sources (URLs or local PDFs) to a Vertex AI RAG corpus.
@@ -73,10 +329,23 @@ def add_data(
         tool_context (ToolContext): Tool context for the corpus.
         local_files (List[str], optional): Paths to user-uploaded local files (e.g., PDFs).
         gcs_bucket (str, optional): Target GCS bucket for uploads.
+        document_ids (List[str], optional): Stable ids of the documents in
+            `paths`, in the same order (empty for none). A document imported
+            before under the same id is replaced by the new revision.
 
     Returns:
         dict: Status and info on added documents.
     """
+    gcs_bucket = gcs_bucket or GCS_BUCKET
+
+    if local_files and not gcs_bucket:
+        return {
+            "status": "error",
+            "message": "You must provide a GCS bucket to upload local files, either by passing it in or setting GCS_BUCKET in your .env file.",
+            "corpus_name": corpus_name,
+            "paths": paths or [],
+        }
+
     if not check_corpus_exists(corpus_name, tool_context):
         return {
             "status": "error",
@@ -87,63 +356,38 @@ def add_data(
 
     if paths is None:
         paths = []
+    ids_by_path = {path: document_id for path, document_id in zip(paths, document_ids or []) if document_id}
 
-    # Handle local PDF files (user-uploaded)
+    # Handle local PDF files (user-uploaded), uploaded concurrently
+    local_copies = {}
+    uploads = []
     if local_files and gcs_bucket:
-        for file_path in local_files:
-            try:
-                gcs_path = upload_file_to_gcs(file_path, gcs_bucket)
-                paths.append(gcs_path)
-            except Exception as e:
-                return {
-                    "status": "error",
-                    "message": f"Failed to upload {file_path} to GCS: {str(e)}",
-                    "corpus_name": corpus_name,
-                    "paths": paths,
-                }
+        uploads = upload_local_files(local_files, gcs_bucket)
+        for upload in uploads:
+            if upload["status"] == "uploaded":
+                paths.append(upload["gcs_uri"])
+                local_copies[upload["gcs_uri"]] = upload["local_file"]
+        failed_uploads = [upload for upload in uploads if upload["status"] == "failed"]
+        if failed_uploads:
+            print(f"⚠️ {len(failed_uploads)} of {len(uploads)} local file(s) failed to upload")
 
     # Validate and normalize all paths
     validated_paths = []
     invalid_paths = []
     conversions = []
 
-    for path in paths:
-        if not path or not isinstance(path, str):
-            invalid_paths.append(f"{path} (Not a valid string)")
-            continue
-
-        # Convert Google Docs/Sheets/Slides URLs
-        docs_match = re.match(
-            r"https:\/\/docs\.google\.com\/(?:document|spreadsheets|presentation)\/d\/([a-zA-Z0-9_-]+)",
-            path
-        )
-        if docs_match:
-            file_id = docs_match.group(1)
-            drive_url = f"https://drive.google.com/file/d/{file_id}/view"
-            validated_paths.append(drive_url)
-            conversions.append(f"{path} → {drive_url}")
-            continue
-
-        # Convert Google Drive URL
-        drive_match = re.match(
-            r"https:\/\/drive\.google\.com\/(?:file\/d\/|open\?id=)([a-zA-Z0-9_-]+)",
-            path
-        )
-        if drive_match:
-            file_id = drive_match.group(1)
-            drive_url = f"https://drive.google.com/file/d/{file_id}/view"
-            validated_paths.append(drive_url)
-            if drive_url != path:
-                conversions.append(f"{path} → {drive_url}")
-            continue
+    validated_ids = {}
 
-        # Accept GCS path as-is
-        if path.startswith("gs://"):
-            validated_paths.append(path)
+    for path in paths:
+        normalized, error = normalize_source_path(path)
+        if normalized is None:
+            invalid_paths.append(f"{path} ({error})")
             continue
-
-        # Unknown format
-        invalid_paths.append(f"{path} (Invalid format)")
+        validated_paths.append(normalized)
+        if path in ids_by_path:
+            validated_ids[normalized] = ids_by_path[path]
+        if normalized != path:
+            conversions.append(f"{path} → {normalized}")
 
     if not validated_paths:
         return {
@@ -151,37 +395,142 @@ def add_data(
             "message": "No valid paths provided. Please provide Drive URLs, GCS paths, or upload PDFs.",
             "corpus_name": corpus_name,
             "invalid_paths": invalid_paths,
+            "uploads": uploads,
         }
 
     try:
         corpus_resource_name = get_corpus_resource_name(corpus_name)
 
-        transformation_config = rag.TransformationConfig(
-            chunking_config=rag.ChunkingConfig(
-                chunk_size=DEFAULT_CHUNK_SIZE,
-                chunk_overlap=DEFAULT_CHUNK_OVERLAP,
-            ),
-        )
-
-        import_result = rag.import_files(
-            corpus_resource_name,
-            validated_paths,
-            transformation_config=transformation_config,
-            max_embedding_requests_per_min=DEFAULT_EMBEDDING_REQUESTS_PER_MIN,
-        )
-
-        if not tool_context.state.get("current_corpus"):
-            tool_context.state["current_corpus"] = corpus_name
-
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Revisions of known documents: compare their chunks with the
+            # previous revision's before spending embeddings on them
+            revisions = (
+                _plan_revisions(corpus_resource_name, validated_paths, validated_ids, local_copies, tmp_dir)
+                if (INCREMENTAL_REINGEST_ENABLED and local_index_enabled()) or near_dup_enabled()
+                else {}
+            )
+            unchanged = {path for path, plan in revisions.items() if plan["diff"] and plan["diff"].unchanged}
+            near_duplicates = (
+                _screen_near_duplicates(corpus_resource_name, revisions, unchanged)
+                if near_dup_enabled()
+                else set()
+            )
+            skipped = unchanged | near_duplicates
+            to_import = [path for path in validated_paths if path not in skipped]
+            revised = {
+                path: plan["previous"]["source_uri"]
+                for path, plan in revisions.items()
+                if plan["previous"] and path not in skipped
+            }
+
+            known_embeddings = {}
+            if local_index_enabled():
+                for previous_uri in revised.values():
+                    known_embeddings.update(
+                        get_local_backend().source_embeddings(corpus_resource_name, previous_uri)
+                    )
+            same_path = [path for path, previous_uri in revised.items() if previous_uri == path]
+            _release_rag_files(corpus_resource_name, same_path)
+
+            # Coalesced with concurrent imports into the same corpus
+            import_result = None
+            if to_import:
+                import_result = import_batcher.import_files(
+                    corpus_resource_name,
+                    to_import,
+                    chunk_size=DEFAULT_CHUNK_SIZE,
+                    chunk_overlap=DEFAULT_CHUNK_OVERLAP,
+                    max_embedding_requests_per_min=DEFAULT_EMBEDDING_REQUESTS_PER_MIN,
+                )
+
+            if not tool_context.state.get("current_corpus"):
+                tool_context.state["current_corpus"] = corpus_name
+
+            # Mirror the same documents into the local retrieval index; a
+            # revision that may have failed keeps its previous one there
+            succeeded = import_result is None or import_result.failed_rag_files_count == 0
+            mirrored = [path for path in to_import if succeeded or path not in same_path]
+            local_index = None
+            if local_index_enabled() and mirrored:
+                local_index = index_documents(
+                    get_local_backend(),
+                    corpus_resource_name,
+                    [(path, local_copies.get(path)) for path in mirrored],
+                    known_embeddings,
+                    near_duplicates={
+                        path: plan["matches"]
+                        for path, plan in revisions.items()
+                        if "matches" in plan and path not in skipped
+                    },
+                )
+            # Only once both indexes changed: a query between the import and
+            # the local indexing would cache stale results under the new version
+            if to_import:
+                corpus_registry.bump_version(corpus_resource_name)
+
+        # The previous revisions' files hold the stale chunks; keep them if
+        # any file of this import failed
+        if succeeded:
+            _retire_sources(
+                corpus_resource_name,
+                [previous_uri for path, previous_uri in revised.items() if previous_uri != path],
+                tool_context,
+            )
+            for path, plan in revisions.items():
+                if path in skipped:
+                    continue
+                if plan["document"]:
+                    chunk_index.record(corpus_resource_name, plan["document"], path, plan["chunk_ids"])
+                # Later uploads are screened against the chunks kept here
+                if "signatures" in plan:
+                    # A revision under the same path replaces its old chunks
+                    near_duplicate_index.remove_source(corpus_resource_name, path)
+                    kept = [
+                        i for i, match in enumerate(plan["matches"])
+                        if NEAR_DUP_MODE != "drop" or match is None
+                    ]
+                    near_duplicate_index.add(
+                        corpus_resource_name, path, [plan["chunk_ids"][i] for i in kept], plan["signatures"][kept]
+                    )
+        incremental = _revision_report(revisions, unchanged, local_index_enabled())
+
+        files_added = import_result.imported_rag_files_count if import_result else 0
+        message = f"Successfully added {files_added} file(s) to corpus '{corpus_name}'"
+        if unchanged:
+            message += f"; {len(unchanged)} unchanged revision(s) were not re-imported"
+        if near_duplicates:
+            message += f"; {len(near_duplicates)} near-duplicate upload(s) were left out"
         return {
             "status": "success",
-            "message": f"Successfully added {import_result.imported_rag_files_count} file(s) to corpus '{corpus_name}'"
+            "message": message
                        + (" (Converted Google Docs URLs to Drive format)" if conversions else ""),
             "corpus_name": corpus_name,
-            "files_added": import_result.imported_rag_files_count,
+            "files_added": files_added,
+            "files_failed": import_result.failed_rag_files_count if import_result else 0,
             "paths": validated_paths,
             "invalid_paths": invalid_paths,
             "conversions": conversions,
+            "uploads": uploads,
+            "import_batch": {
+                "paths": import_result.batch_paths if import_result else 0,
+                "calls": import_result.batch_calls if import_result else 0,
+            },
+            "incremental": incremental,
+            "near_duplicates": {
+                "mode": NEAR_DUP_MODE,
+                "documents": [
+                    {
+                        "path": path,
+                        "document": plan["document"] or os.path.basename(path),
+                        "chunks": len(plan["texts"]),
+                        "near_duplicate_chunks": plan["near_duplicates"],
+                    }
+                    for path, plan in revisions.items()
+                    if plan.get("near_duplicates")
+                ],
+                "dropped": sorted(near_duplicates),
+            },
+            "local_index": local_index,
         }
 
     except Exception as e:
@@ -190,4 +539,5 @@ def add_data(
             "message": f"Error adding data to corpus: {str(e)}",
             "corpus_name": corpus_name,
             "paths": paths,
+            "uploads": uploads,
         }
@@ -0,0 +1,152 @@
+"""
+Per-corpus record of the chunks each tracked document was imported with.
+
+When a revised version of a document is uploaded, its chunks are compared
+with the ones recorded for the previous revision: a revision whose chunks
+are all unchanged is not imported again, and for the others the report says
+how many chunks are new, reused and retired. Documents are identified by
+the document id they were imported with, or by their source URI when it is
+a stable GCS path; chunks by the content-hash ids of the local chunker.
+Entries are kept in SQLite and dropped with their RAG file.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from ..config import CHUNK_INDEX_DB
+
+
+@dataclass
+class ChunkDiff:
+    """How a revision's chunks relate to the previous revision's."""
+
+    chunks: int
+    new: int
+    reused: int
+    retired: int
+    unchanged: bool
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def diff_chunks(previous: List[str], current: List[str]) -> ChunkDiff:
+    """Compare two revisions' chunk ids; repeated chunks are counted each time."""
+    reused = sum((Counter(previous) & Counter(current)).values())
+    return ChunkDiff(
+        chunks=len(current),
+        new=len(current) - reused,
+        reused=reused,
+        retired=len(previous) - reused,
+        unchanged=previous == current,
+    )
+
+
+class ChunkIndex:
+    """
+    SQLite-backed document -> chunk ids mapping.
+
+    One connection is shared behind a lock, like the content index.
+    """
+
+    def __init__(self, path: str = CHUNK_INDEX_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._revisions = 0
+        self._unchanged = 0
+        self._chunks_reused = 0
+        self._embeddings_saved = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_index (
+                    corpus TEXT NOT NULL,
+                    document TEXT NOT NULL,
+                    source_uri TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (corpus, document)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS chunk_index_source ON chunk_index (corpus, source_uri)"
+            )
+
+    def get(self, corpus: str, document: str) -> Optional[dict]:
+        """
+        The latest revision recorded for a document.
+
+        Returns:
+            Optional[dict]: source_uri and chunk_ids, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source_uri, chunk_ids FROM chunk_index WHERE corpus = ? AND document = ?",
+                (corpus, document),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "source_uri": row["source_uri"],
+            "chunk_ids": row["chunk_ids"].split(",") if row["chunk_ids"] else [],
+        }
+
+    def record(self, corpus: str, document: str, source_uri: str, chunk_ids: List[str]) -> None:
+        """Store the chunks a document revision was imported with."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunk_index VALUES (?, ?, ?, ?, ?, ?)",
+                (corpus, document, source_uri, ",".join(chunk_ids), len(chunk_ids), time.time()),
+            )
+
+    def note(self, diff: ChunkDiff, embeddings_saved: int) -> None:
+        """Count a compared revision towards the stats."""
+        with self._lock:
+            self._revisions += 1
+            self._unchanged += int(diff.unchanged)
+            self._chunks_reused += diff.reused
+            self._embeddings_saved += embeddings_saved
+
+    def remove_source(self, corpus: str, source_uri: str) -> int:
+        """Forget the document imported from a deleted RAG file's source."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM chunk_index WHERE corpus = ? AND source_uri = ?", (corpus, source_uri)
+            )
+        return cursor.rowcount
+
+    def remove_corpus(self, corpus: str) -> int:
+        """Forget every document of a deleted corpus."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM chunk_index WHERE corpus = ?", (corpus,))
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, chunks = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM chunk_index"
+            ).fetchone()
+            return {
+                "documents": documents,
+                "chunks": chunks,
+                "revisions": self._revisions,
+                "unchanged_revisions": self._unchanged,
+                "chunks_reused": self._chunks_reused,
+                "embeddings_saved": self._embeddings_saved,
+            }
+
+
+# Shared by add_data and the delete tools
+chunk_index = ChunkIndex()
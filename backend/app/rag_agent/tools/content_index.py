@@ -0,0 +1,120 @@
+"""
+Per-corpus index of document content digests.
+
+Maps the digest of an uploaded document's raw bytes to the RAG file it was
+imported as, so an upload of bytes that are already in the corpus can be
+answered from the index instead of being stored and embedded again. Entries
+are keyed by corpus resource name and kept in SQLite so they survive
+restarts; deleting a document or a corpus removes its entries.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+from ..config import CONTENT_INDEX_DB
+
+
+class ContentIndex:
+    """
+    SQLite-backed digest -> RAG file mapping.
+
+    One connection is shared behind a lock; every call is a single short
+    statement, so the index is cheap to consult on the upload path.
+    """
+
+    def __init__(self, path: str = CONTENT_INDEX_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._hits = 0
+        self._misses = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS content_index (
+                    corpus TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    file_id TEXT NOT NULL,
+                    gcs_uri TEXT,
+                    filename TEXT,
+                    size INTEGER,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (corpus, digest)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS content_index_file ON content_index (corpus, file_id)"
+            )
+
+    def lookup(self, corpus: str, digest: str) -> Optional[dict]:
+        """
+        Find the RAG file holding this content.
+
+        Returns:
+            Optional[dict]: file_id, gcs_uri, filename and size, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id, gcs_uri, filename, size FROM content_index "
+                "WHERE corpus = ? AND digest = ?",
+                (corpus, digest),
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        return dict(row)
+
+    def record(
+        self,
+        corpus: str,
+        entries: Iterable[Tuple[str, str, Optional[str], Optional[str], Optional[int]]],
+    ) -> None:
+        """
+        Store (digest, file_id, gcs_uri, filename, size) entries for a corpus.
+
+        A digest that is already indexed keeps pointing at its newest file.
+        """
+        now = time.time()
+        rows = [(corpus, *entry, now) for entry in entries]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO content_index VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def remove_file(self, corpus: str, file_id: str) -> int:
+        """Forget a deleted RAG file; returns the number of entries removed."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM content_index WHERE corpus = ? AND file_id = ?", (corpus, file_id)
+            )
+        return cursor.rowcount
+
+    def remove_corpus(self, corpus: str) -> int:
+        """Forget every entry of a deleted corpus."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM content_index WHERE corpus = ?", (corpus,))
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM content_index").fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                "entries": entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by the upload endpoints, the ingestion jobs and the delete tools
+content_index = ContentIndex()
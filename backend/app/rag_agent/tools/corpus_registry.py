@@ -0,0 +1,181 @@
+"""
+Process-wide registry of Vertex AI RAG corpora.
+
+Maps corpus display names to full resource names so that tools can resolve a
+corpus without calling rag.list_corpora() on every request.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from vertexai import rag
+
+from ..config import (
+    CORPUS_REGISTRY_MISS_REFRESH_SECONDS,
+    CORPUS_REGISTRY_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CorpusRegistry:
+    """
+    Thread-safe cache of display name -> resource name mappings.
+
+    The registry is refreshed from rag.list_corpora() when it is older than
+    `ttl_seconds`. A lookup for an unknown name forces a refresh, but at most
+    once every `miss_refresh_seconds` so that repeated lookups of a missing
+    corpus do not turn into a list RPC each.
+
+    It also keeps a per-corpus version counter that tools bump whenever they
+    change a corpus's contents, so caches can tell when entries went stale.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = CORPUS_REGISTRY_TTL_SECONDS,
+        miss_refresh_seconds: float = CORPUS_REGISTRY_MISS_REFRESH_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.miss_refresh_seconds = miss_refresh_seconds
+        self._lock = threading.RLock()
+        self._by_display_name: Dict[str, str] = {}
+        self._resource_names: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._versions: Dict[str, int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._refreshes = 0
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl_seconds
+        )
+
+    def _find(self, corpus_name: str) -> Optional[str]:
+        if corpus_name in self._resource_names:
+            return corpus_name
+        return self._by_display_name.get(corpus_name)
+
+    def refresh(self, corpora: Optional[Iterable] = None) -> None:
+        """
+        Replace the registry contents with the current list of corpora.
+
+        Args:
+            corpora (Iterable, optional): Corpora already fetched by the caller.
+                If omitted, rag.list_corpora() is called.
+        """
+        if corpora is None:
+            corpora = rag.list_corpora()
+            with self._lock:
+                self._refreshes += 1
+
+        by_display_name: Dict[str, str] = {}
+        resource_names: Dict[str, str] = {}
+        for corpus in corpora:
+            display_name = getattr(corpus, "display_name", "") or ""
+            resource_names[corpus.name] = display_name
+            if display_name:
+                by_display_name[display_name] = corpus.name
+
+        with self._lock:
+            self._by_display_name = by_display_name
+            self._resource_names = resource_names
+            self._loaded_at = time.monotonic()
+
+    def lookup(self, corpus_name: str) -> Optional[str]:
+        """
+        Resolve a display name or resource name to a known resource name.
+
+        Args:
+            corpus_name (str): The corpus display name or full resource name
+
+        Returns:
+            Optional[str]: The resource name, or None if no such corpus exists
+        """
+        with self._lock:
+            if self._is_fresh():
+                resource_name = self._find(corpus_name)
+                if resource_name is not None:
+                    self._hits += 1
+                    return resource_name
+                # Unknown name on a fresh registry: only rescan if the last
+                # scan is old enough, otherwise trust the negative result.
+                if time.monotonic() - self._loaded_at < self.miss_refresh_seconds:
+                    self._hits += 1
+                    return None
+            self._misses += 1
+
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"Error refreshing corpus registry: {str(e)}")
+            return None
+
+        with self._lock:
+            return self._find(corpus_name)
+
+    def contains(self, resource_name: str) -> bool:
+        """Check a resource name against the registry without refreshing it."""
+        with self._lock:
+            return resource_name in self._resource_names
+
+    def register(self, display_name: str, resource_name: str) -> None:
+        """Record a corpus that was just created."""
+        with self._lock:
+            self._resource_names[resource_name] = display_name
+            if display_name:
+                self._by_display_name[display_name] = resource_name
+
+    def unregister(self, corpus_name: str) -> None:
+        """Forget a corpus that was just deleted, by display or resource name."""
+        with self._lock:
+            resource_name = self._find(corpus_name)
+            if resource_name is None:
+                return
+            display_name = self._resource_names.pop(resource_name, "")
+            if self._by_display_name.get(display_name) == resource_name:
+                del self._by_display_name[display_name]
+
+    def version(self, corpus_resource_name: str) -> int:
+        """Current content version of a corpus (0 until first changed)."""
+        with self._lock:
+            return self._versions.get(corpus_resource_name, 0)
+
+    def bump_version(self, corpus_resource_name: str) -> int:
+        """Record that a corpus's contents changed; returns the new version."""
+        with self._lock:
+            version = self._versions.get(corpus_resource_name, 0) + 1
+            self._versions[corpus_resource_name] = version
+            return version
+
+    def stats(self) -> dict:
+        """
+        Report cache effectiveness.
+
+        Returns:
+            dict: Hit/miss counters, hit rate, number of list RPCs issued
+                  and the current registry size and age.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "list_rpcs": self._refreshes,
+                "corpora": len(self._resource_names),
+                "age_seconds": (
+                    time.monotonic() - self._loaded_at
+                    if self._loaded_at is not None
+                    else None
+                ),
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# Shared by every tool in the process
+corpus_registry = CorpusRegistry()
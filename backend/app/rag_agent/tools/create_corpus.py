@@ -10,6 +10,7 @@ from vertexai import rag
 from ..config import (
     DEFAULT_EMBEDDING_MODEL,
 )
+from .corpus_registry import corpus_registry
 from .utils import check_corpus_exists
 
 
@@ -55,6 +56,9 @@ def create_corpus(
             ),
         )
 
+        # Make the new corpus resolvable without another list RPC
+        corpus_registry.register(rag_corpus.display_name, rag_corpus.name)
+
         # Update state to track corpus existence
         tool_context.state[f"corpus_exists_{corpus_name}"] = True
 
@@ -5,6 +5,14 @@ Tool for deleting a Vertex AI RAG corpus when it's no longer needed.
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
+from ..retrieval import get_local_backend, local_index_enabled
+from ..retrieval.cache import retrieval_cache
+from ..retrieval.near_duplicates import near_duplicate_index
+from ..retrieval.semantic_cache import semantic_answer_cache, semantic_context_cache
+from .chunk_index import chunk_index
+from .content_index import content_index
+from .corpus_registry import corpus_registry
+from .sync_state import sync_state
 from .utils import check_corpus_exists, get_corpus_resource_name
 
 
@@ -48,6 +56,18 @@ def delete_corpus(
 
         # Delete the corpus
         rag.delete_corpus(corpus_resource_name)
+        corpus_registry.unregister(corpus_resource_name)
+        content_index.remove_corpus(corpus_resource_name)
+        chunk_index.remove_corpus(corpus_resource_name)
+        near_duplicate_index.remove_corpus(corpus_resource_name)
+        sync_state.remove_corpus(corpus_resource_name)
+        if local_index_enabled():
+            get_local_backend().drop_corpus(corpus_resource_name)
+        # Last, once no index holds the corpus any more
+        corpus_registry.bump_version(corpus_resource_name)
+        retrieval_cache.invalidate(corpus_resource_name)
+        semantic_context_cache.invalidate(corpus_resource_name)
+        semantic_answer_cache.invalidate(corpus_resource_name)
 
         # Remove from state by setting to False
         state_key = f"corpus_exists_{corpus_name}"
@@ -5,6 +5,11 @@ Tool for deleting a specific document from a Vertex AI RAG corpus.
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
+from ..retrieval import get_local_backend, local_index_enabled
+from ..retrieval.near_duplicates import near_duplicate_index
+from .chunk_index import chunk_index
+from .content_index import content_index
+from .corpus_registry import corpus_registry
 from .utils import check_corpus_exists, get_corpus_resource_name
 
 
@@ -41,7 +46,28 @@ def delete_document(
 
         # Delete the document
         rag_file_path = f"{corpus_resource_name}/ragFiles/{document_id}"
+        # Look up the file before it is gone so the local index and the
+        # chunk and near-duplicate indexes can follow
+        rag_file = rag.get_file(rag_file_path)
+        source_uri = getattr(rag_file, "source_uri", None)
+
         rag.delete_file(rag_file_path)
+        # Its content may be uploaded again
+        content_index.remove_file(corpus_resource_name, document_id)
+        if source_uri:
+            chunk_index.remove_source(corpus_resource_name, source_uri)
+            near_duplicate_index.remove_source(corpus_resource_name, source_uri)
+
+        if local_index_enabled():
+            if source_uri:
+                get_local_backend().delete_source(corpus_resource_name, source_uri)
+            else:
+                get_local_backend().delete_source(
+                    corpus_resource_name, rag_file.display_name, field="source_name"
+                )
+        # After both the Vertex and the local removal, so no query caches the
+        # pre-delete results under the new version
+        corpus_registry.bump_version(corpus_resource_name)
 
         return {
             "status": "success",
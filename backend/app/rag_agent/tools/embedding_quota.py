@@ -0,0 +1,217 @@
+"""
+Process-wide embedding quota shared by concurrent imports.
+
+rag.import_files takes a max_embedding_requests_per_min for the whole
+operation. Passing the full quota to every call let concurrent imports each
+assume they owned it. The scheduler instead leases every import a share of
+one budget and only starts an import when its share is available.
+
+The rate given to import_files is fixed for the life of that operation and
+set when the call starts. A batch is imported in one call unless other
+imports are waiting for a share: then it goes on in calls of at most
+`max_lease_paths` files, renewing its lease before each, so an import that
+started alone gives up its surplus within one call once others join. Every
+grant is decided against the imports holding a lease at that moment. Small
+(interactive) imports are served first, and a reserve of the budget is held
+back for them so a bulk import never leaves an upload waiting behind it.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+from ..config import (
+    EMBEDDING_INTERACTIVE_RESERVE,
+    EMBEDDING_LEASE_MAX_PATHS,
+    EMBEDDING_MIN_SHARE_PER_MIN,
+    EMBEDDING_QUOTA_PER_MIN,
+    EMBEDDING_SMALL_IMPORT_PATHS,
+)
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+
+@dataclass
+class QuotaLease:
+    """
+    One import's hold on the quota, from its first call to its last.
+
+    `requests_per_min` is the share granted for the current import_files
+    call; renew it with EmbeddingQuota.renew() before every further call.
+    """
+
+    id: int
+    paths: int
+    priority: int
+    cap: int
+    started_at: float
+    requests_per_min: int = 0
+
+
+class EmbeddingQuota:
+    """
+    Leases shares of an embeddings-per-minute budget to imports.
+
+    Args:
+        requests_per_min: The whole budget
+        min_share: Smallest share an import is started with; imports wait
+            rather than run slower than this
+        interactive_reserve: Fraction of the budget only small imports may use
+        small_import_paths: Imports of at most this many paths are interactive
+        max_lease_paths: Paths imported under one grant while other imports
+            wait for a share; alone, an import uses one call
+    """
+
+    def __init__(
+        self,
+        requests_per_min: int = EMBEDDING_QUOTA_PER_MIN,
+        min_share: int = EMBEDDING_MIN_SHARE_PER_MIN,
+        interactive_reserve: float = EMBEDDING_INTERACTIVE_RESERVE,
+        small_import_paths: int = EMBEDDING_SMALL_IMPORT_PATHS,
+        max_lease_paths: int = EMBEDDING_LEASE_MAX_PATHS,
+    ):
+        self.requests_per_min = requests_per_min
+        self.min_share = max(1, min(min_share, requests_per_min))
+        self.reserve = int(requests_per_min * interactive_reserve)
+        self.small_import_paths = small_import_paths
+        self.max_lease_paths = max(1, max_lease_paths)
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        # Every import holding a lease, whether running a call or waiting
+        self._imports: Dict[int, QuotaLease] = {}
+        # (priority, lease id) of imports waiting for a share; served in order
+        self._waiting: List[Tuple[int, int]] = []
+        self._grants = 0
+        self._waited = 0
+        self._wait_seconds = 0.0
+
+    def priority(self, paths: int) -> int:
+        return PRIORITY_INTERACTIVE if paths <= self.small_import_paths else PRIORITY_BULK
+
+    def _allocated(self) -> int:
+        return sum(lease.requests_per_min for lease in self._imports.values())
+
+    def _grant_for(self, lease: QuotaLease) -> int:
+        """
+        Share the head of the queue would get now; 0 if it must wait.
+
+        The budget a bulk import may use (all but the reserve) is split
+        evenly between every import holding a lease, so a share shrinks as
+        soon as imports join and grows again when they leave.
+        """
+        usable = self.requests_per_min
+        if lease.priority == PRIORITY_BULK:
+            usable -= self.reserve
+        available = usable - self._allocated()
+        fair_share = usable // len(self._imports)
+        grant = min(available, max(fair_share, self.min_share))
+        return grant if grant >= self.min_share else 0
+
+    def _acquire(self, lease: QuotaLease) -> None:
+        """Wait until the lease is granted its share; the lock must be held."""
+        ticket = (lease.priority, lease.id)
+        started = time.monotonic()
+        self._waiting.append(ticket)
+        self._waiting.sort()
+        try:
+            while True:
+                if self._waiting[0] == ticket:
+                    grant = self._grant_for(lease)
+                    if grant:
+                        break
+                self._cond.wait()
+        finally:
+            self._waiting.remove(ticket)
+            # The next in line may fit in what is left
+            self._cond.notify_all()
+        lease.requests_per_min = min(grant, lease.cap) if lease.cap else grant
+        self._grants += 1
+        waited = time.monotonic() - started
+        if waited > 0.01:
+            self._waited += 1
+            self._wait_seconds += waited
+
+    @contextmanager
+    def lease(self, paths: int, cap: int = 0) -> Iterator[QuotaLease]:
+        """
+        Wait for a share of the budget for an import's first call.
+
+        Args:
+            paths (int): Number of paths in the whole import, which sets its
+                priority
+            cap (int, optional): Never grant more than this many requests/min
+
+        Yields:
+            QuotaLease: The lease, holding the share of the first call
+        """
+        lease = QuotaLease(next(self._ids), paths, self.priority(paths), cap, time.time())
+        with self._cond:
+            self._imports[lease.id] = lease
+            try:
+                self._acquire(lease)
+            except BaseException:
+                del self._imports[lease.id]
+                self._cond.notify_all()
+                raise
+        logger.info(f"Embedding quota: {lease.requests_per_min}/min leased to an import of {paths} path(s)")
+        try:
+            yield lease
+        finally:
+            with self._cond:
+                del self._imports[lease.id]
+                self._cond.notify_all()
+
+    def renew(self, lease: QuotaLease) -> int:
+        """
+        Give the lease's share back and wait for the current fair share.
+
+        Call between two import_files calls of the same import.
+
+        Returns:
+            int: The embedding requests per minute the next call may use
+        """
+        with self._cond:
+            lease.requests_per_min = 0
+            self._cond.notify_all()
+            self._acquire(lease)
+            return lease.requests_per_min
+
+    def has_waiting(self) -> bool:
+        """Whether some import is waiting for a share of the budget."""
+        with self._cond:
+            return bool(self._waiting)
+
+    def stats(self) -> dict:
+        with self._cond:
+            allocated = self._allocated()
+            return {
+                "requests_per_min": self.requests_per_min,
+                "in_use_per_min": allocated,
+                "available_per_min": self.requests_per_min - allocated,
+                "utilization": allocated / self.requests_per_min if self.requests_per_min else 0.0,
+                "interactive_reserve_per_min": self.reserve,
+                "active_imports": [
+                    {
+                        "requests_per_min": lease.requests_per_min,
+                        "paths": lease.paths,
+                        "interactive": lease.priority == PRIORITY_INTERACTIVE,
+                        "running_seconds": round(time.time() - lease.started_at, 1),
+                    }
+                    for lease in self._imports.values()
+                ],
+                "waiting_imports": len(self._waiting),
+                "grants": self._grants,
+                "waited": self._waited,
+                "avg_wait_seconds": self._wait_seconds / self._waited if self._waited else 0.0,
+            }
+
+
+# Shared by every import started in the process
+embedding_quota = EmbeddingQuota()
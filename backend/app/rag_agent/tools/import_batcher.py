@@ -0,0 +1,243 @@
+"""
+Coalescing of rag.import_files calls.
+
+Every add_data call used to start its own import operation, so a burst of
+uploads turned into many small long-running operations competing for the
+embedding quota. The batcher collects paths per corpus (and import
+settings) for a short window and starts one import_files call per batch,
+never exceeding the API's per-call path limit. Each caller blocks until the
+batch holding its paths has finished and receives that batch's outcome; if a
+shared batch fails, each caller's paths are retried on their own.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from vertexai import rag
+
+from ..config import IMPORT_BATCH_MAX_PATHS, IMPORT_BATCH_WINDOW_SECONDS
+from .embedding_quota import embedding_quota
+
+logger = logging.getLogger(__name__)
+
+# (corpus resource name, chunk size, chunk overlap, embedding requests/min cap)
+BatchKey = Tuple[str, int, int, int]
+
+
+@dataclass
+class ImportOutcome:
+    """What one caller's import amounted to, with its batch's totals."""
+
+    imported_rag_files_count: int
+    failed_rag_files_count: int
+    skipped_rag_files_count: int
+    batch_paths: int
+    batch_calls: int
+
+
+@dataclass
+class _Batch:
+    key: BatchKey
+    paths: List[str] = field(default_factory=list)
+    waiters: List[Tuple[List[str], Future]] = field(default_factory=list)
+    timer: Optional[threading.Timer] = None
+
+
+class ImportBatcher:
+    """
+    Thread-safe coalescing window in front of rag.import_files.
+
+    A batch is flushed `window_seconds` after its first paths arrive, or as
+    soon as it holds `max_paths` paths. Callers with more paths than fit in
+    one call are spread over several batches. A window of 0 disables
+    coalescing and every call is imported on its own.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = IMPORT_BATCH_WINDOW_SECONDS,
+        max_paths: int = IMPORT_BATCH_MAX_PATHS,
+    ):
+        self.window_seconds = window_seconds
+        self.max_paths = max(1, max_paths)
+        self._lock = threading.Lock()
+        self._open: Dict[BatchKey, _Batch] = {}
+        self._requests = 0
+        self._batches = 0
+        self._paths = 0
+        self._errors = 0
+        self._import_seconds = 0.0
+
+    def import_files(
+        self,
+        corpus_resource_name: str,
+        paths: List[str],
+        chunk_size: int,
+        chunk_overlap: int,
+        max_embedding_requests_per_min: int,
+    ) -> ImportOutcome:
+        """
+        Import `paths` as part of a coalesced batch (blocking).
+
+        Returns:
+            ImportOutcome: Counts for this caller's paths and the size of the
+            batches they were imported with
+
+        Raises:
+            Exception: Whatever import_files raised for one of the batches
+        """
+        key = (corpus_resource_name, chunk_size, chunk_overlap, max_embedding_requests_per_min)
+        futures = []
+        with self._lock:
+            self._requests += 1
+            for start in range(0, len(paths), self.max_paths):
+                futures.append(self._add(key, paths[start:start + self.max_paths]))
+
+        outcomes = [future.result() for future in futures]
+        return ImportOutcome(
+            imported_rag_files_count=sum(o.imported_rag_files_count for o in outcomes),
+            failed_rag_files_count=sum(o.failed_rag_files_count for o in outcomes),
+            skipped_rag_files_count=sum(o.skipped_rag_files_count for o in outcomes),
+            batch_paths=sum(o.batch_paths for o in outcomes),
+            batch_calls=len(outcomes),
+        )
+
+    def _add(self, key: BatchKey, paths: List[str]) -> Future:
+        """Queue paths that fit in one call; the lock must be held."""
+        future: Future = Future()
+        batch = self._open.get(key)
+        if batch is not None and len(batch.paths) + len(paths) > self.max_paths:
+            self._flush(batch)
+            batch = None
+        if batch is None:
+            batch = self._open[key] = _Batch(key)
+            if self.window_seconds > 0:
+                batch.timer = threading.Timer(self.window_seconds, self._expire, (batch,))
+                batch.timer.daemon = True
+                batch.timer.start()
+        batch.paths.extend(paths)
+        batch.waiters.append((paths, future))
+        if self.window_seconds <= 0 or len(batch.paths) >= self.max_paths:
+            self._flush(batch)
+        return future
+
+    def _expire(self, batch: _Batch) -> None:
+        with self._lock:
+            if self._open.get(batch.key) is batch:
+                self._flush(batch)
+
+    def _flush(self, batch: _Batch) -> None:
+        """Close the batch and import it on its own thread; the lock must be held."""
+        del self._open[batch.key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        # Not the shared I/O pool: its threads may all be callers waiting here
+        threading.Thread(
+            target=self._run, args=(batch,), name="rag-import-batch", daemon=True
+        ).start()
+
+    def _import(self, key: BatchKey, paths: List[str]) -> Tuple[int, int, int]:
+        """
+        Import a batch in one call, at the share of the quota leased when it
+        starts. While other imports wait for a share, the rest of the batch
+        goes on in calls of at most `max_lease_paths` paths instead, renewing
+        the lease before each.
+
+        Returns:
+            Tuple[int, int, int]: Imported, failed and skipped file counts
+        """
+        corpus_resource_name, chunk_size, chunk_overlap, requests_per_min = key
+        counts = [0, 0, 0]
+        import_seconds = 0.0
+        start = 0
+        with embedding_quota.lease(len(paths), cap=requests_per_min) as lease:
+            while start < len(paths):
+                if start:
+                    embedding_quota.renew(lease)
+                end = len(paths)
+                if embedding_quota.has_waiting():
+                    end = min(end, start + embedding_quota.max_lease_paths)
+                started = time.monotonic()
+                response = rag.import_files(
+                    corpus_resource_name,
+                    paths[start:end],
+                    transformation_config=rag.TransformationConfig(
+                        chunking_config=rag.ChunkingConfig(
+                            chunk_size=chunk_size,
+                            chunk_overlap=chunk_overlap,
+                        ),
+                    ),
+                    max_embedding_requests_per_min=lease.requests_per_min,
+                )
+                import_seconds += time.monotonic() - started
+                counts[0] += response.imported_rag_files_count or 0
+                counts[1] += response.failed_rag_files_count or 0
+                counts[2] += response.skipped_rag_files_count or 0
+                start = end
+        with self._lock:
+            self._batches += 1
+            self._paths += len(paths)
+            self._import_seconds += import_seconds
+        return counts[0], counts[1], counts[2]
+
+    def _run(self, batch: _Batch) -> None:
+        try:
+            imported, failed, skipped = self._import(batch.key, batch.paths)
+        except Exception as e:
+            logger.warning(f"import_files failed for a batch of {len(batch.paths)} path(s): {e}")
+            with self._lock:
+                self._errors += 1
+            if len(batch.waiters) == 1:
+                batch.waiters[0][1].set_exception(e)
+                return
+            # One caller's bad path must not fail the others: import separately
+            for paths, future in batch.waiters:
+                self._run(_Batch(batch.key, list(paths), [(paths, future)]))
+            return
+
+        if len(batch.waiters) > 1:
+            print(
+                f"📦 Imported {len(batch.paths)} path(s) for {len(batch.waiters)} callers "
+                f"in one import_files call"
+            )
+
+        for paths, future in batch.waiters:
+            # The response only has batch totals: a caller alone in its batch
+            # gets them as-is, in a clean batch every path was imported, and
+            # otherwise each caller gets an upper bound (verification checks
+            # the actual files)
+            if len(batch.waiters) == 1:
+                counts = (imported, failed, skipped)
+            elif failed + skipped == 0:
+                counts = (len(paths), 0, 0)
+            else:
+                counts = tuple(min(len(paths), n) for n in (imported, failed, skipped))
+            future.set_result(ImportOutcome(
+                imported_rag_files_count=counts[0],
+                failed_rag_files_count=counts[1],
+                skipped_rag_files_count=counts[2],
+                batch_paths=len(batch.paths),
+                batch_calls=1,
+            ))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window_seconds": self.window_seconds,
+                "max_paths": self.max_paths,
+                "requests": self._requests,
+                "batches": self._batches,
+                "paths": self._paths,
+                "errors": self._errors,
+                "open_batches": len(self._open),
+                "avg_paths_per_batch": self._paths / self._batches if self._batches else 0.0,
+                "avg_import_seconds": self._import_seconds / self._batches if self._batches else 0.0,
+            }
+
+
+# Shared by every add_data call in the process
+import_batcher = ImportBatcher()
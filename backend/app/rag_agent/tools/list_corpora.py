@@ -6,6 +6,8 @@ from typing import Dict, List, Union
 
 from vertexai import rag
 
+from .corpus_registry import corpus_registry
+
 
 def list_corpora() -> dict:
     """
@@ -20,7 +22,10 @@ def list_corpora() -> dict:
     """
     try:
         # Get the list of corpora
-        corpora = rag.list_corpora()
+        corpora = list(rag.list_corpora())
+
+        # We already paid for the scan, so keep the shared registry warm
+        corpus_registry.refresh(corpora)
 
         # Process corpus information into a more usable format
         corpus_info: List[Dict[str, Union[str, int]]] = []
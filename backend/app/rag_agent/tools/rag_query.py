@@ -4,17 +4,87 @@ Tool for querying Vertex AI RAG corpora and retrieving relevant information.
 
 import logging
 import traceback
+from typing import List
 
 from google.adk.tools.tool_context import ToolContext
-from vertexai import rag
 
 from ..config import (
     DEFAULT_DISTANCE_THRESHOLD,
     DEFAULT_TOP_K,
 )
+from ..retrieval import get_retrieval_backend
+from ..retrieval.cache import retrieval_cache
+from ..retrieval.semantic_cache import query_embedding, semantic_context_cache
+from .corpus_registry import corpus_registry
 from .utils import check_corpus_exists, get_corpus_resource_name
 
 
+def retrieve_contexts(
+    corpus_resource_name: str,
+    query: str,
+    top_k: int = DEFAULT_TOP_K,
+    distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+) -> List[dict]:
+    """
+    Run a retrieval query against a corpus and return the ranked contexts.
+
+    This is the retrieval step of `rag_query` without the agent bookkeeping,
+    so it can be called directly by API endpoints. The query is served by the
+    configured retrieval backend (Vertex AI RAG or the local index), and
+    repeated queries are answered from the retrieval cache until the corpus
+    changes or the entry expires. Near-duplicate queries (paraphrases naming
+    the same identifiers) are answered from the semantic cache when it is
+    enabled; identifier queries skip it and are not embedded for it.
+
+    Args:
+        corpus_resource_name (str): The full resource name of the corpus.
+        query (str): The text query to search in the corpus.
+        top_k (int): Maximum number of contexts to return.
+        distance_threshold (float): Maximum vector distance of a returned context.
+
+    Returns:
+        List[dict]: Contexts with source_uri, source_name, text and score.
+    """
+    # Read the version first so a concurrent ingestion leaves a stale entry
+    version = corpus_registry.version(corpus_resource_name)
+    cached = retrieval_cache.get(
+        corpus_resource_name, query, top_k, distance_threshold, version
+    )
+    if cached is not None:
+        return cached
+
+    scope = (top_k, distance_threshold)
+    query_vector = (
+        query_embedding(query) if semantic_context_cache.enabled else None
+    )
+    match = semantic_context_cache.lookup(
+        corpus_resource_name, query, query_vector, version, scope
+    )
+    if match is not None:
+        results, similarity, cached_query = match
+        print(f"♻️ Semantic cache hit ({similarity:.3f}) for cached query '{cached_query}'")
+        return [dict(result) for result in results]
+
+    results = get_retrieval_backend().retrieve(
+        corpus_resource_name,
+        query,
+        top_k=top_k,
+        distance_threshold=distance_threshold,
+    )
+    retrieval_cache.put(
+        corpus_resource_name, query, top_k, distance_threshold, version, results
+    )
+    semantic_context_cache.store(
+        corpus_resource_name,
+        query,
+        query_vector,
+        version,
+        [dict(result) for result in results],
+        scope,
+    )
+    return results
+
+
 def rag_query(
     corpus_name: str,
     query: str,
@@ -35,7 +105,9 @@ def rag_query(
         print(f"📡 Starting RAG query: '{query}'")
         print(f"📁 Target corpus: '{corpus_name}'")
 
-        if not check_corpus_exists(corpus_name, tool_context):
+        if not check_corpus_exists(corpus_name, tool_context) and not (
+            get_retrieval_backend().has_corpus(get_corpus_resource_name(corpus_name))
+        ):
             return {
                 "status": "error",
                 "message": f"Corpus '{corpus_name}' does not exist. Please create it first using the create_corpus tool.",
@@ -45,30 +117,8 @@ def rag_query(
 
         corpus_resource_name = get_corpus_resource_name(corpus_name)
 
-        rag_retrieval_config = rag.RagRetrievalConfig(
-            top_k=DEFAULT_TOP_K,
-            filter=rag.Filter(vector_distance_threshold=DEFAULT_DISTANCE_THRESHOLD),
-        )
-
-        print("🔍 Calling rag.retrieval_query...")
-        response = rag.retrieval_query(
-            rag_resources=[
-                rag.RagResource(rag_corpus=corpus_resource_name)
-            ],
-            text=query,
-            rag_retrieval_config=rag_retrieval_config,
-        )
-
-        results = []
-        if hasattr(response, "contexts") and response.contexts:
-            for ctx_group in response.contexts.contexts:
-                result = {
-                    "source_uri": getattr(ctx_group, "source_uri", ""),
-                    "source_name": getattr(ctx_group, "source_display_name", ""),
-                    "text": getattr(ctx_group, "text", ""),
-                    "score": getattr(ctx_group, "score", 0.0),
-                }
-                results.append(result)
+        print(f"🔍 Retrieving with the {get_retrieval_backend().name} backend...")
+        results = retrieve_contexts(corpus_resource_name, query)
 
         if not results:
             return {
@@ -0,0 +1,122 @@
+"""
+State of GCS-prefix syncs: which objects each corpus was synced from.
+
+For every synced object it keeps the generation and content hash it was
+imported at and, once known, the RAG file it became, so a sync run can diff
+a prefix listing against it without asking the corpus. Kept in SQLite so it
+survives restarts; deleting a corpus removes its state.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from ..config import SYNC_STATE_DB
+
+
+class SyncStateStore:
+    """
+    SQLite-backed record of the objects each corpus was synced from.
+
+    One connection is shared behind a lock, like the job store.
+    """
+
+    def __init__(self, path: str = SYNC_STATE_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_objects (
+                    corpus TEXT NOT NULL,
+                    uri TEXT NOT NULL,
+                    generation TEXT,
+                    content_hash TEXT,
+                    file_id TEXT,
+                    synced_at REAL NOT NULL,
+                    PRIMARY KEY (corpus, uri)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_prefixes (
+                    corpus TEXT NOT NULL,
+                    prefix TEXT NOT NULL,
+                    reconciled_at REAL,
+                    last_run_at REAL,
+                    PRIMARY KEY (corpus, prefix)
+                )
+                """
+            )
+
+    def load(self, corpus: str, prefix: str) -> Dict[str, dict]:
+        """Synced objects under `prefix`: uri -> generation, content_hash, file_id."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT uri, generation, content_hash, file_id FROM sync_objects "
+                "WHERE corpus = ? AND substr(uri, 1, ?) = ?",
+                (corpus, len(prefix), prefix),
+            ).fetchall()
+        return {row["uri"]: dict(row) for row in rows}
+
+    def upsert(self, corpus: str, objects: Dict[str, dict]) -> None:
+        now = time.time()
+        rows = [
+            (corpus, uri, obj.get("generation"), obj.get("content_hash"), obj.get("file_id"), now)
+            for uri, obj in objects.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sync_objects VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def set_file_ids(self, corpus: str, file_ids: Dict[str, str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE sync_objects SET file_id = ? WHERE corpus = ? AND uri = ?",
+                [(file_id, corpus, uri) for uri, file_id in file_ids.items()],
+            )
+
+    def delete(self, corpus: str, uris: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM sync_objects WHERE corpus = ? AND uri = ?",
+                [(corpus, uri) for uri in uris],
+            )
+
+    def remove_corpus(self, corpus: str) -> int:
+        """Forget everything synced into a deleted corpus."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sync_objects WHERE corpus = ?", (corpus,))
+            self._conn.execute("DELETE FROM sync_prefixes WHERE corpus = ?", (corpus,))
+        return cursor.rowcount
+
+    def reconciled_at(self, corpus: str, prefix: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reconciled_at FROM sync_prefixes WHERE corpus = ? AND prefix = ?",
+                (corpus, prefix),
+            ).fetchone()
+        return row["reconciled_at"] if row is not None else None
+
+    def mark_run(self, corpus: str, prefix: str, reconciled: bool) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_prefixes VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (corpus, prefix) DO UPDATE SET last_run_at = excluded.last_run_at, "
+                "reconciled_at = COALESCE(excluded.reconciled_at, reconciled_at)",
+                (corpus, prefix, now if reconciled else None, now),
+            )
+
+
+# Shared by the sync jobs and delete_corpus
+sync_state = SyncStateStore()
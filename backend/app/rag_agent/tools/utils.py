@@ -4,18 +4,43 @@ Utility functions for the RAG tools.
 
 import logging
 import re
+from typing import Tuple
 
 from google.adk.tools.tool_context import ToolContext
-from vertexai import rag
 
 from ..config import (
     LOCATION,
     PROJECT_ID,
 )
+from .corpus_registry import corpus_registry
 
 logger = logging.getLogger(__name__)
 
 
+class StateToolContext:
+    """
+    Stand-in for ToolContext when a tool is called outside an agent run.
+
+    The tools only use `tool_context.state`, and ADK's ToolContext cannot be
+    constructed without an invocation context.
+    """
+
+    def __init__(self):
+        self.state = {}
+
+
+def split_gcs_uri(uri: str) -> Tuple[str, str]:
+    """
+    Split a gs:// URI into its bucket and object name (or prefix).
+
+    Returns:
+        Tuple[str, str]: Bucket name and object name; the name is empty for
+        a bare bucket URI
+    """
+    bucket, _, name = uri[len("gs://"):].partition("/")
+    return bucket, name
+
+
 def get_corpus_resource_name(corpus_name: str) -> str:
     """
     Convert a corpus name to its full resource name if needed.
@@ -34,16 +59,9 @@ def get_corpus_resource_name(corpus_name: str) -> str:
         return corpus_name
 
     # Check if this is a display name of an existing corpus
-    try:
-        # List all corpora and check if there's a match with the display name
-        corpora = rag.list_corpora()
-        for corpus in corpora:
-            if hasattr(corpus, "display_name") and corpus.display_name == corpus_name:
-                return corpus.name
-    except Exception as e:
-        logger.warning(f"Error when checking for corpus display name: {str(e)}")
-        # If we can't check, continue with the default behavior
-        pass
+    resource_name = corpus_registry.lookup(corpus_name)
+    if resource_name is not None:
+        return resource_name
 
     # If it contains partial path elements, extract just the corpus ID
     if "/" in corpus_name:
@@ -75,22 +93,19 @@ def check_corpus_exists(corpus_name: str, tool_context: ToolContext) -> bool:
         return True
 
     try:
-        # Get full resource name
+        # Resolve through the shared registry; a warm hit needs no list RPC
         corpus_resource_name = get_corpus_resource_name(corpus_name)
 
-        # List all corpora and check if this one exists
-        corpora = rag.list_corpora()
-        for corpus in corpora:
-            if (
-                corpus.name == corpus_resource_name
-                or corpus.display_name == corpus_name
-            ):
-                # Update state
-                tool_context.state[f"corpus_exists_{corpus_name}"] = True
-                # Also set this as the current corpus if no current corpus is set
-                if not tool_context.state.get("current_corpus"):
-                    tool_context.state["current_corpus"] = corpus_name
-                return True
+        if (
+            corpus_registry.contains(corpus_resource_name)
+            or corpus_registry.lookup(corpus_resource_name) is not None
+        ):
+            # Update state
+            tool_context.state[f"corpus_exists_{corpus_name}"] = True
+            # Also set this as the current corpus if no current corpus is set
+            if not tool_context.state.get("current_corpus"):
+                tool_context.state["current_corpus"] = corpus_name
+            return True
 
         return False
     except Exception as e:
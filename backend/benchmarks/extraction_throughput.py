@@ -0,0 +1,129 @@
+"""
+PDF text extraction throughput (pages/sec).
+
+Writes synthetic text PDFs (Helvetica pages of random words, a stand-in for
+datasheets) and extracts them three ways: the previous extract_text loop
+that grew one string with +=, the page generator in the calling thread, and
+the generator with page ranges spread over a process pool.
+
+Usage (from the backend directory):
+    python -m benchmarks.extraction_throughput --pages 100 1500 --workers 2 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PyPDF2 import PdfReader
+
+from app.rag_agent.models import document
+from app.rag_agent.models.document import iter_pages
+
+
+def make_pdf(path, pages, lines_per_page, seed):
+    """Write a minimal PDF of `pages` text pages."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(5000)])
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, written once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for _ in range(pages):
+        lines = [" ".join(rng.choice(vocabulary, size=12)) for _ in range(lines_per_page)]
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def concat_extract(path):
+    """The previous extract_text PDF branch."""
+    with open(path, "rb") as f:
+        text = ""
+        for page in PdfReader(f).pages:
+            text += page.extract_text()
+        return text
+
+
+def measure(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1500])
+    parser.add_argument("--lines-per-page", type=int, default=60)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} lines_per_page={args.lines_per_page} "
+          f"pages_per_task={document.EXTRACT_PAGES_PER_TASK} "
+          f"parallel_min_pages={document.EXTRACT_PARALLEL_MIN_PAGES}\n")
+    print("| pages | method | seconds | pages/s |")
+    print("|---|---|---|---|")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pages in args.pages:
+            path = os.path.join(tmp_dir, f"synthetic_{pages}.pdf")
+            make_pdf(path, pages, args.lines_per_page, args.seed)
+            expected = concat_extract(path)
+
+            methods = [
+                ("concat (+=)", lambda: concat_extract(path)),
+                ("pages, 1 thread", lambda: "".join(iter_pages(path, workers=1))),
+            ]
+            pools = []
+            for workers in args.workers:
+                pool = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("forkserver")
+                )
+                pools.append(pool)
+
+                def pooled(pool=pool, workers=workers):
+                    document._extract_pool = pool
+                    return "".join(iter_pages(path, workers=workers))
+
+                # Start the workers outside the measurement
+                assert pooled() == expected
+                methods.append((f"pages, {workers} processes", pooled))
+
+            for name, func in methods:
+                seconds = measure(func, args.repeat)
+                print(f"| {pages} | {name} | {seconds:.2f} | {pages / seconds:.0f} |")
+            for pool in pools:
+                pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Recall vs latency of the local HNSW index against exact search.
+
+Builds an HNSW index over synthetic clustered unit vectors (a stand-in for
+chunk embeddings) and reports recall@k and per-query latency for several
+ef_search values, next to the exact NumPy scan used for small corpora.
+
+Usage (from the backend directory):
+    python -m benchmarks.hnsw_recall --n 20000 --dim 128 --queries 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.rag_agent.retrieval.embedders import normalize_rows
+from app.rag_agent.retrieval.hnsw import HNSWIndex
+
+
+def make_dataset(n, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    assignment = rng.integers(0, clusters, size=n)
+    return normalize_rows(centers[assignment] + 0.6 * rng.normal(size=(n, dim)))
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = make_dataset(args.n + args.queries, args.dim, args.clusters, args.seed)
+    corpus, queries = data[:args.n], data[args.n:]
+
+    start = time.perf_counter()
+    index = HNSWIndex(args.dim, m=args.m, ef_construction=args.ef_construction, seed=args.seed)
+    index.add(corpus)
+    build_seconds = time.perf_counter() - start
+
+    exact_latencies, truth = [], []
+    for query in queries:
+        start = time.perf_counter()
+        distances = 1.0 - corpus @ query
+        nearest = np.argpartition(distances, args.k)[:args.k]
+        exact_latencies.append(time.perf_counter() - start)
+        truth.append(set(nearest.tolist()))
+
+    print(f"n={args.n} dim={args.dim} k={args.k} M={args.m} "
+          f"ef_construction={args.ef_construction} build={build_seconds:.1f}s\n")
+    print("| method | ef_search | recall@k | p50 ms | p99 ms |")
+    print("|---|---|---|---|---|")
+    print(f"| exact | - | 1.000 | {percentile_ms(exact_latencies, 50):.3f} "
+          f"| {percentile_ms(exact_latencies, 99):.3f} |")
+
+    for ef in args.ef_search:
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            labels, _ = index.search(query, args.k, ef=ef)
+            latencies.append(time.perf_counter() - start)
+            hits += len(expected.intersection(labels.tolist()))
+        recall = hits / (args.k * len(queries))
+        print(f"| hnsw | {ef} | {recall:.3f} | {percentile_ms(latencies, 50):.3f} "
+              f"| {percentile_ms(latencies, 99):.3f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Latency of /query under concurrent load, blocking vs non-blocking handler.
+
+Drives the real ADK Runner with a scripted model that calls rag_query once
+and then answers. The model turn is simulated with an asyncio sleep (the
+Gemini client is async) and the Vertex AI RPCs made by rag_query and the
+corpus diagnostics with blocking sleeps, so no cloud access is needed.
+
+"blocking" reproduces the previous handler: runner.run() and the sync tool
+called straight from the async endpoint. "async" is the current /query
+endpoint: runner.run_async() with tools and RPCs in the shared I/O pool.
+
+Usage (from the backend directory):
+    python -m benchmarks.query_concurrency --concurrency 1 4 16 32
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from typing import AsyncGenerator
+
+# Every query must reach the agent
+os.environ.setdefault("RAG_SEMANTIC_CACHE_ENABLED", "false")
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, Form
+from google.adk.agents import Agent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import Runner
+from google.genai.types import Content, FunctionCall, Part
+
+from app.rag_agent.concurrency import async_tool
+from app.rag_agent.routers import query as query_router
+
+CORPUS = "projects/bench/locations/local/ragCorpora/bench"
+
+
+class ScriptedLlm(BaseLlm):
+    """Calls rag_query on the first turn and answers on the second."""
+
+    latency: float = 0.5
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self.latency)
+        last = llm_request.contents[-1]
+        if any(part.function_response for part in last.parts or []):
+            part = Part(text="Earthwork is the movement of soil.")
+        else:
+            part = Part(function_call=FunctionCall(
+                name="rag_query", args={"corpus_name": "bench", "query": "earthwork"}
+            ))
+        yield LlmResponse(content=Content(role="model", parts=[part]))
+
+
+def make_rag_query(rpc_seconds):
+    def rag_query(corpus_name: str, query: str) -> dict:
+        """Query a corpus."""
+        time.sleep(rpc_seconds)
+        return {"status": "success", "results": [{"text": "soil"}]}
+
+    return rag_query
+
+
+def make_agent(tool, model_seconds):
+    return Agent(
+        name="bench_agent",
+        model=ScriptedLlm(model="scripted", latency=model_seconds),
+        instruction="Answer with rag_query.",
+        tools=[tool],
+    )
+
+
+def blocking_app(model_seconds, rpc_seconds):
+    """The previous handler: sync runner and tools on the event loop."""
+    runner = Runner(
+        agent=make_agent(make_rag_query(rpc_seconds), model_seconds),
+        app_name="rag-app",
+        session_service=query_router.session_service,
+    )
+    app = FastAPI()
+
+    @app.post("/query")
+    async def query_endpoint(query: str = Form(...), corpus_name: str = Form("earthwork")):
+        session_id = f"query-session-{uuid.uuid4()}"
+        query_router.session_service.create_session(
+            app_name="rag-app", user_id="rag_user", session_id=session_id
+        )
+        time.sleep(rpc_seconds)  # corpus diagnostics
+        final_response = None
+        for event in runner.run(
+            user_id="rag_user",
+            session_id=session_id,
+            new_message=Content(role="user", parts=[Part(text=query)]),
+        ):
+            if event.is_final_response():
+                final_response = event.content.parts[0].text
+        return {"response": final_response}
+
+    return app
+
+
+def async_app(model_seconds, rpc_seconds):
+    """The current /query router with its RPCs replaced by sleeps."""
+    query_router.runner = Runner(
+        agent=make_agent(async_tool(make_rag_query(rpc_seconds)), model_seconds),
+        app_name="rag-app",
+        session_service=query_router.session_service,
+    )
+    query_router._lookup_cached_answer = lambda corpus_name, query: (CORPUS, 0, None, None)
+    query_router._log_corpus_diagnostics = lambda corpus_name: time.sleep(rpc_seconds)
+    app = FastAPI()
+    app.include_router(query_router.router)
+    return app
+
+
+async def run_load(app, concurrency, rounds):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def one(i, start):
+            response = await client.post("/query", data={"query": f"what is earthwork {i}"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+        for _ in range(rounds):
+            # All requests of a round arrive together; a task that only gets
+            # scheduled once the loop unblocks still counts from the arrival
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i, start) for i in range(concurrency)))
+    return latencies
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--model-ms", type=float, default=300.0)
+    parser.add_argument("--rpc-ms", type=float, default=100.0)
+    parser.add_argument("--modes", nargs="+", default=["blocking", "async"])
+    args = parser.parse_args()
+
+    model_seconds, rpc_seconds = args.model_ms / 1000.0, args.rpc_ms / 1000.0
+    factories = {"blocking": blocking_app, "async": async_app}
+
+    print(f"model turn {args.model_ms:.0f} ms x2, blocking RPC {args.rpc_ms:.0f} ms x2\n")
+    print("| handler | concurrency | p50 ms | p99 ms | req/s |")
+    print("|---|---|---|---|---|")
+    for mode in args.modes:
+        app = factories[mode](model_seconds, rpc_seconds)
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            latencies = asyncio.run(run_load(app, concurrency, args.rounds))
+            elapsed = time.perf_counter() - start
+            print(
+                f"| {mode} | {concurrency} | {percentile_ms(latencies, 50):.0f} | "
+                f"{percentile_ms(latencies, 99):.0f} | {len(latencies) / elapsed:.1f} |"
+            )
+
+
+if __name__ == "__main__":
+    main()
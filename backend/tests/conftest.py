@@ -0,0 +1,27 @@
+"""
+Shared test setup.
+
+The stores are module-level singletons opened from config at import time,
+so every path is pointed at a scratch directory before `app` is imported.
+"""
+
+import os
+import sys
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="rag-agent-tests-")
+
+os.environ.update(
+    RAG_INGEST_JOB_DB=os.path.join(_DATA_DIR, "ingest_jobs.sqlite3"),
+    RAG_CONTENT_INDEX_DB=os.path.join(_DATA_DIR, "content_index.sqlite3"),
+    RAG_SYNC_STATE_DB=os.path.join(_DATA_DIR, "sync_state.sqlite3"),
+    RAG_EXTRACTION_CACHE_DB=os.path.join(_DATA_DIR, "extraction_cache.sqlite3"),
+    RAG_CHUNK_INDEX_DB=os.path.join(_DATA_DIR, "chunk_index.sqlite3"),
+    RAG_NEAR_DUP_DB=os.path.join(_DATA_DIR, "near_duplicates.sqlite3"),
+    RAG_LOCAL_STORE_DIR=os.path.join(_DATA_DIR, "local_index"),
+    RAG_BULK_IMPORT_DIR=os.path.join(_DATA_DIR, "bulk_imports"),
+    RAG_UPLOAD_DIR=os.path.join(_DATA_DIR, "file_locker"),
+    RAG_LOCAL_EMBEDDER="hashing",
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
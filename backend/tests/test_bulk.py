@@ -0,0 +1,101 @@
+import asyncio
+import types
+import uuid
+
+import pytest
+
+from app.rag_agent.ingestion import bulk as bulk_module
+from app.rag_agent.ingestion.bulk import _CheckpointFile, iter_plan_batches, plan_bulk_import, read_checkpoint
+from app.rag_agent.ingestion.pipeline import IngestionError
+
+
+@pytest.fixture
+def job_id():
+    return uuid.uuid4().hex
+
+
+def write_manifest(tmp_path, entries):
+    path = tmp_path / "sources.jsonl"
+    path.write_text("\n".join(entries) + "\n")
+    return {"manifest_path": str(path)}
+
+
+def test_plan_keeps_valid_unique_sources(tmp_path, job_id):
+    manifest = write_manifest(tmp_path, [
+        '"gs://b/a.pdf"',
+        '{"path": "gs://b/b.pdf"}',
+        '{"uri": "https://docs.google.com/document/d/abc123/edit"}',
+        '"gs://b/a.pdf"',
+        "",
+        "not json",
+        '{"name": "c.pdf"}',
+        '"/local/c.pdf"',
+    ])
+    plan = plan_bulk_import(job_id, manifest, batch_size=2)
+
+    assert (plan["valid"], plan["duplicates"], plan["invalid"], plan["batches_total"]) == (3, 1, 3, 2)
+    assert [sample["error"] for sample in plan["invalid_samples"]] == ["Not valid JSON", "No path in entry", "Invalid format"]
+    assert list(iter_plan_batches(job_id, 2)) == [
+        (0, ["gs://b/a.pdf", "gs://b/b.pdf"]),
+        (1, ["https://drive.google.com/file/d/abc123/view"]),
+    ]
+
+
+def test_torn_checkpoint_lines_are_redone(job_id):
+    record = _CheckpointFile(job_id)
+    record.append(0, 2)
+    record.append(1, 2)
+    with open(record.path, "a") as f:
+        f.write('{"batch": 2, "files_')
+
+    assert read_checkpoint(job_id) == {0: 2, 1: 2}
+    # Entries written after the crash are not lost to the torn line
+    _CheckpointFile(job_id).append(3, 1)
+    assert read_checkpoint(job_id) == {0: 2, 1: 2, 3: 1}
+
+
+class BulkJob:
+    """Runs process_bulk_import_job the way the queue does, attempt by attempt."""
+
+    def __init__(self, monkeypatch, tmp_path, job_id, sources, failing):
+        self.imported = []
+        self.failing = failing
+        self.job = types.SimpleNamespace(
+            id=job_id,
+            payload={"corpus_name": "c", "batch_size": 2, "manifest": write_manifest(tmp_path, sources)},
+            stage=None,
+            result={},
+        )
+        monkeypatch.setattr(bulk_module, "ensure_corpus", lambda *a: False)
+        monkeypatch.setattr(bulk_module, "import_documents", self.import_documents)
+
+    def import_documents(self, corpus_name, paths, tool_context):
+        self.imported.append(paths)
+        failed = sum(1 for path in paths if path in self.failing)
+        return {"status": "success", "files_added": len(paths) - failed, "files_failed": failed}
+
+    def checkpoint(self, stage, result):
+        self.job.stage = stage
+        self.job.result.update(result)
+
+    def attempt(self):
+        return asyncio.run(bulk_module.process_bulk_import_job(self.job, self.checkpoint))
+
+
+def test_batches_with_failed_files_are_retried_and_done_ones_skipped(monkeypatch, tmp_path, job_id):
+    sources = [f'"gs://b/{i}.pdf"' for i in range(5)]
+    run = BulkJob(monkeypatch, tmp_path, job_id, sources, failing={"gs://b/3.pdf"})
+
+    with pytest.raises(IngestionError, match="1 batch"):
+        run.attempt()
+    assert sorted(run.imported) == [["gs://b/0.pdf", "gs://b/1.pdf"], ["gs://b/2.pdf", "gs://b/3.pdf"], ["gs://b/4.pdf"]]
+    assert read_checkpoint(job_id) == {0: 2, 2: 1}
+    assert [failure["batch"] for failure in run.job.result["failed_batches"]] == [1]
+
+    # The resumed job imports only the batch that had a failed file
+    run.imported.clear()
+    run.failing.clear()
+    result = run.attempt()
+    assert run.imported == [["gs://b/2.pdf", "gs://b/3.pdf"]]
+    assert result == {"batches_done": 3, "files_added": 5, "failed_batches": []}
+    assert read_checkpoint(job_id) == {0: 2, 1: 2, 2: 1}
@@ -0,0 +1,71 @@
+from app.rag_agent.models.chunking import chunk_id, iter_chunks, tokenize
+
+
+def words(n, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_windows_have_the_size_and_overlap_asked_for():
+    chunks = list(iter_chunks([words(25)], chunk_size=10, chunk_overlap=3))
+    assert [tokenize(chunk.text)[0] for chunk in chunks] == ["w0", "w7", "w14", "w21"]
+    # The last window only exists for the one token the others missed
+    assert [chunk.token_count for chunk in chunks] == [10, 10, 10, 4]
+    assert tokenize(chunks[0].text)[-3:] == tokenize(chunks[1].text)[:3]
+    assert [chunk.index for chunk in chunks] == [0, 1, 2, 3]
+
+
+def test_offsets_and_pages_point_into_the_joined_text():
+    pages = [words(6, "a") + "\n", words(6, "b") + "\n", words(6, "c")]
+    document = "".join(pages)
+    chunks = list(iter_chunks(pages, chunk_size=5, chunk_overlap=1))
+    for chunk in chunks:
+        assert document[chunk.start:chunk.end] == chunk.text
+    assert (chunks[0].page_start, chunks[0].page_end) == (1, 1)
+    spanning = [chunk for chunk in chunks if chunk.page_start != chunk.page_end]
+    assert spanning and all(chunk.page_end == chunk.page_start + 1 for chunk in spanning)
+    assert chunks[-1].page_end == 3
+
+
+def test_page_boundaries_do_not_change_the_chunks():
+    text = words(40)
+    split = text.split(" ")
+    pages = [" ".join(split[:13]) + " ", " ".join(split[13:31]) + " ", " ".join(split[31:])]
+    whole = [(c.text, c.start, c.end) for c in iter_chunks([text], chunk_size=8, chunk_overlap=2)]
+    paged = [(c.text, c.start, c.end) for c in iter_chunks(pages, chunk_size=8, chunk_overlap=2)]
+    assert paged == whole
+
+
+def test_tail_does_not_repeat_only_the_overlap():
+    # 10 tokens, step 7: a window at token 7 would only hold the 3 overlap tokens
+    chunks = list(iter_chunks([words(10)], chunk_size=7, chunk_overlap=3))
+    assert len(chunks) == 2
+    assert tokenize(chunks[-1].text)[-1] == "w9"
+
+
+def test_blank_pages_do_not_shift_the_text():
+    pages = ["one two three ", "\n" * 8, "", "four five six seven eight nine ten"]
+    document = "".join(pages)
+    chunks = list(iter_chunks(pages, chunk_size=3, chunk_overlap=1))
+    assert [chunk.text for chunk in chunks] == [
+        "one two three",
+        "three " + "\n" * 8 + "four five",
+        "five six seven",
+        "seven eight nine",
+        "nine ten",
+    ]
+    for chunk in chunks:
+        assert document[chunk.start:chunk.end] == chunk.text
+    assert (chunks[1].page_start, chunks[1].page_end) == (1, 4)
+
+
+def test_short_and_empty_documents():
+    assert [chunk.text for chunk in iter_chunks(["just a few words."], chunk_size=50, chunk_overlap=10)] == ["just a few words."]
+    assert list(iter_chunks(["", "   "], chunk_size=5, chunk_overlap=1)) == []
+
+
+def test_ids_depend_only_on_normalised_content():
+    assert chunk_id("alpha  beta\ngamma") == chunk_id("alpha beta gamma")
+    assert chunk_id("alpha beta gamma") != chunk_id("alpha beta delta")
+    first = list(iter_chunks(["intro text here. " + words(12)], chunk_size=4, chunk_overlap=0))
+    second = list(iter_chunks(["other preface text here, with more. " + words(12)], chunk_size=4, chunk_overlap=0))
+    assert first[-1].id == second[-1].id and first[-1].index != second[-1].index
@@ -0,0 +1,89 @@
+import threading
+import time
+import types
+
+from app.rag_agent.tools import import_batcher as import_batcher_module
+from app.rag_agent.tools.embedding_quota import EmbeddingQuota
+from app.rag_agent.tools.import_batcher import ImportBatcher
+
+
+def quota(**kwargs):
+    options = dict(requests_per_min=1000, min_share=50, interactive_reserve=0.2, small_import_paths=5)
+    options.update(kwargs)
+    return EmbeddingQuota(**options)
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_lone_import_gets_the_budget_less_the_reserve():
+    with quota().lease(25) as lease:
+        assert lease.requests_per_min == 800
+
+
+def test_interactive_import_may_use_the_reserve():
+    embedding = quota()
+    with embedding.lease(25) as bulk, embedding.lease(1) as interactive:
+        assert (bulk.requests_per_min, interactive.requests_per_min) == (800, 200)
+
+
+def test_shares_follow_imports_joining_and_leaving():
+    embedding = quota()
+    leases = {}
+    released = {"second": threading.Event()}
+
+    def second_import():
+        with embedding.lease(25) as lease:
+            leases["second"] = lease.requests_per_min
+            released["second"].wait(5)
+
+    with embedding.lease(25) as first:
+        assert first.requests_per_min == 800
+        joined = threading.Thread(target=second_import)
+        joined.start()
+        # The newcomer waits for the first import's next call...
+        wait_for(lambda: embedding.stats()["waiting_imports"] == 1)
+        # ...at which both get half of what bulk imports may use
+        assert embedding.renew(first) == 400
+        wait_for(lambda: "second" in leases)
+        assert leases["second"] == 400
+
+        released["second"].set()
+        joined.join(5)
+        # The share grows back once the other import left
+        assert embedding.renew(first) == 800
+    assert embedding.stats()["in_use_per_min"] == 0
+
+
+def import_with(monkeypatch, embedding, paths):
+    calls = []
+
+    def import_files(corpus, paths, transformation_config, max_embedding_requests_per_min):
+        calls.append((len(paths), max_embedding_requests_per_min))
+        return types.SimpleNamespace(
+            imported_rag_files_count=len(paths), failed_rag_files_count=0, skipped_rag_files_count=None
+        )
+
+    monkeypatch.setattr(import_batcher_module, "embedding_quota", embedding)
+    monkeypatch.setattr(import_batcher_module.rag, "import_files", import_files)
+    batcher = ImportBatcher(window_seconds=0, max_paths=25)
+    outcome = batcher.import_files("corpus", [f"gs://b/{i}.pdf" for i in range(paths)], 512, 100, 600)
+    assert outcome.imported_rag_files_count == paths and outcome.batch_calls == 1
+    return calls
+
+
+def test_a_batch_is_one_call_when_no_import_waits(monkeypatch):
+    embedding = quota(max_lease_paths=5)
+    assert import_with(monkeypatch, embedding, 12) == [(12, 600)]
+    assert embedding.stats()["grants"] == 1 and embedding.stats()["in_use_per_min"] == 0
+
+
+def test_a_batch_is_split_and_re_leased_while_imports_wait(monkeypatch):
+    embedding = quota(max_lease_paths=5)
+    monkeypatch.setattr(embedding, "has_waiting", lambda: True)
+    assert import_with(monkeypatch, embedding, 12) == [(5, 600), (5, 600), (2, 600)]
+    assert embedding.stats()["grants"] == 3 and embedding.stats()["in_use_per_min"] == 0
@@ -0,0 +1,74 @@
+import random
+
+import docx
+import pytest
+
+from app.rag_agent.models import document as document_module
+from app.rag_agent.models import extraction_cache as extraction_cache_module
+from app.rag_agent.models.document import iter_pages
+from app.rag_agent.models.extraction_cache import ExtractionCache
+
+PAGES = ["first page", "", "third page — ünïcode", "x" * 300_000]
+
+
+def test_pages_pass_through_and_are_stored(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("d1", "v1") is None
+    assert list(cache.put("d1", "v1", iter(PAGES))) == PAGES
+    assert list(cache.get("d1", "v1")) == PAGES
+    assert cache.get("d1", "v2") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["compression_ratio"] > 1
+
+
+def test_pages_are_decoded_across_read_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache_module, "_READ_BLOCK", 7)
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    pages = [f"page {i} " * (i + 1) for i in range(20)]
+    list(cache.put("d", "v", pages))
+    assert list(cache.get("d", "v")) == pages
+
+
+def test_partly_read_documents_are_not_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    passthrough = cache.put("d", "v", iter(PAGES))
+    next(passthrough)
+    passthrough.close()
+    assert cache.get("d", "v") is None
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(extraction_cache_module.time, "time", lambda: now[0])
+    # Random hex compresses to about half, so each entry is about 4 KB
+    rng = random.Random(0)
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=10_000)
+    for digest in ("a", "b"):
+        list(cache.put(digest, "v", [rng.randbytes(4000).hex()]))
+        now[0] += 1
+    cache.get("a", "v")
+    now[0] += 1
+    list(cache.put("c", "v", [rng.randbytes(4000).hex()]))
+    assert cache.get("b", "v") is None
+    assert cache.get("a", "v") is not None and cache.get("c", "v") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_documents_over_the_limit_are_not_stored(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=10)
+    assert list(cache.put("d", "v", PAGES)) == PAGES
+    assert cache.stats()["entries"] == 0
+
+
+def test_same_bytes_are_parsed_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_module, "extraction_cache", ExtractionCache(str(tmp_path / "cache.sqlite3")))
+    path = tmp_path / "notes.docx"
+    doc = docx.Document()
+    doc.add_paragraph("Compaction raises bearing capacity.")
+    doc.save(path)
+
+    assert list(iter_pages(str(path))) == ["Compaction raises bearing capacity."]
+    monkeypatch.setattr(document_module, "DocxDocument", lambda file: pytest.fail("parsed a cached document"))
+    assert list(iter_pages(str(path))) == ["Compaction raises bearing capacity."]
+    assert document_module.extraction_cache.stats()["hits"] == 1
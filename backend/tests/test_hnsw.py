@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+from app.rag_agent.retrieval import local as local_module
+from app.rag_agent.retrieval.embedders import normalize_rows
+from app.rag_agent.retrieval.hnsw import HNSWIndex
+from app.rag_agent.retrieval.local import HNSW_FILE, HNSW_LOCK, LocalCorpusIndex
+from app.rag_agent.retrieval.store import ChunkStore
+
+DIM = 32
+
+
+def clustered(n, seed=0, clusters=16):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIM))
+    return normalize_rows(centers[rng.integers(0, clusters, size=n)] + 0.6 * rng.normal(size=(n, DIM)))
+
+
+def exact_top_k(data, query, k):
+    return set(np.argsort(1.0 - data @ query)[:k].tolist())
+
+
+def chunks_for(n, prefix="doc"):
+    return [{"source_uri": f"gs://b/{prefix}-{i % 5}.pdf", "source_name": f"{prefix}-{i % 5}.pdf", "text": f"{prefix} chunk {i}"} for i in range(n)]
+
+
+def test_recall_against_exact_search():
+    data = clustered(1500)
+    queries = clustered(50, seed=1)
+    index = HNSWIndex(DIM, m=8, ef_construction=100, seed=0)
+    index.add(data)
+
+    recall = np.mean([
+        len(set(index.search(q, 10, ef=64)[0].tolist()) & exact_top_k(data, q, 10)) / 10
+        for q in queries
+    ])
+    assert recall >= 0.95
+
+
+def test_deleted_labels_are_never_returned():
+    data = clustered(300)
+    index = HNSWIndex(DIM, m=8, seed=0)
+    index.add(data)
+    nearest = int(index.search(data[7], 1)[0][0])
+    index.delete(nearest)
+
+    labels, _ = index.search(data[7], 10)
+    assert nearest not in labels.tolist()
+    assert len(index) == 299
+
+
+def test_saved_graph_loads_with_identical_results(tmp_path):
+    data = clustered(800)
+    index = HNSWIndex(DIM, m=8, seed=0)
+    index.add(data)
+    path = str(tmp_path / "graph.npz")
+    index.save(path)
+
+    loaded = HNSWIndex.load(path, data.__getitem__, len(data))
+    assert loaded.size == index.size
+    for query in clustered(20, seed=2):
+        expected, _ = index.search(query, 5)
+        found, _ = loaded.search(query, 5)
+        assert found.tolist() == expected.tolist()
+
+
+def test_load_rejects_too_few_vectors(tmp_path):
+    index = HNSWIndex(DIM, seed=0)
+    index.add(clustered(50))
+    path = str(tmp_path / "graph.npz")
+    index.save(path)
+    with pytest.raises(ValueError):
+        HNSWIndex.load(path, clustered(10).__getitem__, 10)
+
+
+def test_corpus_graph_is_persisted_and_reused_by_other_workers(tmp_path):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    data = clustered(400)
+    store.append(chunks_for(400), data)
+
+    writer = LocalCorpusIndex(store, index_type="hnsw", background_build=False)
+    writer.search(data[0], 5)
+    assert writer.hnsw is not None and writer.hnsw.size == 400
+    assert (tmp_path / "gen-0" / HNSW_FILE).exists()
+    # The graph scores the store's rows rather than a copy of them
+    assert writer.hnsw._vectors is None
+
+    # Another worker opens the same store and loads the graph instead of building it
+    reader = LocalCorpusIndex(ChunkStore(str(tmp_path)), index_type="hnsw", background_build=False)
+    with reader.store.try_lock(HNSW_LOCK):
+        reader.search(data[0], 5)
+    assert reader.hnsw is not None and reader.hnsw.size == 400 and reader.hnsw._vectors is None
+    assert reader.hnsw.search(data[3], 5)[0].tolist() == writer.hnsw.search(data[3], 5)[0].tolist()
+
+
+def test_graph_over_a_quantized_store(tmp_path):
+    store = ChunkStore(str(tmp_path), dim=DIM, dtype="int8")
+    data = clustered(600)
+    store.append(chunks_for(600), data)
+    index = LocalCorpusIndex(store, index_type="hnsw", background_build=False)
+
+    recall = np.mean([
+        len({result["text"] for result in index.search(q, 10, distance_threshold=2.0)}
+            & {f"doc chunk {i}" for i in exact_top_k(data, q, 10)}) / 10
+        for q in clustered(30, seed=3)
+    ])
+    assert index.hnsw.size == 600 and recall >= 0.9
+
+
+def test_rows_missing_from_the_graph_are_searched_exactly(tmp_path, monkeypatch):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    data = clustered(300)
+    store.append(chunks_for(200), data[:200])
+    index = LocalCorpusIndex(store, index_type="hnsw", background_build=False)
+    index.search(data[0], 5)
+    assert index.hnsw.size == 200
+
+    # Another worker holds the build lock, so the graph cannot catch up
+    monkeypatch.setattr(local_module, "HNSW_POLL_SECONDS", 0.0)
+    with ChunkStore(str(tmp_path)).try_lock(HNSW_LOCK) as owner:
+        assert owner
+        store.append(chunks_for(100, prefix="late"), data[200:])
+        results = index.search(data[250], 1, distance_threshold=2.0)
+        assert index.hnsw.size == 200
+    assert results[0]["text"] == "late chunk 50"
+    assert results[0]["score"] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_searches_never_insert_into_the_graph(tmp_path, monkeypatch):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    data = clustered(200)
+    store.append(chunks_for(100), data[:100])
+    index = LocalCorpusIndex(store, index_type="hnsw", background_build=False)
+    index.search(data[0], 5)
+
+    calls = []
+    monkeypatch.setattr(index, "_start_hnsw_build", lambda: calls.append(1))
+    monkeypatch.setattr(index.hnsw, "add", lambda *a: pytest.fail("search inserted into the graph"))
+    store.append(chunks_for(100, prefix="new"), data[100:])
+    index.search(data[150], 5)
+    assert calls
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from app.rag_agent.retrieval.base import RetrievalBackend
+from app.rag_agent.retrieval.bm25 import BM25Index, identifier_tokens, tokenize
+from app.rag_agent.retrieval.embedders import HashingEmbedder
+from app.rag_agent.retrieval.hybrid import HybridRetrievalBackend, reciprocal_rank_fusion
+from app.rag_agent.retrieval.local import LocalCorpusIndex, LocalRetrievalBackend
+
+CORPUS = "projects/p/locations/l/ragCorpora/1"
+
+TEXTS = [
+    "The STM32L476RG has three USART peripherals and one LPUART.",
+    "Set GPIOA_MODER bits to configure PA5 as an output for the user LED.",
+    "Excavation and grading prepare the site before foundation work begins.",
+    "Soil compaction raises the bearing capacity of the graded site.",
+]
+
+
+class NoEmbedder(HashingEmbedder):
+    """Fails the test if anything is embedded through it."""
+
+    def embed_query(self, text):
+        pytest.fail(f"unexpected local query embedding for {text!r}")
+
+
+class StaticDense(RetrievalBackend):
+    """A dense backend that returns fixed contexts, like Vertex AI would."""
+
+    name = "static"
+
+    def __init__(self, results):
+        self.results = results
+
+    def retrieve(self, corpus_resource_name, query, top_k=10, distance_threshold=0.5):
+        return self.results[:top_k]
+
+    def has_corpus(self, corpus_resource_name):
+        return True
+
+
+def make_local(tmp_path, embedder=None):
+    backend = LocalRetrievalBackend(embedder=HashingEmbedder(64), store_dir=str(tmp_path))
+    backend.add_chunks(CORPUS, [
+        {"source_uri": f"gs://b/doc{i}.pdf", "source_name": f"doc{i}.pdf", "text": text}
+        for i, text in enumerate(TEXTS)
+    ])
+    # Lexical index built synchronously, as hybrid retrieval configures it
+    store = backend.get_corpus(CORPUS).store
+    backend._corpora[CORPUS] = LocalCorpusIndex(store, lexical=True, background_build=False)
+    backend.get_corpus(CORPUS)._sync()
+    if embedder is not None:
+        backend._embedder = embedder
+    return backend
+
+
+def test_bm25_ranks_matching_rows_and_honours_filters():
+    index = BM25Index()
+    index.add(TEXTS)
+    rows, scores = index.search(tokenize("site grading"), 4)
+    assert set(rows.tolist()) == {2, 3}
+    assert scores[0] >= scores[-1] > 0
+
+    rows, _ = index.search(tokenize("graded site"), 4, require_all=True)
+    assert rows.tolist() == [3]
+
+    live = np.array([True, True, True, False])
+    rows, _ = index.search(tokenize("site"), 4, live=live)
+    assert rows.tolist() == [2]
+
+
+def test_identifier_queries_are_detected():
+    assert identifier_tokens("STM32L476RG") == ["stm32l476rg"]
+    assert identifier_tokens("GPIOA_MODER PA5") == ["gpioa_moder", "pa5"]
+    assert identifier_tokens("how is the site graded") is None
+
+
+def test_fusion_merges_the_same_passage_across_backends():
+    vertex = [{"source_uri": "gs://b/doc2.pdf", "text": "Excavation  and grading\nprepare the site.", "score": 0.2}]
+    local = [
+        {"source_uri": "gs://b/doc2.pdf", "text": "Excavation and grading prepare the site.", "score": 0.3},
+        {"source_uri": "gs://b/doc3.pdf", "text": "Soil compaction.", "score": 0.4},
+    ]
+    fused = reciprocal_rank_fusion([vertex, local], top_k=5, k=60)
+    assert len(fused) == 2
+    assert fused[0]["score"] == 0.2
+    assert fused[0]["fusion_score"] == pytest.approx(2 / 61)
+
+
+def test_identifier_query_is_answered_without_embedding(tmp_path):
+    local = make_local(tmp_path, embedder=NoEmbedder(64))
+    hybrid = HybridRetrievalBackend(StaticDense([]), local)
+    results = hybrid.retrieve(CORPUS, "GPIOA_MODER PA5", top_k=3)
+    assert [r["text"] for r in results] == [TEXTS[1]]
+    assert results[0]["score"] == 0.0
+
+
+def test_vertex_dense_path_makes_no_local_embedding(tmp_path):
+    local = make_local(tmp_path, embedder=NoEmbedder(64))
+    dense = StaticDense([
+        {"source_uri": "gs://b/doc3.pdf", "source_name": "doc3.pdf", "text": TEXTS[3], "score": 0.1},
+    ])
+    hybrid = HybridRetrievalBackend(dense, local)
+    results = hybrid.retrieve(CORPUS, "how is the site graded", top_k=3)
+
+    texts = [r["text"] for r in results]
+    assert texts.count(TEXTS[3]) == 1
+    assert results[0]["text"] == TEXTS[3]
+    assert results[0]["score"] == 0.1
+    lexical_only = [r for r in results if r["text"] == TEXTS[2]]
+    assert lexical_only and lexical_only[0]["score"] is None
+
+
+def test_lexical_index_is_built_at_index_time(tmp_path, monkeypatch):
+    local = make_local(tmp_path)
+    index = local.get_corpus(CORPUS)
+    assert index.bm25.size == len(TEXTS)
+
+    local.add_chunks(CORPUS, [{"source_uri": "gs://b/new.pdf", "source_name": "new.pdf", "text": "LPUART wake-up from Stop mode"}])
+    assert index.bm25.size == len(TEXTS) + 1
+
+    monkeypatch.setattr(BM25Index, "add", lambda *a: pytest.fail("query rebuilt the BM25 index"))
+    rows, _ = index.lexical_search(["lpuart"], 5)
+    assert set(rows.tolist()) == {0, len(TEXTS)}
+
+
+def test_hybrid_falls_back_to_dense_while_bm25_builds(tmp_path):
+    local = make_local(tmp_path)
+    index = local.get_corpus(CORPUS)
+    index.bm25, index._bm25_generation = None, None
+    index._bm25_building = True  # A build is already running
+    dense = StaticDense([{"source_uri": "gs://b/doc0.pdf", "text": TEXTS[0], "score": 0.1}])
+
+    results = HybridRetrievalBackend(dense, local).retrieve(CORPUS, "peripherals on the board", top_k=3)
+    assert results == dense.results
@@ -0,0 +1,19 @@
+from app.rag_agent.retrieval.embedders import HashingEmbedder
+from app.rag_agent.retrieval.ingest import index_documents
+from app.rag_agent.retrieval.local import LocalRetrievalBackend
+
+CORPUS = "projects/p/locations/l/ragCorpora/3"
+
+
+def test_indexing_a_source_again_replaces_its_chunks(tmp_path):
+    backend = LocalRetrievalBackend(embedder=HashingEmbedder(64), store_dir=str(tmp_path / "index"))
+    path = tmp_path / "site.txt"
+    path.write_text(" ".join(f"Section {i}: compaction raises the bearing capacity." for i in range(300)))
+    other = tmp_path / "other.txt"
+    other.write_text("Excavation and grading prepare the site.")
+
+    first = index_documents(backend, CORPUS, [("gs://b/site.txt", str(path)), ("gs://b/other.txt", str(other))])
+    again = index_documents(backend, CORPUS, [("gs://b/site.txt", str(path))])
+
+    assert first["chunks"] > 2 and again["chunks"] == first["chunks"] - 1
+    assert len(backend.get_corpus(CORPUS)) == first["chunks"]
@@ -0,0 +1,117 @@
+import asyncio
+import sqlite3
+
+from app.rag_agent.ingestion import jobs as jobs_module
+from app.rag_agent.ingestion.jobs import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    JobQueue,
+    JobStore,
+)
+
+
+def test_claim_leases_the_job_once(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first, second = JobStore(path), JobStore(path)
+    job = first.create("upload", {"file": "a.pdf"})
+
+    claimed = first.claim(job.id)
+    assert claimed.status == JOB_RUNNING and claimed.attempts == 1
+    assert claimed.owner == first.owner and claimed.lease_expires_at > claimed.updated_at
+    assert second.claim(job.id) is None
+
+
+def test_recover_leaves_jobs_of_live_workers_alone(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    worker = JobStore(path)
+    running = worker.create("upload", {})
+    queued = worker.create("upload", {})
+    worker.claim(running.id)
+
+    # A second worker starting up, e.g. during a rolling restart
+    assert JobStore(path).recover() == [queued.id]
+    assert worker.get(running.id).status == JOB_RUNNING
+
+
+def test_jobs_with_expired_leases_are_taken_over(tmp_path, monkeypatch):
+    path = str(tmp_path / "jobs.sqlite3")
+    dead = JobStore(path, lease_seconds=60)
+    job = dead.create("upload", {})
+    dead.claim(job.id)
+
+    now = [jobs_module.time.time() + 61]
+    monkeypatch.setattr(jobs_module.time, "time", lambda: now[0])
+    survivor = JobStore(path)
+    assert survivor.recover() == [job.id]
+    assert survivor.claim(job.id).attempts == 2
+
+    # The old owner can no longer renew or finish the job
+    assert dead.renew([job.id]) == []
+    dead.finish(job.id, JOB_FAILED, error="late")
+    assert survivor.get(job.id).status == JOB_RUNNING
+    survivor.finish(job.id, JOB_SUCCEEDED, {"ok": True})
+    finished = survivor.get(job.id)
+    assert finished.status == JOB_SUCCEEDED and finished.result == {"ok": True}
+    assert finished.owner is None
+
+
+def test_renewal_keeps_the_lease_alive(tmp_path, monkeypatch):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path, lease_seconds=60)
+    job = store.create("upload", {})
+    store.claim(job.id)
+
+    now = [jobs_module.time.time() + 50]
+    monkeypatch.setattr(jobs_module.time, "time", lambda: now[0])
+    assert store.renew([job.id]) == [job.id]
+    now[0] += 50
+    assert store.reclaim_expired() == []
+
+
+def test_running_rows_from_before_leases_are_recovered(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+        "stage TEXT, payload TEXT NOT NULL, result TEXT NOT NULL, error TEXT, "
+        "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO jobs VALUES ('old', 'upload', 'running', NULL, '{}', '{}', NULL, 1, 1, 1)")
+    conn.close()
+
+    store = JobStore(path)
+    assert store.recover() == ["old"]
+    assert store.get("old").status == JOB_QUEUED
+
+
+def test_queue_runs_jobs_and_retries_failures(tmp_path):
+    async def scenario():
+        queue = JobQueue(
+            JobStore(str(tmp_path / "jobs.sqlite3")),
+            workers=2, max_attempts=2, retry_backoff_seconds=0.01, heartbeat_seconds=0.01,
+        )
+        calls = []
+
+        async def handler(job, checkpoint):
+            calls.append(job.attempts)
+            checkpoint("import", {"seen": job.attempts})
+            if job.attempts == 1:
+                raise RuntimeError("transient")
+            return {"done": True}
+
+        queue.register("upload", handler)
+        await queue.start()
+        job = queue.submit("upload", {})
+        for _ in range(200):
+            if queue.store.get(job.id).status == JOB_SUCCEEDED:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return calls, queue.store.get(job.id)
+
+    calls, job = asyncio.run(scenario())
+    assert calls == [1, 2]
+    assert job.status == JOB_SUCCEEDED
+    assert job.result == {"seen": 2, "done": True}
@@ -0,0 +1,138 @@
+import importlib
+import os
+import types
+
+import numpy as np
+import pytest
+
+from app.rag_agent.retrieval import ingest as ingest_module
+from app.rag_agent.retrieval import near_duplicates as near_duplicates_module
+from app.rag_agent.retrieval.near_duplicates import MinHasher, NearDuplicateIndex, lsh_bands
+
+add_data_module = importlib.import_module("app.rag_agent.tools.add_data")
+
+CORPUS = "projects/p/locations/l/ragCorpora/25"
+
+
+def words(n, prefix):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def edited(text, every):
+    """The text with every `every`-th word replaced."""
+    return " ".join(f"x{i}" if i % every == 0 else word for i, word in enumerate(text.split(" ")))
+
+
+@pytest.fixture
+def index(tmp_path):
+    return NearDuplicateIndex(str(tmp_path / "near_duplicates.sqlite3"), threshold=0.85, num_perm=128)
+
+
+def test_signatures_estimate_jaccard_similarity():
+    hasher = MinHasher(128)
+    text = words(300, "w")
+    same, close, other = hasher.signatures([text, edited(text, 100), words(300, "v")])
+    base = hasher.signature(text)
+    assert np.array_equal(base, same)
+    # One word in 100 changed keeps about 94% of the 3-shingles
+    assert abs(np.mean(base == close) - 0.94) < 0.08
+    assert np.mean(base == other) < 0.05
+    # Seeded permutations: signatures can be compared across restarts
+    assert np.array_equal(MinHasher(128).signature(text), base)
+
+
+def test_lsh_bands_turn_at_the_threshold():
+    bands, rows = lsh_bands(128, 0.85)
+    assert bands * rows <= 128
+    assert (1.0 / bands) ** (1.0 / rows) <= 0.85
+    # One more row per band would move the curve above the threshold
+    assert (1.0 / (128 // (rows + 1))) ** (1.0 / (rows + 1)) > 0.85
+
+
+def test_near_duplicates_are_found_in_the_corpus(index):
+    text = words(300, "w")
+    signatures, matches = index.check(CORPUS, [text])
+    assert matches == [None]
+    index.add(CORPUS, "gs://b/a.txt", ["a0"], signatures)
+
+    _, matches = index.check(CORPUS, [edited(text, 100), words(300, "v")])
+    assert matches[0]["source_uri"] == "gs://b/a.txt" and matches[0]["chunk_id"] == "a0"
+    assert matches[0]["similarity"] >= 0.85
+    assert matches[1] is None
+    # Other corpora are separate
+    assert index.check("other", [text])[1] == [None]
+
+
+def test_repeats_within_a_document_and_excluded_sources(index):
+    text = words(300, "w")
+    index.add(CORPUS, "gs://b/old.txt", ["o0"], index.check(CORPUS, [text])[0])
+
+    _, matches = index.check(CORPUS, [text, words(300, "v"), words(300, "v")], exclude_sources=["gs://b/old.txt"])
+    assert matches[0] is None and matches[1] is None
+    assert matches[2] == {"source_uri": None, "chunk_index": 1, "similarity": 1.0}
+
+
+def test_removed_sources_and_corpora_are_not_matched(index):
+    text = words(300, "w")
+    signatures = index.check(CORPUS, [text])[0]
+    index.add(CORPUS, "gs://b/a.txt", ["a0"], signatures)
+    index.add(CORPUS, "gs://b/b.txt", ["b0"], signatures)
+
+    assert index.remove_source(CORPUS, "gs://b/a.txt") == 1
+    assert index.check(CORPUS, [text])[1][0]["source_uri"] == "gs://b/b.txt"
+    assert index.remove_corpus(CORPUS) == 1
+    assert index.check(CORPUS, [text])[1] == [None]
+    assert index.stats()["chunks"] == 0
+
+
+def test_uploads_are_screened_once_and_recorded_once(monkeypatch, index):
+    objects = {
+        "gs://b/a.txt": words(512, "a"),
+        # Its first chunk repeats a.txt's only chunk
+        "gs://b/b.txt": words(512, "a") + " " + words(600, "b"),
+    }
+    checks = []
+    indexed = {}
+
+    def check(corpus, texts, exclude_sources=()):
+        checks.append(len(texts))
+        return NearDuplicateIndex.check(index, corpus, texts, exclude_sources)
+
+    def download(uri, directory):
+        path = os.path.join(directory, uri.rsplit("/", 1)[-1])
+        with open(path, "w") as f:
+            f.write(objects[uri])
+        return path
+
+    def add_chunks(corpus, chunks, known_embeddings):
+        indexed[chunks[0]["source_uri"]] = [chunk["id"] for chunk in chunks]
+        return len(chunks)
+
+    monkeypatch.setattr(index, "check", check)
+    for module in (near_duplicates_module, add_data_module, ingest_module):
+        monkeypatch.setattr(module, "NEAR_DUP_MODE", "drop")
+    monkeypatch.setattr(add_data_module, "near_duplicate_index", index)
+    monkeypatch.setattr(add_data_module, "check_corpus_exists", lambda *a: True)
+    monkeypatch.setattr(add_data_module, "get_corpus_resource_name", lambda name: CORPUS)
+    monkeypatch.setattr(add_data_module, "local_index_enabled", lambda: True)
+    monkeypatch.setattr(add_data_module, "download_gcs_object", download)
+    monkeypatch.setattr(ingest_module, "download_gcs_object", lambda *a: pytest.fail("downloaded twice"))
+    monkeypatch.setattr(add_data_module, "import_batcher", types.SimpleNamespace(
+        import_files=lambda corpus, paths, **kwargs: types.SimpleNamespace(
+            imported_rag_files_count=len(paths), failed_rag_files_count=0, batch_paths=len(paths), batch_calls=1,
+        ),
+    ))
+    monkeypatch.setattr(add_data_module, "get_local_backend", lambda: types.SimpleNamespace(
+        add_chunks=add_chunks, source_embeddings=lambda corpus, uri: {}, delete_source=lambda corpus, uri: 0,
+    ))
+
+    for uri in objects:
+        result = add_data_module.add_data("c", [uri], types.SimpleNamespace(state={}))
+        assert result["status"] == "success", result["message"]
+
+    # b.txt was checked once, by add_data, and its repeated chunk dropped
+    assert checks == [1, 3]
+    assert result["local_index"]["near_duplicates_dropped"] == 1
+    assert len(indexed["gs://b/b.txt"]) == 2
+    # Only the chunks the local index kept were added to the LSH tables
+    assert index.stats()["chunks"] == 1 + 2
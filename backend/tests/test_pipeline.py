@@ -0,0 +1,25 @@
+import pytest
+
+from app.rag_agent.ingestion import pipeline
+from app.rag_agent.ingestion.pipeline import IngestionError, verify_documents
+
+
+def corpus_info(files):
+    return lambda corpus_name, tool_context: {"status": "success", "file_count": len(files), "files": files}
+
+
+def test_files_are_verified_by_exact_source_uri(monkeypatch):
+    monkeypatch.setattr(pipeline, "get_corpus_info", corpus_info([
+        {"file_id": "1", "display_name": "report.pdf", "source_uri": "gs://b/uploads/old/report.pdf"},
+        {"file_id": "2", "display_name": "spec.pdf", "source_uri": "gs://b/uploads/new/spec.pdf"},
+    ]))
+    result = verify_documents("c", ["gs://b/uploads/new/spec.pdf", "gs://b/uploads/new/report.pdf"], None)
+    # A same-named file from an earlier upload does not verify the new one
+    assert result["file_ids"] == {"gs://b/uploads/new/spec.pdf": "2"}
+    assert result["missing"] == ["gs://b/uploads/new/report.pdf"]
+
+
+def test_unreadable_corpus_fails_verification(monkeypatch):
+    monkeypatch.setattr(pipeline, "get_corpus_info", lambda *a: {"status": "error", "message": "gone"})
+    with pytest.raises(IngestionError, match="gone"):
+        verify_documents("c", ["gs://b/a.pdf"], None)
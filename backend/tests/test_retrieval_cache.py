@@ -0,0 +1,90 @@
+import importlib
+import types
+
+from app.rag_agent.retrieval import cache as cache_module
+from app.rag_agent.retrieval.cache import RetrievalCache, normalize_query
+from app.rag_agent.tools.corpus_registry import corpus_registry
+
+delete_document_module = importlib.import_module("app.rag_agent.tools.delete_document")
+
+CORPUS = "projects/p/locations/l/ragCorpora/7"
+RESULTS = [{"source_uri": "gs://b/a.pdf", "text": "alpha", "score": 0.1}]
+
+
+def test_queries_are_normalised():
+    assert normalize_query("  What is   GPIO?  ") == "what is gpio"
+
+
+def test_hit_until_the_version_changes():
+    cache = RetrievalCache(max_entries=10)
+    cache.put(CORPUS, "What is GPIO?", 5, 0.5, 1, RESULTS)
+    assert cache.get(CORPUS, "what is gpio", 5, 0.5, 1) == RESULTS
+    assert cache.get(CORPUS, "what is gpio", 5, 0.5, 2) is None
+    # A stale entry is dropped, not served again at the old version
+    assert cache.get(CORPUS, "what is gpio", 5, 0.5, 1) is None
+    assert cache.stats()["stale"] == 1
+
+
+def test_returned_results_are_copies():
+    cache = RetrievalCache(max_entries=10)
+    cache.put(CORPUS, "q", 5, 0.5, 0, RESULTS)
+    cache.get(CORPUS, "q", 5, 0.5, 0)[0]["text"] = "changed"
+    assert cache.get(CORPUS, "q", 5, 0.5, 0) == RESULTS
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = RetrievalCache(max_entries=10, ttl_seconds=5)
+    cache.put(CORPUS, "q", 5, 0.5, 0, RESULTS)
+    now[0] += 6
+    assert cache.get(CORPUS, "q", 5, 0.5, 0) is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = RetrievalCache(max_entries=2)
+    cache.put(CORPUS, "a", 5, 0.5, 0, RESULTS)
+    cache.put(CORPUS, "b", 5, 0.5, 0, RESULTS)
+    cache.get(CORPUS, "a", 5, 0.5, 0)
+    cache.put(CORPUS, "c", 5, 0.5, 0, RESULTS)
+    assert cache.get(CORPUS, "b", 5, 0.5, 0) is None
+    assert cache.get(CORPUS, "a", 5, 0.5, 0) == RESULTS
+
+
+def test_invalidate_drops_one_corpus():
+    cache = RetrievalCache(max_entries=10)
+    cache.put(CORPUS, "q", 5, 0.5, 0, RESULTS)
+    cache.put("other", "q", 5, 0.5, 0, RESULTS)
+    assert cache.invalidate(CORPUS) == 1
+    assert cache.get("other", "q", 5, 0.5, 0) == RESULTS
+
+
+def test_delete_bumps_the_version_after_the_local_index_changed(monkeypatch):
+    seen = {}
+
+    class LocalBackend:
+        def delete_source(self, corpus, source, field="source_uri"):
+            seen["version_during_local_delete"] = corpus_registry.version(corpus)
+
+    fake_rag = types.SimpleNamespace(
+        get_file=lambda path: types.SimpleNamespace(source_uri="gs://b/a.pdf", display_name="a.pdf"),
+        delete_file=lambda path: seen.setdefault("version_during_vertex_delete", corpus_registry.version(CORPUS)),
+    )
+    monkeypatch.setattr(delete_document_module, "rag", fake_rag)
+    monkeypatch.setattr(delete_document_module, "check_corpus_exists", lambda *a: True)
+    monkeypatch.setattr(delete_document_module, "get_corpus_resource_name", lambda name: CORPUS)
+    monkeypatch.setattr(delete_document_module, "local_index_enabled", lambda: True)
+    monkeypatch.setattr(delete_document_module, "get_local_backend", lambda: LocalBackend())
+
+    before = corpus_registry.version(CORPUS)
+    result = delete_document_module.delete_document("c", "1", types.SimpleNamespace(state={}))
+    assert result["status"] == "success"
+    assert seen == {"version_during_vertex_delete": before, "version_during_local_delete": before}
+    assert corpus_registry.version(CORPUS) == before + 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = RetrievalCache(max_entries=0)
+    cache.put(CORPUS, "q", 5, 0.5, 0, RESULTS)
+    assert cache.get(CORPUS, "q", 5, 0.5, 0) is None
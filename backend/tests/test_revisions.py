@@ -0,0 +1,146 @@
+import importlib
+import os
+import types
+
+import pytest
+
+from app.rag_agent.tools.add_data import revision_key
+from app.rag_agent.tools.chunk_index import chunk_index
+
+add_data_module = importlib.import_module("app.rag_agent.tools.add_data")
+
+CORPUS = "projects/p/locations/l/ragCorpora/24"
+BODY = " ".join(f"Section {i}: compaction raises the bearing capacity of the graded site." for i in range(600))
+
+
+def upload_uri(n, name="report.txt"):
+    return f"gs://b/uploads/{n:08d}-0000-0000-0000-000000000000/{name}"
+
+
+class Corpus:
+    """Fakes for GCS, Vertex AI and the local index behind add_data."""
+
+    def __init__(self, monkeypatch, local_index=True):
+        self.objects = {}
+        self.rag_files = []
+        self.deleted = []
+        self.indexed = []
+        self.failing = set()
+        monkeypatch.setattr(add_data_module, "INCREMENTAL_REINGEST_ENABLED", True)
+        monkeypatch.setattr(add_data_module, "near_dup_enabled", lambda: False)
+        monkeypatch.setattr(add_data_module, "check_corpus_exists", lambda *a: True)
+        monkeypatch.setattr(add_data_module, "get_corpus_resource_name", lambda name: CORPUS)
+        monkeypatch.setattr(add_data_module, "local_index_enabled", lambda: local_index)
+        monkeypatch.setattr(add_data_module, "download_gcs_object", self.download)
+        monkeypatch.setattr(add_data_module, "import_batcher", types.SimpleNamespace(import_files=self.import_files))
+        monkeypatch.setattr(add_data_module, "rag", types.SimpleNamespace(
+            list_files=lambda corpus: list(self.rag_files), delete_file=self.delete_file,
+        ))
+        monkeypatch.setattr(add_data_module, "delete_document", self.delete_document)
+        monkeypatch.setattr(add_data_module, "get_local_backend", lambda: types.SimpleNamespace(
+            source_embeddings=lambda corpus, uri: {},
+        ))
+        monkeypatch.setattr(add_data_module, "index_documents", self.index_documents)
+
+    def download(self, uri, directory):
+        path = os.path.join(directory, uri.rsplit("/", 1)[-1])
+        with open(path, "w") as f:
+            f.write(self.objects[uri])
+        return path
+
+    def import_files(self, corpus, paths, **kwargs):
+        imported = [path for path in paths if path not in self.failing]
+        for path in imported:
+            self.rag_files.append(types.SimpleNamespace(name=f"{corpus}/ragFiles/{len(self.rag_files)}", source_uri=path))
+        return types.SimpleNamespace(
+            imported_rag_files_count=len(imported), failed_rag_files_count=len(paths) - len(imported),
+            batch_paths=len(paths), batch_calls=1,
+        )
+
+    def delete_file(self, name):
+        (rag_file,) = [f for f in self.rag_files if f.name == name]
+        self.rag_files.remove(rag_file)
+        self.deleted.append(rag_file.source_uri)
+
+    def delete_document(self, corpus, file_id, tool_context):
+        (rag_file,) = [f for f in self.rag_files if f.name.endswith(f"/{file_id}")]
+        self.rag_files.remove(rag_file)
+        self.deleted.append(rag_file.source_uri)
+        chunk_index.remove_source(corpus, rag_file.source_uri)
+        return {"status": "success"}
+
+    def index_documents(self, backend, corpus, sources, known_embeddings, near_duplicates=None):
+        self.indexed.extend(uri for uri, _ in sources)
+        return {"documents": len(sources)}
+
+    def add(self, uri, text, document_id=None):
+        self.objects[uri] = text
+        result = add_data_module.add_data(
+            "c", [uri], types.SimpleNamespace(state={}),
+            document_ids=[document_id] if document_id else None,
+        )
+        assert result["status"] == "success", result["message"]
+        return result
+
+
+def test_revision_keys():
+    assert revision_key(upload_uri(1), "spec-7") == "spec-7"
+    # Every upload has a fresh path, so without an id it has no history
+    assert revision_key(upload_uri(1)) is None
+    assert revision_key("gs://b/manuals/spec.pdf") == "gs://b/manuals/spec.pdf"
+    assert revision_key("https://drive.google.com/file/d/abc/view") is None
+
+
+def test_same_named_uploads_never_replace_each_other(monkeypatch):
+    corpus = Corpus(monkeypatch)
+    corpus.add(upload_uri(1), BODY)
+    result = corpus.add(upload_uri(2), BODY + " A different document.")
+    assert corpus.deleted == []
+    assert result["incremental"]["revisions"] == []
+    assert [f.source_uri for f in corpus.rag_files] == [upload_uri(1), upload_uri(2)]
+
+
+def test_revision_with_a_document_id_replaces_the_previous_one(monkeypatch):
+    corpus = Corpus(monkeypatch)
+    corpus.add(upload_uri(1), BODY, document_id="site-report")
+    corpus.add(upload_uri(2, "other.txt"), BODY, document_id="other")
+
+    result = corpus.add(upload_uri(3), BODY + " Revised appendix.", document_id="site-report")
+    assert corpus.deleted == [upload_uri(1)]
+    (revision,) = result["incremental"]["revisions"]
+    assert revision["previous_uri"] == upload_uri(1) and revision["reused"] > 0
+    assert chunk_index.get(CORPUS, "site-report")["source_uri"] == upload_uri(3)
+
+    # An unchanged revision is not imported again
+    unchanged = corpus.add(upload_uri(4), BODY + " Revised appendix.", document_id="site-report")
+    assert unchanged["files_added"] == 0 and upload_uri(4) not in corpus.indexed
+
+
+def test_vertex_only_imports_are_not_downloaded_or_chunked(monkeypatch):
+    corpus = Corpus(monkeypatch, local_index=False)
+    monkeypatch.setattr(add_data_module, "download_gcs_object", lambda *a: pytest.fail("downloaded for planning"))
+    corpus.objects["gs://b/manuals/spec.txt"] = BODY
+    result = add_data_module.add_data("c", ["gs://b/manuals/spec.txt"], types.SimpleNamespace(state={}), document_ids=["spec"])
+    assert result["files_added"] == 1
+    assert chunk_index.get(CORPUS, "spec") is None
+
+
+def test_failed_import_of_a_same_path_revision_keeps_the_previous_one(monkeypatch):
+    corpus = Corpus(monkeypatch)
+    uri = "gs://b/manuals/spec.txt"
+    corpus.add(uri, BODY)
+    previous = chunk_index.get(CORPUS, uri)
+
+    corpus.failing.add(uri)
+    corpus.objects[uri] = BODY + " Revised appendix."
+    result = add_data_module.add_data("c", [uri], types.SimpleNamespace(state={}))
+    assert result["files_failed"] == 1
+    # Vertex AI's old file had to go, but nothing else did
+    assert corpus.deleted == [uri] and corpus.indexed == [uri]
+    assert chunk_index.get(CORPUS, uri) == previous
+
+    corpus.failing.clear()
+    corpus.add(uri, BODY + " Revised appendix.")
+    assert corpus.indexed == [uri, uri]
+    assert [f.source_uri for f in corpus.rag_files] == [uri]
+    assert chunk_index.get(CORPUS, uri) != previous
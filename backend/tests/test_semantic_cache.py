@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.rag_agent.retrieval import semantic_cache as semantic_cache_module
+from app.rag_agent.retrieval.bm25 import identifier_terms
+from app.rag_agent.retrieval.embedders import normalize_rows
+from app.rag_agent.retrieval.semantic_cache import SemanticCache, query_embedding
+
+CORPUS = "projects/p/locations/l/ragCorpora/3"
+VECTOR = normalize_rows(np.arange(1, 9, dtype=np.float32))
+
+
+def cache(**kwargs):
+    return SemanticCache(similarity=0.9, max_entries=10, enabled=True, **kwargs)
+
+
+def test_disabled_by_default():
+    assert not SemanticCache().enabled
+
+
+def test_paraphrase_is_served():
+    semantic = cache()
+    semantic.store(CORPUS, "how do I reset the board", VECTOR, 0, "answer")
+    value, similarity, cached_query = semantic.lookup(CORPUS, "how can I reset the board", VECTOR, 0)
+    assert value == "answer"
+    assert similarity == pytest.approx(1.0)
+    assert cached_query == "how do I reset the board"
+
+
+def test_different_identifiers_never_match():
+    semantic = cache()
+    semantic.store(CORPUS, "datasheet for part STM32L476RG", VECTOR, 0, "l476")
+    # Embeddings of near-identical part numbers are all but equal
+    assert semantic.lookup(CORPUS, "datasheet for part STM32L496RG", VECTOR, 0) is None
+    assert semantic.lookup(CORPUS, "price of SKU 10442", VECTOR, 0) is None
+    assert semantic.lookup(CORPUS, "Datasheet for part stm32l476rg", VECTOR, 0)[0] == "l476"
+
+
+def test_best_entry_with_matching_identifiers_is_served():
+    semantic = cache()
+    close = normalize_rows(VECTOR + 0.05 * np.ones(8, dtype=np.float32))
+    semantic.store(CORPUS, "wiring for PA5", VECTOR, 0, "pa5")
+    semantic.store(CORPUS, "wiring for PA6", close, 0, "pa6")
+    assert semantic.lookup(CORPUS, "wiring of PA6", VECTOR, 0)[0] == "pa6"
+
+
+def test_version_change_drops_entries():
+    semantic = cache()
+    semantic.store(CORPUS, "how do I reset the board", VECTOR, 0, "answer")
+    assert semantic.lookup(CORPUS, "how do I reset the board", VECTOR, 1) is None
+    assert semantic.stats()["entries"] == 0
+
+
+def test_identifier_queries_are_not_embedded(monkeypatch):
+    monkeypatch.setattr(
+        semantic_cache_module, "_embed_normalized",
+        lambda query: pytest.fail(f"embedded identifier query {query!r}"),
+    )
+    assert query_embedding("STM32L476RG") is None
+    assert query_embedding("GPIOA_MODER PA5") is None
+
+
+def test_identifier_terms_include_bare_numbers():
+    assert identifier_terms("price of SKU 10442 for STM32L476RG") == {"sku", "10442", "stm32l476rg"}
+    assert identifier_terms("how is the site graded") == frozenset()
@@ -0,0 +1,138 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.rag_agent.retrieval import store as store_module
+from app.rag_agent.retrieval.embedders import normalize_rows
+from app.rag_agent.retrieval.store import ChunkStore
+
+DIM = 8
+
+
+def vectors(n, seed=0):
+    return normalize_rows(np.random.default_rng(seed).normal(size=(n, DIM)))
+
+
+def chunks(texts, source="a"):
+    return [{"source_uri": f"gs://b/{source}.pdf", "source_name": f"{source}.pdf", "text": t} for t in texts]
+
+
+def test_append_and_read_back(tmp_path):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    data = vectors(3)
+    assert store.append(chunks(["one", "two"]), data[:2]) == range(0, 2)
+    assert store.append(chunks(["three"], source="b"), data[2:]) == range(2, 3)
+
+    reopened = ChunkStore(str(tmp_path))
+    assert len(reopened) == 3
+    assert [reopened.text(row) for row in range(3)] == ["one", "two", "three"]
+    assert reopened.chunk(2) == {"source_uri": "gs://b/b.pdf", "source_name": "b.pdf", "text": "three"}
+    np.testing.assert_allclose(reopened.vectors(), data, atol=1e-6)
+    assert reopened.rows_for_source("gs://b/a.pdf").tolist() == [0, 1]
+
+
+def test_int8_store_keeps_similarities_close(tmp_path):
+    store = ChunkStore(str(tmp_path), dim=DIM, dtype="int8")
+    data = vectors(20)
+    store.append(chunks([str(i) for i in range(20)]), data)
+    np.testing.assert_allclose(store.similarities(data[3]), data @ data[3], atol=0.02)
+
+
+def test_torn_appends_are_truncated_away(tmp_path):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    store.append(chunks(["one"]), vectors(1))
+
+    # A writer crashed mid-append: data files and sources.jsonl hold bytes
+    # the manifest never covered, including half a JSON line
+    with open(tmp_path / "gen-0" / "sources.jsonl", "a") as f:
+        f.write('{"source_uri": "gs://b/torn')
+    with open(tmp_path / "gen-0" / "text.bin", "ab") as f:
+        f.write(b"garbage")
+
+    reopened = ChunkStore(str(tmp_path))
+    assert reopened.chunk(0)["text"] == "one"
+    reopened.append(chunks(["two"], source="c"), vectors(1, seed=1))
+
+    fresh = ChunkStore(str(tmp_path))
+    assert [fresh.chunk(row) for row in range(2)] == [
+        {"source_uri": "gs://b/a.pdf", "source_name": "a.pdf", "text": "one"},
+        {"source_uri": "gs://b/c.pdf", "source_name": "c.pdf", "text": "two"},
+    ]
+    lines = (tmp_path / "gen-0" / "sources.jsonl").read_text().splitlines()
+    assert [json.loads(line)["source_uri"] for line in lines] == ["gs://b/a.pdf", "gs://b/c.pdf"]
+
+
+def test_stores_without_recorded_source_length_still_load(tmp_path):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    store.append(chunks(["one"]), vectors(1))
+    manifest_path = tmp_path / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    del manifest["sources_bytes"]
+    manifest_path.write_text(json.dumps(manifest))
+
+    reopened = ChunkStore(str(tmp_path))
+    reopened.append(chunks(["two"], source="b"), vectors(1, seed=1))
+    assert ChunkStore(str(tmp_path)).chunk(1)["source_uri"] == "gs://b/b.pdf"
+
+
+def test_compaction_drops_deleted_rows(tmp_path):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    data = vectors(4)
+    store.append(chunks(["a0", "a1"]) + chunks(["b0", "b1"], source="b"), data)
+    assert store.delete_rows(store.rows_for_source("gs://b/a.pdf")) == 2
+    assert store.live_count == 2
+
+    store.compact()
+    assert store.generation == 1
+    assert len(store) == 2 and store.live_count == 2
+    assert [store.text(row) for row in range(2)] == ["b0", "b1"]
+    np.testing.assert_allclose(store.vectors(), data[2:], atol=1e-6)
+
+
+def test_compaction_keeps_the_old_generation_for_open_readers(tmp_path, monkeypatch):
+    writer = ChunkStore(str(tmp_path), dim=DIM)
+    writer.append(chunks(["a0", "a1"]), vectors(2))
+    reader = ChunkStore(str(tmp_path))
+    writer.delete_rows([0])
+    writer.compact()
+
+    # The reader still maps generation 0 and can read from it lazily
+    assert os.path.isdir(tmp_path / "gen-0")
+    assert reader.generation == 0
+    assert reader.chunk(1)["source_uri"] == "gs://b/a.pdf"
+    reader.reload()
+    assert reader.generation == 1 and reader.text(0) == "a1"
+
+    # Once the grace period passed, the next write removes it
+    monkeypatch.setattr(store_module, "LOCAL_STORE_RETIRE_SECONDS", 0)
+    writer.append(chunks(["a2"]), vectors(1, seed=1))
+    assert not os.path.exists(tmp_path / "gen-0")
+    assert writer.manifest["retired"] == []
+
+
+def test_reload_retries_when_the_generation_disappears(tmp_path, monkeypatch):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    store.append(chunks(["a0"]), vectors(1))
+    writer = ChunkStore(str(tmp_path))
+    writer.append(chunks(["a1"]), vectors(1, seed=1))
+
+    original = ChunkStore._map
+    failures = []
+
+    def flaky_map(self, manifest):
+        if not failures:
+            failures.append(1)
+            raise FileNotFoundError("gen retired")
+        return original(self, manifest)
+
+    monkeypatch.setattr(ChunkStore, "_map", flaky_map)
+    assert store.reload()
+    assert len(store) == 2
+
+
+def test_mismatched_embeddings_are_rejected(tmp_path):
+    store = ChunkStore(str(tmp_path), dim=DIM)
+    with pytest.raises(ValueError):
+        store.append(chunks(["a", "b"]), vectors(1))
@@ -0,0 +1,144 @@
+import itertools
+import types
+import uuid
+
+import pytest
+
+from app.rag_agent.ingestion import sync as sync_module
+from app.rag_agent.ingestion.sync import sync_prefix
+
+PREFIX = "gs://b/docs/"
+
+
+def obj(generation, content_hash):
+    return {"generation": str(generation), "content_hash": content_hash}
+
+
+class Corpus:
+    """Fakes for the GCS listing and the corpus behind sync_prefix."""
+
+    def __init__(self, monkeypatch, files=()):
+        self.name = f"projects/p/locations/l/ragCorpora/{uuid.uuid4().hex[:8]}"
+        self.ids = itertools.count(1)
+        # source uri -> RAG file id
+        self.files = {uri: str(next(self.ids)) for uri in files}
+        self.listing = {}
+        self.imported = []
+        self.deleted = []
+        monkeypatch.setattr(sync_module, "list_prefix", lambda prefix: dict(self.listing))
+        monkeypatch.setattr(sync_module, "rag", types.SimpleNamespace(list_files=self.list_files))
+        monkeypatch.setattr(sync_module, "ensure_corpus", lambda *a: False)
+        monkeypatch.setattr(sync_module, "import_documents", self.import_documents)
+        monkeypatch.setattr(sync_module, "delete_document", self.delete_document)
+
+    def list_files(self, corpus):
+        return [
+            types.SimpleNamespace(name=f"{corpus}/ragFiles/{fid}", source_uri=uri)
+            for uri, fid in self.files.items()
+        ]
+
+    def import_documents(self, corpus_name, paths, tool_context):
+        for path in paths:
+            # import_files skips a path it already has
+            self.files.setdefault(path, str(next(self.ids)))
+        self.imported.extend(paths)
+        return {"status": "success", "files_added": len(paths)}
+
+    def delete_document(self, corpus, file_id, tool_context):
+        (uri,) = [uri for uri, fid in self.files.items() if fid == file_id]
+        del self.files[uri]
+        self.deleted.append(uri)
+        return {"status": "success"}
+
+    def sync(self, listing, reconcile=False):
+        self.listing = listing
+        self.imported, self.deleted = [], []
+        return sync_prefix(self.name, PREFIX, reconcile)
+
+
+A, B = PREFIX + "a.pdf", PREFIX + "b.pdf"
+
+# (case, first listing, second listing,
+#  whether the second run is asked to reconcile,
+#  imported and deleted by the second run, expected counts of the second run)
+CASES = [
+    (
+        "new object",
+        {A: obj(1, "h1")}, {A: obj(1, "h1"), B: obj(1, "h2")}, False,
+        [B], [], {"new": 1, "imported": 1, "unchanged": 1, "reconciled": False},
+    ),
+    (
+        "nothing changed",
+        {A: obj(1, "h1")}, {A: obj(1, "h1")}, False,
+        [], [], {"unchanged": 1, "imported": 0, "deleted": 0, "reconciled": False},
+    ),
+    (
+        # The old file's id was never seen, so the run reconciles to find it
+        "changed content",
+        {A: obj(1, "h1")}, {A: obj(2, "h9")}, False,
+        [A], [A], {"changed": 1, "imported": 1, "deleted": 0, "reconciled": True},
+    ),
+    (
+        "metadata-only update",
+        {A: obj(1, "h1")}, {A: obj(2, "h1")}, False,
+        [], [], {"metadata_only": 1, "imported": 0, "unchanged": 0, "reconciled": False},
+    ),
+    (
+        "vanished object",
+        {A: obj(1, "h1"), B: obj(1, "h2")}, {B: obj(1, "h2")}, False,
+        [], [A], {"deleted": 1, "unchanged": 1, "reconciled": True},
+    ),
+    (
+        "removed from the corpus by other means",
+        {A: obj(1, "h1")}, {A: obj(1, "h1")}, True,
+        None, [], {"new": 1, "imported": 1, "reconciled": True},
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "first, second, reconcile, imported, deleted, counts",
+    [case[1:] for case in CASES],
+    ids=[case[0] for case in CASES],
+)
+def test_second_run(monkeypatch, first, second, reconcile, imported, deleted, counts):
+    corpus = Corpus(monkeypatch)
+    corpus.sync(first)
+    assert sorted(corpus.imported) == sorted(first)
+
+    if imported is None:
+        # Deleted from the corpus without the sync knowing
+        corpus.files.clear()
+        imported = list(second)
+    summary = corpus.sync(second, reconcile)
+
+    assert corpus.imported == imported and corpus.deleted == deleted
+    assert {key: summary[key] for key in counts} == counts
+    assert summary["failed"] == []
+    assert sorted(corpus.files) == sorted(second)
+
+
+def test_first_run_adopts_files_already_in_the_corpus(monkeypatch):
+    corpus = Corpus(monkeypatch, files=[A, PREFIX + "gone.pdf"])
+    summary = corpus.sync({A: obj(1, "h1"), B: obj(1, "h2")})
+    assert corpus.imported == [B] and corpus.deleted == [PREFIX + "gone.pdf"]
+    assert (summary["adopted"], summary["new"], summary["deleted"], summary["reconciled"]) == (1, 1, 1, True)
+
+    # The adopted file's id is known, so deleting it needs no reconcile
+    summary = corpus.sync({B: obj(1, "h2")})
+    assert corpus.deleted == [A] and summary["reconciled"] is False
+
+
+def test_failed_imports_are_retried_by_the_next_run(monkeypatch):
+    corpus = Corpus(monkeypatch)
+
+    def import_documents(corpus_name, paths, tool_context):
+        raise RuntimeError("quota")
+
+    monkeypatch.setattr(sync_module, "import_documents", import_documents)
+    summary = corpus.sync({A: obj(1, "h1")})
+    assert summary["imported"] == 0 and summary["failed"] == [{"uri": A, "error": "quota"}]
+
+    monkeypatch.setattr(sync_module, "import_documents", corpus.import_documents)
+    summary = corpus.sync({A: obj(1, "h1")})
+    assert corpus.imported == [A] and summary["new"] == 1
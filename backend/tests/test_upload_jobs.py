@@ -0,0 +1,48 @@
+import asyncio
+import types
+
+import pytest
+
+from app.rag_agent.ingestion.pipeline import IngestionError
+from app.rag_agent.routers import files as files_module
+
+FILES = [
+    {"filename": f"{name}.pdf", "gcs_uri": f"gs://b/uploads/{name}.pdf", "document_id": None}
+    for name in ("a", "b", "c")
+]
+
+
+def test_retries_import_only_the_files_verification_missed(monkeypatch):
+    imports = []
+    in_corpus = set()
+
+    def ensure_and_import(corpus_name, gcs_uris, document_ids):
+        imports.append(gcs_uris)
+        # b.pdf only shows up on the second import; c.pdf is a near-duplicate
+        in_corpus.update(uri for uri in gcs_uris if not uri.endswith("/b.pdf") or len(imports) > 1)
+        return {"files_added": len(gcs_uris), "near_duplicates": ["gs://b/uploads/c.pdf"] if len(imports) == 1 else []}
+
+    def verify_documents(corpus_name, gcs_uris, tool_context):
+        return {
+            "missing": [uri for uri in gcs_uris if uri not in in_corpus],
+            "file_ids": {uri: uri for uri in gcs_uris if uri in in_corpus},
+        }
+
+    monkeypatch.setattr(files_module, "ensure_and_import", ensure_and_import)
+    monkeypatch.setattr(files_module, "verify_documents", verify_documents)
+    monkeypatch.setattr(files_module, "_index_content", lambda *a: None)
+    monkeypatch.setattr(files_module.ingest_queue, "max_attempts", 3)
+
+    job = types.SimpleNamespace(payload={"corpus_name": "c", "files": FILES}, stage="import", result={}, attempts=1)
+
+    def checkpoint(stage, result):
+        job.stage = stage
+        job.result.update(result)
+
+    with pytest.raises(IngestionError):
+        asyncio.run(files_module.process_upload_job(job, checkpoint))
+    job.attempts += 1
+    result = asyncio.run(files_module.process_upload_job(job, checkpoint))
+
+    assert imports == [[file["gcs_uri"] for file in FILES], ["gs://b/uploads/b.pdf"]]
+    assert [file["status"] for file in result["files"]] == ["imported", "imported", "near_duplicate"]
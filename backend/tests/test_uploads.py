@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from app.rag_agent.ingestion import uploads
+from app.rag_agent.ingestion.uploads import DeduplicatedUpload, stream_multipart_to_gcs
+
+BOUNDARY = "testboundary"
+CHUNK = 256 * 1024
+
+
+class FakeWriter:
+    def __init__(self, bucket, name):
+        self.bucket, self.name, self.data = bucket, name, bytearray()
+
+    def write(self, data):
+        self.data.extend(data)
+        self.bucket.sent += len(data)
+
+    def close(self):
+        self.bucket.objects[self.name] = bytes(self.data)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket, self.name = bucket, name
+
+    def open(self, mode, chunk_size=None, content_type=None):
+        self.bucket.opened += 1
+        return FakeWriter(self.bucket, self.name)
+
+    def delete(self):
+        del self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects, self.opened, self.sent = {}, 0, 0
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    fake = FakeBucket()
+    client = type("Client", (), {"bucket": lambda self, name: fake})()
+    monkeypatch.setattr(uploads, "get_storage_client", lambda: client)
+    monkeypatch.setattr(uploads, "upload_bucket_name", lambda: "b")
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", CHUNK)
+    return fake
+
+
+def multipart(*files):
+    body = b""
+    for name, data in files:
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+            "Content-Type: application/pdf\r\n\r\n"
+        ).encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def stream(body, lookup=None):
+    async def chunks():
+        for start in range(0, len(body), 64 * 1024):
+            yield body[start:start + 64 * 1024]
+
+    return asyncio.run(stream_multipart_to_gcs(
+        f"multipart/form-data; boundary={BOUNDARY}", chunks(), keep_local=False, lookup_digest=lookup,
+    ))
+
+
+def test_files_are_streamed_and_hashed(bucket):
+    data = b"%PDF" + bytes(3 * CHUNK)
+    upload = stream(multipart(("big.pdf", data)))
+    (file,) = upload.files
+    assert file.sha256 == hashlib.sha256(data).hexdigest() and file.size == len(data)
+    assert list(bucket.objects.values()) == [data]
+
+
+def test_small_duplicate_never_reaches_gcs(bucket):
+    data = b"%PDF small"
+    digest = hashlib.sha256(data).hexdigest()
+    upload = stream(multipart(("a.pdf", data)), lookup=lambda d: {"filename": "old.pdf"} if d == digest else None)
+    assert upload.files == []
+    assert isinstance(upload.deduplicated[0], DeduplicatedUpload)
+    assert bucket.opened == 0 and bucket.sent == 0
+
+
+def test_duplicates_within_a_request_leave_no_object(bucket):
+    small, big = b"%PDF small", b"%PDF" + bytes(2 * CHUNK)
+    upload = stream(multipart(("a.pdf", small), ("b.pdf", big), ("a2.pdf", small), ("b2.pdf", big)))
+    assert [file.filename for file in upload.files] == ["a.pdf", "b.pdf"]
+    assert [dup.filename for dup in upload.deduplicated] == ["a2.pdf", "b2.pdf"]
+    # The large duplicate was partly uploaded before its digest was known
+    assert sorted(bucket.objects.values(), key=len) == [small, big]
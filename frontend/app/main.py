@@ -1,12 +1,31 @@
 import streamlit as st
 import requests
-from typing import List
+from typing import Iterator, List, Tuple
 import datetime
+import json
+
+from sources import source_markdown
 
 # ----------------------- CONFIG ----------------------- #
 API_URL = "http://rag_api_backend:8000"
-UPLOAD_ENDPOINT = f"{API_URL}/upload_pdf"
+UPLOAD_ENDPOINT = f"{API_URL}/upload/"
+JOBS_ENDPOINT = f"{API_URL}/jobs"
 QUERY_ENDPOINT = f"{API_URL}/query"
+QUERY_STREAM_ENDPOINT = f"{API_URL}/query/stream"
+
+
+def iter_sse(response: requests.Response) -> Iterator[Tuple[str, dict]]:
+    """Yield (event, data) pairs from a server-sent events response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
 
 # --------------------- PAGE SETUP --------------------- #
 st.set_page_config(
@@ -39,11 +58,15 @@ if st.sidebar.button("Upload to Corpus") and uploaded_files:
             files = {"file": file}
             data = {"corpus_name": "earthwork"}
             res = requests.post(UPLOAD_ENDPOINT, files=files, data=data)
-            if res.status_code == 200:
+            # The backend queues an ingestion job and answers 202 right away
+            if res.ok:
                 timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                body = res.json()
                 st.session_state.uploaded_files.append({
                     "name": file.name,
-                    "status": "Uploaded",
+                    # Content that is already in the corpus is not queued again
+                    "status": "Already in corpus" if body.get("deduplicated") else "Queued",
+                    "job_id": body.get("job_id"),
                     "timestamp": timestamp
                 })
             else:
@@ -57,6 +80,13 @@ if st.sidebar.button("Upload to Corpus") and uploaded_files:
 if st.session_state.uploaded_files:
     st.sidebar.subheader("Upload Summary")
     for file in st.session_state.uploaded_files:
+        # Refresh ingestion progress for files that are still being processed
+        if file.get("job_id") and file["status"] not in ("succeeded", "failed"):
+            try:
+                job = requests.get(f"{JOBS_ENDPOINT}/{file['job_id']}", timeout=5).json()
+                file["status"] = job.get("status", file["status"])
+            except Exception:
+                pass
         st.sidebar.markdown(f"**{file['name']}** — {file['status']} ({file['timestamp']})")
 
 # Clear chat
@@ -71,9 +101,7 @@ for msg in st.session_state.messages:
         if msg["role"] == "assistant" and msg.get("sources"):
             with st.expander("📎 Sources", expanded=False):
                 for src in msg["sources"]:
-                    gcs_url = f"https://console.cloud.google.com/storage/browser/{src['source_uri'].replace('gs://', '').split('/')[0]}"
-                    score = round(src.get("score", 0), 3)
-                    st.markdown(f"- 📎 `{src['source_name']}` (score: {score}) — [View in GCS]({gcs_url})")
+                    st.markdown(source_markdown(src))
 
 # --------------------- CHAT INPUT --------------------- #
 if prompt := st.chat_input("Ask something about your documents..."):
@@ -82,24 +110,55 @@ if prompt := st.chat_input("Ask something about your documents..."):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                res = requests.post(QUERY_ENDPOINT, data={"query": prompt, "corpus_name": "earthwork"})
-                if res.status_code == 200:
-                    result = res.json()
-                    sources: List[dict] = result.get("results", [])
-                    answer = result.get("answer") or sources[0].get("text", "No answer.") if sources else "No answer found."
-
-                    feedback = "" if sources else "\n\n *No strong match found — try rephrasing?*"
-                    answer += feedback
+        # Render the answer progressively from the streaming endpoint
+        status = st.empty()
+        sources_slot = st.empty()
+        answer_slot = st.empty()
+        answer = ""
+        sources: List[dict] = []
+        status.markdown("_Thinking..._")
+        try:
+            with requests.post(
+                QUERY_STREAM_ENDPOINT,
+                data={"query": prompt, "corpus_name": "earthwork"},
+                stream=True,
+                timeout=300,
+            ) as res:
+                if res.status_code != 200:
+                    st.error("Query failed")
+                else:
+                    for event, data in iter_sse(res):
+                        if event == "tool_call":
+                            status.markdown(f"_Calling `{data['tool_name']}`..._")
+                        elif event == "contexts":
+                            sources = data.get("results", [])
+                            status.markdown(f"_Found {len(sources)} relevant passages, writing the answer..._")
+                            with sources_slot.container():
+                                with st.expander("📎 Sources", expanded=False):
+                                    for src in sources:
+                                        st.markdown(source_markdown(src, link=False))
+                        elif event == "token":
+                            answer += data["text"]
+                            answer_slot.markdown(answer + "▌")
+                        elif event == "final":
+                            answer = data.get("response") or answer or "No answer found."
+                        elif event == "error":
+                            st.error(f"Error: {data.get('error')}")
 
+                    status.empty()
+                    sources_slot.empty()
+                    if not sources:
+                        answer += "\n\n *No strong match found — try rephrasing?*"
+                    answer_slot.markdown(answer)
                     st.session_state.messages.append({
                         "role": "assistant",
                         "content": answer,
                         "sources": sources
                     })
-                    st.markdown(answer)
-                else:
-                    st.error("Query failed")
-            except Exception as e:
-                st.error(f"Error: {e}")
+                    # Keep the sources under the finished answer
+                    if sources:
+                        with st.expander("📎 Sources", expanded=False):
+                            for src in sources:
+                                st.markdown(source_markdown(src))
+        except Exception as e:
+            st.error(f"Error: {e}")
@@ -0,0 +1,28 @@
+"""
+Formatting of the retrieved passages shown under an answer.
+
+Kept apart from main.py, which Streamlit runs top to bottom, so it can be
+imported on its own.
+"""
+
+
+def format_score(src: dict) -> str:
+    """
+    The passage's score (vector distance) rounded for display.
+
+    Hybrid retrieval over Vertex AI returns keyword-only hits with a score of
+    None, since their distance to the query is not known.
+    """
+    score = src.get("score")
+    if score is None:
+        return "n/a, keyword match"
+    return str(round(score, 3))
+
+
+def source_markdown(src: dict, link: bool = True) -> str:
+    """One line of the sources list, optionally linking the GCS bucket."""
+    line = f"- 📎 `{src.get('source_name', '')}` (score: {format_score(src)})"
+    if link:
+        bucket = src.get("source_uri", "").replace("gs://", "").split("/")[0]
+        line += f" — [View in GCS](https://console.cloud.google.com/storage/browser/{bucket})"
+    return line
@@ -0,0 +1,9 @@
+"""
+main.py is run by Streamlit as a script, with app/ on sys.path, so the
+tests import its modules the same way.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
@@ -0,0 +1,19 @@
+from sources import format_score, source_markdown
+
+DENSE = {"source_uri": "gs://docs/specs/a.pdf", "source_name": "a.pdf", "score": 0.123456, "fusion_score": 0.03}
+# A keyword-only hit fused with Vertex AI results has no known distance
+LEXICAL = {"source_uri": "gs://docs/specs/b.pdf", "source_name": "b.pdf", "score": None, "fusion_score": 0.016}
+
+
+def test_scores_are_rounded_and_unknown_ones_shown_as_such():
+    assert format_score(DENSE) == "0.123"
+    assert format_score(LEXICAL) == "n/a, keyword match"
+    assert format_score({"source_name": "c.pdf", "score": 0}) == "0"
+
+
+def test_source_lines_for_fused_results():
+    assert [source_markdown(src) for src in (DENSE, LEXICAL)] == [
+        "- 📎 `a.pdf` (score: 0.123) — [View in GCS](https://console.cloud.google.com/storage/browser/docs)",
+        "- 📎 `b.pdf` (score: n/a, keyword match) — [View in GCS](https://console.cloud.google.com/storage/browser/docs)",
+    ]
+    assert source_markdown(LEXICAL, link=False) == "- 📎 `b.pdf` (score: n/a, keyword match)"